@@ -0,0 +1,23 @@
+from django.contrib import admin
+
+from ecommerce_backend.admin import LargeTableAdmin
+from .models import Cart, CartItem
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    autocomplete_fields = ['product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+@admin.register(Cart)
+class CartAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'item_count', 'total_price', 'updated_at']
+    list_select_related = ['user']
+    search_fields = ['=user__username']
+    autocomplete_fields = ['user']
+    ordering = ['-updated_at']
+    inlines = [CartItemInline]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from carts.services import expire_carts
+
+
+class Command(BaseCommand):
+    help = "Delete carts not modified for CART_TTL, in batches. Run periodically (e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = expire_carts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} abandoned carts"))
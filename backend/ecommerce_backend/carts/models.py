@@ -0,0 +1,33 @@
+from django.db import models
+from django.conf import settings
+from products.models import Product
+
+
+class Cart(models.Model):
+    """ตะกร้าสินค้าฝั่ง server ผู้ใช้หนึ่งคนมีได้หนึ่งตะกร้า"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
+    # ยอดรวมที่คำนวณสะสมทุกครั้งที่แก้ตะกร้า ไม่ต้องรวมใหม่ตอนอ่าน
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Cart of {self.user_id}"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    # ราคาตอนที่ตรวจสอบล่าสุด ใช้เทียบกับราคาปัจจุบันตอน checkout
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        unique_together = ('cart', 'product')
+
+    @property
+    def line_total(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id}"
@@ -0,0 +1,186 @@
+"""
+Cart operations.
+
+Every change locks the cart row, validates only the line being changed
+and adjusts the cached ``Cart.total_price`` by the line's delta, so the
+cost of a change does not grow with the size of the cart. Checkout turns
+the already-validated lines into an ``Order`` with a fixed number of
+queries.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from orders import events
+from orders.models import Order, OrderItem
+from .models import Cart, CartItem
+
+
+class CartError(Exception):
+    """คำขอแก้ไขตะกร้าหรือ checkout ไม่ผ่านการตรวจสอบ"""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+class PriceChanged(CartError):
+    """ราคาสินค้าเปลี่ยนหลังจากแก้ตะกร้าครั้งล่าสุด"""
+
+
+def get_cart(user):
+    cart, _ = Cart.objects.get_or_create(user=user)
+    return cart
+
+
+def _locked_cart(user):
+    get_cart(user)
+    return Cart.objects.select_for_update().get(user=user)
+
+
+def _check_stock(product, quantity):
+    if quantity < 1:
+        raise CartError("Quantity must be at least 1")
+    if product.stock < quantity:
+        raise CartError(f"Not enough stock for {product.name}", {'product': product.id, 'available': product.stock})
+
+
+def _apply(cart, old_line_total, new_line_total, quantity_delta):
+    cart.total_price += new_line_total - old_line_total
+    cart.item_count += quantity_delta
+    cart.save(update_fields=['total_price', 'item_count', 'updated_at'])
+
+
+def _set_line(cart, product, item, quantity):
+    """ตั้งจำนวนของบรรทัด ``item`` (None = ยังไม่มี) ในตะกร้าที่ lock แล้ว"""
+    _check_stock(product, quantity)
+    if item is None:
+        item = CartItem.objects.create(cart=cart, product=product, quantity=quantity, unit_price=product.price)
+        _apply(cart, 0, item.line_total, quantity)
+    else:
+        old_line_total, old_quantity = item.line_total, item.quantity
+        item.quantity = quantity
+        item.unit_price = product.price
+        item.save(update_fields=['quantity', 'unit_price'])
+        _apply(cart, old_line_total, item.line_total, quantity - old_quantity)
+
+
+def set_item(user, product, quantity):
+    """ตั้งจำนวนสินค้าในตะกร้า (เพิ่มบรรทัดใหม่ถ้ายังไม่มี)"""
+    with transaction.atomic():
+        cart = _locked_cart(user)
+        item = CartItem.objects.filter(cart=cart, product=product).first()
+        _set_line(cart, product, item, quantity)
+    return cart
+
+
+def add_item(user, product, quantity=1):
+    """เพิ่มจำนวนสินค้าต่อจากที่มีอยู่ในตะกร้า"""
+    with transaction.atomic():
+        # อ่านจำนวนเดิมหลัง lock ตะกร้า ไม่อย่างนั้นการเพิ่มพร้อมกันสองครั้งจะทับกัน
+        cart = _locked_cart(user)
+        item = CartItem.objects.filter(cart=cart, product=product).first()
+        _set_line(cart, product, item, (item.quantity if item else 0) + quantity)
+    return cart
+
+
+def remove_item(user, product_id):
+    with transaction.atomic():
+        cart = _locked_cart(user)
+        item = CartItem.objects.filter(cart=cart, product_id=product_id).first()
+        if item is None:
+            raise CartError("Product is not in the cart")
+        item.delete()
+        _apply(cart, item.line_total, 0, -item.quantity)
+    return cart
+
+
+def clear(user):
+    with transaction.atomic():
+        cart = _locked_cart(user)
+        cart.items.all().delete()
+        cart.total_price = 0
+        cart.item_count = 0
+        cart.save(update_fields=['total_price', 'item_count', 'updated_at'])
+    return cart
+
+
+def checkout(user):
+    """
+    สร้าง Order จากตะกร้า
+
+    Lines were validated when they were changed; here they are only
+    re-checked against the current stock and price (loaded in the same
+    query as the lines). A price change aborts the checkout with
+    ``PriceChanged``; call ``reprice`` so the client can confirm the new
+    total.
+    """
+    with transaction.atomic():
+        cart = _locked_cart(user)
+        items = list(cart.items.select_related('product'))
+        if not items:
+            raise CartError("Cart is empty")
+
+        changed_prices = [item for item in items if item.unit_price != item.product.price]
+        out_of_stock = [item.product_id for item in items if item.product.stock < item.quantity]
+        if out_of_stock:
+            raise CartError("Not enough stock", {'products': out_of_stock})
+        if changed_prices:
+            raise PriceChanged(
+                "Prices changed since the cart was updated",
+                {'products': [item.product_id for item in changed_prices]},
+            )
+
+        order = Order.objects.create(user=user, total_price=cart.total_price, status='pending')
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item.product, quantity=item.quantity) for item in items
+        ])
+        events.record_created(order, order_items)
+
+        cart.items.all().delete()
+        cart.total_price = 0
+        cart.item_count = 0
+        cart.save(update_fields=['total_price', 'item_count', 'updated_at'])
+    return order
+
+
+def reprice(user):
+    """อัปเดตราคาทุกบรรทัดเป็นราคาปัจจุบันและคำนวณยอดรวมใหม่"""
+    with transaction.atomic():
+        cart = _locked_cart(user)
+        items = list(cart.items.select_related('product'))
+        for item in items:
+            item.unit_price = item.product.price
+        CartItem.objects.bulk_update(items, ['unit_price'])
+        cart.total_price = sum((item.line_total for item in items), 0)
+        cart.item_count = sum(item.quantity for item in items)
+        cart.save(update_fields=['total_price', 'item_count', 'updated_at'])
+    return cart
+
+
+def get_cart_ttl():
+    return getattr(settings, 'CART_TTL', timedelta(days=30))
+
+
+def expire_carts(batch_size=1000):
+    """
+    ลบตะกร้าที่ไม่ถูกแก้ไขนานกว่า CART_TTL ทีละ batch คืนค่าจำนวนตะกร้าที่ลบ
+
+    Each batch locks the expired cart rows it selects, the same lock every
+    cart change takes, so a cart being edited is skipped rather than
+    emptied under the user. Only the items of the locked carts are deleted.
+    """
+    cutoff = timezone.now() - get_cart_ttl()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Cart.objects.select_for_update(skip_locked=True)
+                .filter(updated_at__lt=cutoff).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            CartItem.objects.filter(cart_id__in=ids, cart__updated_at__lt=cutoff).delete()
+            deleted += Cart.objects.filter(id__in=ids, updated_at__lt=cutoff).delete()[1].get('carts.Cart', 0)
@@ -0,0 +1,129 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import Order
+from products.models import Product
+from . import services
+from .models import Cart, CartItem
+
+User = get_user_model()
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.keyboard = Product.objects.create(
+            name='Keyboard', description='d', price=Decimal('10.00'), category='physical', stock=10,
+        )
+        self.mouse = Product.objects.create(
+            name='Mouse', description='d', price=Decimal('2.50'), category='physical', stock=3,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, product, quantity):
+        return self.client.post('/api/cart/items/', {'product': product.id, 'quantity': quantity}, format='json')
+
+    def test_add_accumulates_quantity_and_total(self):
+        self.add(self.keyboard, 2)
+        self.add(self.mouse, 1)
+        response = self.add(self.keyboard, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_price'], '32.50')
+        self.assertEqual(response.data['item_count'], 4)
+        quantities = {item['product']: item['quantity'] for item in response.data['items']}
+        self.assertEqual(quantities, {self.keyboard.id: 3, self.mouse.id: 1})
+
+    def test_add_beyond_stock_is_rejected(self):
+        self.add(self.mouse, 2)
+        response = self.add(self.mouse, 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['available'], 3)
+        self.assertEqual(Cart.objects.get(user=self.user).item_count, 2)
+
+    def test_set_and_remove_adjust_total(self):
+        self.add(self.keyboard, 2)
+        self.add(self.mouse, 2)
+        response = self.client.patch(f'/api/cart/items/{self.keyboard.id}/', {'quantity': 1}, format='json')
+        self.assertEqual(response.data['total_price'], '15.00')
+        response = self.client.delete(f'/api/cart/items/{self.mouse.id}/')
+        self.assertEqual(response.data['total_price'], '10.00')
+        self.assertEqual(response.data['item_count'], 1)
+
+    def test_checkout_creates_order_and_empties_cart(self):
+        self.add(self.keyboard, 2)
+        self.add(self.mouse, 1)
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total_price, Decimal('22.50'))
+        self.assertEqual(order.orderitem_set.count(), 2)
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual((cart.total_price, cart.item_count, cart.items.count()), (0, 0, 0))
+
+    def test_checkout_after_price_change_returns_repriced_cart(self):
+        self.add(self.keyboard, 2)
+        Product.objects.filter(pk=self.keyboard.pk).update(price=Decimal('12.00'))
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['cart']['total_price'], '24.00')
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_empty_cart(self):
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_add_item_reads_quantity_under_the_cart_lock(self):
+        services.add_item(self.user, self.keyboard, 1)
+        locked_cart = services._locked_cart
+
+        def concurrent_add(user):
+            # อีก request เพิ่มสินค้าและ commit ไประหว่างที่รอ lock
+            CartItem.objects.filter(cart__user=user, product=self.keyboard).update(quantity=2)
+            return locked_cart(user)
+
+        with mock.patch.object(services, '_locked_cart', side_effect=concurrent_add):
+            services.add_item(self.user, self.keyboard, 1)
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 3)
+
+
+@override_settings(CART_TTL=timedelta(days=30))
+class ExpireCartsTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Keyboard', description='d', price=Decimal('10.00'), category='physical', stock=10,
+        )
+        self.stale = [self.cart(f'stale{i}', days=31) for i in range(3)]
+        self.fresh = self.cart('fresh', days=29)
+
+    def cart(self, username, days):
+        user = User.objects.create_user(username, f'{username}@example.com', 'pw')
+        services.add_item(user, self.product, 1)
+        Cart.objects.filter(user=user).update(updated_at=timezone.now() - timedelta(days=days))
+        return Cart.objects.get(user=user)
+
+    def test_deletes_only_expired_carts_and_their_items(self):
+        self.assertEqual(services.expire_carts(batch_size=2), 3)
+        self.assertEqual(list(Cart.objects.values_list('id', flat=True)), [self.fresh.id])
+        self.assertEqual(list(CartItem.objects.values_list('cart_id', flat=True)), [self.fresh.id])
+
+    def test_cart_touched_before_deletion_is_kept(self):
+        # ตะกร้าถูกแก้หลังจากเลือก id ไปแล้ว แต่ก่อนลบ
+        touched = self.stale[0]
+        delete = QuerySet.delete
+
+        def touch_then_delete(queryset):
+            Cart.objects.filter(pk=touched.pk).update(updated_at=timezone.now())
+            return delete(queryset)
+
+        with mock.patch.object(QuerySet, 'delete', autospec=True, side_effect=touch_then_delete):
+            self.assertEqual(services.expire_carts(), 2)
+        self.assertTrue(CartItem.objects.filter(cart=touched).exists())
+        self.assertEqual(set(Cart.objects.values_list('id', flat=True)), {touched.id, self.fresh.id})
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import CartView, CartItemView, CartCheckoutView
+
+urlpatterns = [
+    path('', CartView.as_view(), name='cart'),
+    path('items/', CartItemView.as_view(), name='cart-item-add'),
+    path('items/<int:product_id>/', CartItemView.as_view(), name='cart-item-detail'),
+    path('checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
+]
@@ -0,0 +1,91 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from django.shortcuts import get_object_or_404
+from products.models import Product
+from orders.serializers import OrderSerializer
+from orders.idempotency import IDEMPOTENCY_HEADER, run_idempotent
+from . import services
+from .models import Cart
+from .serializers import CartSerializer, CartItemWriteSerializer, CartItemQuantitySerializer
+
+
+def cart_response(user, status_code=status.HTTP_200_OK):
+    cart = Cart.objects.prefetch_related('items__product').get(user=user)
+    return Response(CartSerializer(cart).data, status=status_code)
+
+
+def error_response(error, status_code=status.HTTP_400_BAD_REQUEST):
+    return Response({"error": str(error), **error.details}, status=status_code)
+
+
+class CartView(APIView):
+    """ดูหรือล้างตะกร้าของผู้ใช้"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        services.get_cart(request.user)
+        return cart_response(request.user)
+
+    def delete(self, request):
+        services.clear(request.user)
+        return cart_response(request.user)
+
+
+class CartItemView(APIView):
+    """เพิ่ม แก้จำนวน หรือลบสินค้าในตะกร้า"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartItemWriteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            services.add_item(request.user, serializer.validated_data['product'], serializer.validated_data['quantity'])
+        except services.CartError as e:
+            return error_response(e)
+        return cart_response(request.user)
+
+    def patch(self, request, product_id):
+        product = get_object_or_404(Product, id=product_id)
+        serializer = CartItemQuantitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            services.set_item(request.user, product, serializer.validated_data['quantity'])
+        except services.CartError as e:
+            return error_response(e)
+        return cart_response(request.user)
+
+    def delete(self, request, product_id):
+        try:
+            services.remove_item(request.user, product_id)
+        except services.CartError as e:
+            return error_response(e, status.HTTP_404_NOT_FOUND)
+        return cart_response(request.user)
+
+
+class CartCheckoutView(APIView):
+    """สร้างคำสั่งซื้อจากตะกร้า"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is not None:
+            return run_idempotent(request, key, lambda: self.checkout(request))
+        return self.checkout(request)
+
+    def checkout(self, request):
+        try:
+            order = services.checkout(request.user)
+        except services.PriceChanged as e:
+            cart = services.reprice(request.user)
+            return Response({
+                "error": str(e),
+                **e.details,
+                'cart': CartSerializer(cart).data,
+            }, status=status.HTTP_409_CONFLICT)
+        except services.CartError as e:
+            return error_response(e)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
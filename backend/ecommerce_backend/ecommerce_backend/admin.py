@@ -0,0 +1,59 @@
+"""
+Shared admin building blocks for large tables.
+
+``LargeTableAdmin`` is a ``ModelAdmin`` base that never counts a whole
+table exactly: the unfiltered changelist uses the planner's row estimate
+(``EstimatedCountPaginator``) and filtered views skip the second "of N
+total" count (``show_full_result_count = False``).
+"""
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def estimated_count(model, using='default'):
+    """จำนวนแถวโดยประมาณจากสถิติของฐานข้อมูล (None ถ้าไม่มีให้ใช้)"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [connection.ops.quote_name(table)])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL ให้ -1 กับตารางที่ยังไม่เคย ANALYZE
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator ที่ใช้จำนวนแถวโดยประมาณเมื่อ queryset ไม่มีเงื่อนไขกรองและตารางใหญ่
+
+    Small tables (below ``estimate_threshold`` rows) and filtered querysets
+    are still counted exactly.
+    """
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
@@ -0,0 +1,103 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter for every sample, so nothing is imported yet.
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+
+def request(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'HTTP_ACCEPT': 'application/json', 'wsgi.url_scheme': 'http',
+        'wsgi.input': __import__('io').BytesIO(), 'wsgi.errors': sys.stderr,
+    }
+    status = []
+    body = b''.join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+    return int(status[0].split()[0]), len(body)
+
+status, size = request(sys.argv[1])
+first = time.perf_counter()
+request(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    'setup': loaded - started,
+    'first_response': first - loaded,
+    'second_response': second - first,
+    'status': status,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = "Measure worker import/setup time and time-to-first-response for one or more settings profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-module', action='append', dest='settings_modules',
+            help="Settings module to measure (repeatable; default: settings and settings_api)",
+        )
+        parser.add_argument('--path', default='/api/products/', help="Path requested after startup")
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top-imports', type=int, default=0, help="Also list the N slowest imports (python -X importtime)")
+
+    def handle(self, *args, **options):
+        modules = options['settings_modules'] or ['ecommerce_backend.settings', 'ecommerce_backend.settings_api']
+        for module in modules:
+            samples = [self.sample(module, options['path']) for _ in range(options['runs'])]
+            self.stdout.write(self.style.MIGRATE_HEADING(module))
+            self.stdout.write(f"  status {samples[0]['status']}, {samples[0]['modules']} modules loaded")
+            for key, label in (
+                ('process', 'process start -> first response'),
+                ('setup', 'import + django.setup + middleware'),
+                ('first_response', 'first request'),
+                ('second_response', 'second request'),
+            ):
+                values = [sample[key] * 1000 for sample in samples]
+                self.stdout.write(
+                    f"  {label:<36} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms"
+                )
+            if options['top_imports']:
+                self.top_imports(module, options['path'], options['top_imports'])
+
+    def run_probe(self, module, path, extra_args=()):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=module)
+        return subprocess.run(
+            [sys.executable, *extra_args, '-c', PROBE, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+
+    def sample(self, module, path):
+        started = time.perf_counter()
+        result = self.run_probe(module, path)
+        elapsed = time.perf_counter() - started
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample['process'] = elapsed
+        return sample
+
+    def top_imports(self, module, path, count):
+        result = self.run_probe(module, path, extra_args=('-X', 'importtime'))
+        totals = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative_us, name = line[len('import time:'):].split('|')
+            # import ที่ซ้อนอยู่ (ย่อหน้าลึกกว่าระดับบนสุด) ถูกนับรวมใน cumulative ของ module แม่แล้ว
+            if name.startswith('    '):
+                continue
+            package = name.strip().split('.')[0]
+            totals[package] = totals.get(package, 0) + int(cumulative_us)
+        for package, cumulative_us in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]:
+            self.stdout.write(f"    {cumulative_us / 1000:8.1f} ms  {package}")
@@ -0,0 +1,220 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+def load_records(paths, exclude_routes=()):
+    """อ่าน capture (รวมไฟล์ที่ถูก rotate) เรียงตามเวลาเริ่ม request"""
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    # sort แบบ stable: ลำดับเดิมเมื่อเวลาเท่ากัน ทำให้ replay ซ้ำได้ผลเหมือนเดิม
+    records.sort(key=lambda record: record['ts'])
+    return [record for record in records if record['route'] not in exclude_routes]
+
+
+def route_key(record):
+    return f"{record['method']} {record['route']}"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class ReplayTokens:
+    """JWT ของผู้ใช้ replay หนึ่งคนต่อ pseudonym ต่ออายุเมื่อใช้ไปครึ่งอายุ"""
+
+    def __init__(self):
+        from rest_framework_simplejwt.settings import api_settings
+
+        self.lifetime = api_settings.ACCESS_TOKEN_LIFETIME
+        self.users = {}
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def prepare(self, records):
+        User = get_user_model()
+        staff = {}
+        for record in records:
+            if record.get('user'):
+                staff[record['user']] = staff.get(record['user'], False) or bool(record.get('staff'))
+        for alias, is_staff in staff.items():
+            user, created = User.objects.get_or_create(
+                username=f'replay-{alias}', defaults={'email': f'{alias}@example.invalid', 'is_staff': is_staff},
+            )
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+            self.users[alias] = user
+        return len(self.users)
+
+    def header(self, alias):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        if not alias or alias not in self.users:
+            return {}
+        with self.lock:
+            token, issued = self.tokens.get(alias, (None, None))
+            if token is None or timezone.now() - issued > self.lifetime / 2:
+                token, issued = str(AccessToken.for_user(self.users[alias])), timezone.now()
+                self.tokens[alias] = (token, issued)
+        return {'Authorization': f'Bearer {token}'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a traffic capture (TrafficCaptureMiddleware) against a running instance at the original "
+        "pacing divided by --speed, then report per-route latency, optionally against a previous run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'captures', nargs='+',
+            help="Capture files of every process, rotated ones included, e.g. var/traffic/capture.*.ndjson*",
+        )
+        parser.add_argument('--target', default='http://127.0.0.1:8000', help="Base URL of the instance under test")
+        parser.add_argument('--speed', type=float, default=1.0, help="Speed-up factor; 0 sends as fast as --concurrency allows")
+        parser.add_argument('--concurrency', type=int, default=8, help="Maximum requests in flight")
+        parser.add_argument('--limit', type=int, help="Replay only the first N requests")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+        parser.add_argument(
+            '--exclude-route', action='append', default=[], dest='exclude_routes',
+            help="Route name to skip (repeatable), e.g. token_obtain_pair whose passwords were redacted",
+        )
+        parser.add_argument('--no-auth', action='store_true', help="Send every request anonymously")
+        parser.add_argument('--output', help="Write raw per-route results to this JSON file")
+        parser.add_argument('--baseline', help="Results file of a previous run to compare against")
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0 or options['concurrency'] < 1:
+            raise CommandError("--speed must be >= 0 and --concurrency >= 1")
+        records = load_records(options['captures'], set(options['exclude_routes']))
+        replayable = [record for record in records if record.get('path')]
+        if len(replayable) < len(records):
+            self.stdout.write(f"Skipping {len(records) - len(replayable)} requests whose URL carried a secret")
+        if options['limit']:
+            replayable = replayable[:options['limit']]
+        if not replayable:
+            raise CommandError("Nothing to replay")
+
+        tokens = None
+        if not options['no_auth']:
+            # ผู้ใช้ replay ถูกสร้างในฐานข้อมูลที่คำสั่งนี้ใช้ ซึ่งต้องเป็นฐานเดียวกับของ --target
+            tokens = ReplayTokens()
+            self.stdout.write(f"Prepared {tokens.prepare(replayable)} replay users")
+
+        results, elapsed, max_lag = self.replay(replayable, tokens, options)
+        self.stdout.write(
+            f"{len(replayable)} requests in {elapsed:.1f}s ({len(replayable) / elapsed:.1f} req/s), "
+            f"max schedule lag {max_lag * 1000:.0f} ms"
+        )
+        output = {'target': options['target'], 'speed': options['speed'], 'routes': results}
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(output, f)
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['routes']
+        self.report(results, baseline)
+
+    def replay(self, records, tokens, options):
+        local = threading.local()
+        slots = threading.BoundedSemaphore(options['concurrency'])
+        results = {}
+        results_lock = threading.Lock()
+        target = urlsplit(options['target'].rstrip('/'))
+        connection_class = http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+
+        def send(record):
+            try:
+                outcome, latency = request(record)
+                with results_lock:
+                    route = results.setdefault(route_key(record), {'latencies': [], 'statuses': {}})
+                    route['latencies'].append(latency)
+                    route['statuses'][str(outcome)] = route['statuses'].get(str(outcome), 0) + 1
+            finally:
+                slots.release()
+
+        def request(record):
+            # connection แบบ keep-alive หนึ่งเส้นต่อ thread
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = connection_class(target.netloc, timeout=options['timeout'])
+            path = target.path + record['path']
+            if record.get('query'):
+                path += '?' + urlencode(record['query'], doseq=True)
+            headers = {'Accept': 'application/json'}
+            body = None
+            if record.get('body') is not None:
+                body = json.dumps(record['body']).encode()
+                headers['Content-Type'] = 'application/json'
+            if tokens is not None:
+                headers.update(tokens.header(record.get('user')))
+            started = time.perf_counter()
+            try:
+                conn.request(record['method'], path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                outcome = response.status
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                outcome = type(exc).__name__
+            return outcome, time.perf_counter() - started
+
+        first_ts = records[0]['ts']
+        max_lag = 0.0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for record in records:
+                if options['speed']:
+                    due = started + (record['ts'] - first_ts) / options['speed']
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                slots.acquire()
+                if options['speed']:
+                    # ช้ากว่ากำหนดเมื่อ --concurrency เต็มหรือเครื่องที่ replay ตามไม่ทัน
+                    max_lag = max(max_lag, time.perf_counter() - due)
+                pool.submit(send, record)
+        return results, time.perf_counter() - started, max_lag
+
+    def report(self, results, baseline=None):
+        header = f"{'route':<44} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9}"
+        if baseline is not None:
+            header += f" {'base p50':>9} {'Δp50':>8} {'base p95':>9} {'Δp95':>8}"
+        self.stdout.write(header)
+        for key in sorted(results):
+            latencies = [latency * 1000 for latency in results[key]['latencies']]
+            errors = sum(
+                count for outcome, count in results[key]['statuses'].items()
+                if not outcome.isdigit() or int(outcome) >= 500
+            )
+            p50, p95 = statistics.median(latencies), percentile(latencies, 95)
+            line = f"{key:<44} {len(latencies):>6} {errors:>6} {p50:>9.1f} {p95:>9.1f}"
+            if baseline is not None:
+                base = [latency * 1000 for latency in baseline.get(key, {}).get('latencies', [])]
+                if base:
+                    base_p50, base_p95 = statistics.median(base), percentile(base, 95)
+                    line += (
+                        f" {base_p50:>9.1f} {(p50 - base_p50) / base_p50:>+8.0%}"
+                        f" {base_p95:>9.1f} {(p95 - base_p95) / base_p95:>+8.0%}"
+                    )
+                else:
+                    line += f" {'-':>9} {'new':>8} {'-':>9} {'':>8}"
+            self.stdout.write(line)
@@ -0,0 +1,213 @@
+"""
+Media and digital-download delivery.
+
+``serve_file`` is used both for public media (product images, replacing
+``django.conf.urls.static``) and for private digital downloads. Depending
+on ``MEDIA_DELIVERY_MODE`` it either streams the file itself or hands
+the transfer to the front-end server:
+
+* ``'django'``: ``FileResponse``, which WSGI servers with
+  ``wsgi.file_wrapper`` (gunicorn, uWSGI) send with ``sendfile()``.
+  Single-range ``Range`` requests get a 206 whose body is the file
+  seeked to the range start (``FileRange``). gunicorn sends it with
+  ``sendfile()`` from that offset for ``Content-Length`` bytes; uWSGI's
+  wrapper always sends whole files, so set ``MEDIA_RANGE_SENDFILE =
+  False`` there and ranges are read in Python instead.
+* ``'x-accel'``: an empty response with ``X-Accel-Redirect`` pointing at
+  an ``internal`` nginx location (``MEDIA_ACCEL_PREFIX`` /
+  ``MEDIA_ACCEL_PRIVATE_PREFIX``) that maps to the same directory.
+* ``'x-sendfile'``: an empty response with ``X-Sendfile`` set to the
+  absolute path (Apache mod_xsendfile, lighttpd).
+
+In the offload modes the front-end server handles ranges and
+conditional requests; in ``'django'`` mode they are handled here
+(``ETag``/``Last-Modified``, ``If-None-Match``/``If-Modified-Since``,
+``If-Range``).
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+re_range = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_delivery_mode():
+    return getattr(settings, 'MEDIA_DELIVERY_MODE', 'django')
+
+
+def get_private_root():
+    return str(getattr(settings, 'PRIVATE_MEDIA_ROOT', settings.BASE_DIR / 'private_media'))
+
+
+def get_cache_max_age():
+    return getattr(settings, 'MEDIA_CACHE_MAX_AGE', 86400)
+
+
+def private_storage():
+    """Storage ของไฟล์ที่ห้ามเปิดผ่าน MEDIA_URL (ไฟล์ของสินค้าดิจิทัล)"""
+    return FileSystemStorage(location=get_private_root(), base_url=None)
+
+
+def parse_range(header, size):
+    """
+    คืนค่า (start, end) แบบรวมปลาย, None ถ้าไม่ใช้ range หรือ ValueError ถ้าขอเกินขนาดไฟล์
+
+    Only a single byte range is supported; anything else is answered
+    with the whole file, which RFC 9110 allows.
+    """
+    match = re_range.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start > end:
+            raise ValueError(header)
+    else:
+        # bytes=-N คือ N ไบต์สุดท้าย
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        start, end = max(size - length, 0), size - 1
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def get_range_sendfile():
+    return getattr(settings, 'MEDIA_RANGE_SENDFILE', True)
+
+
+class FileRange:
+    """
+    file-like ที่อ่านได้ไม่เกิน ``length`` ไบต์จากตำแหน่งปัจจุบันของ ``file``
+
+    It has no ``seek``/``tell``, so ``FileResponse`` leaves
+    ``Content-Length`` to the caller. ``fileno`` is only exposed by
+    ``SendfileRange``.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class SendfileRange(FileRange):
+    """FileRange ที่ให้ ``wsgi.file_wrapper`` ส่งด้วย sendfile() จาก offset ปัจจุบันได้"""
+
+    def fileno(self):
+        return self.file.fileno()
+
+
+def open_range(path, start, length):
+    f = open(path, 'rb')
+    f.seek(start)
+    return (SendfileRange if get_range_sendfile() else FileRange)(f, length)
+
+
+def _range_applies(request, etag, last_modified):
+    """If-Range: ใช้ range เฉพาะเมื่อไฟล์ยังเป็นเวอร์ชันเดียวกับที่ client มี"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, root, relative_path, accel_prefix=None, filename=None, public=True):
+    """
+    ส่งไฟล์ ``relative_path`` ภายใต้ ``root``
+
+    ``filename`` makes the response an attachment with that name;
+    ``public`` controls whether shared caches may store it.
+    """
+    try:
+        path = safe_join(root, relative_path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found")
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found")
+    if not os.path.isfile(path):
+        raise Http404("File not found")
+
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = '"%x-%x"' % (stat.st_mtime_ns, size)
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        mode = get_delivery_mode()
+        if mode == 'x-accel':
+            response = HttpResponse(content_type=content_type)
+            prefix = accel_prefix or getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = quote(posixpath.join(prefix, relative_path.replace(os.sep, '/')))
+        elif mode == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        else:
+            response = _django_response(request, path, size, content_type, etag, last_modified)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if filename:
+        response['Content-Disposition'] = "attachment; filename*=UTF-8''%s" % quote(filename)
+    if public:
+        patch_cache_control(response, public=True, max_age=get_cache_max_age())
+    else:
+        patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+def _django_response(request, path, size, content_type, etag, last_modified):
+    byte_range = None
+    if request.method == 'GET' and _range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        # Content-Disposition แบบ attachment ใส่ใน serve_file
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(open_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def media_view(request, path):
+    """ส่งไฟล์ใน MEDIA_ROOT (รูปสินค้า) แทน django.conf.urls.static"""
+    return serve_file(request, str(settings.MEDIA_ROOT), path)
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    'application/json',
+    'application/msgpack',
+    'application/vnd.nextmart.columnar+json',
+    'application/vnd.oai.openapi',
+    'application/javascript',
+    'application/xml',
+    'text/',
+)
+
+
+def parse_accept_encoding(header):
+    """คืนค่า dict ของ content-coding -> q จาก Accept-Encoding"""
+    qualities = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    return qualities
+
+
+def choose_encoding(header, available):
+    """
+    เลือก coding ใน available ที่ client ให้ q สูงสุด หรือ None ถ้ารับไม่ได้เลย
+
+    ``q=0`` means the coding is refused; ``*`` covers codings not listed.
+    Ties go to the earlier entry in ``available``.
+    """
+    qualities = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = qualities.get(coding, qualities.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    บีบอัด response ด้วย brotli (ถ้าติดตั้งไว้) หรือ gzip
+
+    Only non-streaming responses at least ``RESPONSE_COMPRESSION_MIN_SIZE``
+    bytes long with a compressible content type are compressed; smaller
+    bodies cost more CPU than the bytes they would save.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'RESPONSE_COMPRESSION_BROTLI_QUALITY', 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if response.status_code in (204, 206, 304):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return response
+        if len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        available = ('br', 'gzip') if brotli is not None else ('gzip',)
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), available)
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        elif encoding == 'gzip':
+            compressed = compress_string(response.content)
+        else:
+            return response
+
+        # บีบแล้วใหญ่กว่าเดิมก็ส่งแบบไม่บีบ
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(response.content))
+        response.headers['Content-Encoding'] = encoding
+
+        # ETag เดิมอ้างถึงเนื้อหาที่ยังไม่บีบอัด จึงต้องเป็น weak ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,279 @@
+"""
+On-demand sampling profiler for single requests.
+
+A request is profiled when it carries ``X-Profile: 1`` or is picked by
+``PROFILING_SAMPLE_RATE``. While the view runs, a background thread reads
+the request thread's stack every ``PROFILING_INTERVAL`` seconds
+(``sys._current_frames``) and counts folded stacks, so the request itself
+only pays for the sampling thread. Two kinds of synthetic frames make
+the flame graph readable:
+
+* ``[field] ReviewSerializer.user`` while a serializer field is being
+  rendered, and
+* ``[sql] SELECT ... FROM "products_product" ...`` while a query runs
+  (every query's count and total time is recorded as well).
+
+The header is honoured only for staff: its JWT is checked before the
+request is profiled, and for anyone else the header is ignored so it
+cannot be used to put profiling overhead on arbitrary requests. Profiles are JSON
+files in ``PROFILING_DIR``, of which the newest ``PROFILING_MAX_PROFILES``
+are kept, and are served to admins under ``/api/profiles/``
+(``<id>/folded/`` gives flamegraph.pl / speedscope input).
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+FIELD_FUNCTIONS = {'to_representation', 'get_attribute'}
+SQL_LABEL_LENGTH = 80
+
+re_profile_id = re.compile(r'^[0-9]{14}-[0-9a-f]{8}$')
+re_whitespace = re.compile(r'\s+')
+
+
+def get_sample_rate():
+    return getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+
+
+def get_interval():
+    return getattr(settings, 'PROFILING_INTERVAL', 0.005)
+
+
+def get_profile_dir():
+    return str(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'var' / 'profiles'))
+
+
+def get_max_profiles():
+    return getattr(settings, 'PROFILING_MAX_PROFILES', 200)
+
+
+def sql_label(sql):
+    return '[sql] ' + re_whitespace.sub(' ', sql).strip().replace(';', ',')[:SQL_LABEL_LENGTH]
+
+
+def frame_label(frame):
+    code = frame.f_code
+    if code.co_name in FIELD_FUNCTIONS:
+        field = frame.f_locals.get('self')
+        parent = getattr(field, 'parent', None)
+        if getattr(field, 'field_name', None) and parent is not None:
+            return f'[field] {type(parent).__name__}.{field.field_name}'
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_name}"
+
+
+class Sampler(threading.Thread):
+    """เก็บ stack ของ thread ที่ระบุเป็นระยะ"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.current_sql = None
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                if frame.f_globals.get('__name__') != __name__:
+                    labels.append(frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            sql = self.current_sql
+            if sql:
+                labels.append(sql_label(sql))
+            self.stacks[';'.join(labels)] += 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+class RequestProfile:
+    """Context manager ที่รัน Sampler และจับเวลาคิวรีระหว่างประมวลผล request"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or get_interval()
+        self.sampler = Sampler(threading.get_ident(), self.interval)
+        self.queries = {}
+        self.duration = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        self.sampler.current_sql = sql
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sampler.current_sql = None
+            stats = self.queries.setdefault(sql, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self.record_query))
+        self.started = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+        self.stack.close()
+        return False
+
+    def as_dict(self, request, response, trigger):
+        queries = sorted(
+            ({'sql': sql, 'count': count, 'time': total} for sql, (count, total) in self.queries.items()),
+            key=lambda query: query['time'], reverse=True,
+        )
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'trigger': trigger,
+            'user': getattr(getattr(request, 'user', None), 'pk', None),
+            'started_at': timezone.now().isoformat(),
+            'duration': self.duration,
+            'interval': self.interval,
+            'samples': sum(self.sampler.stacks.values()),
+            'query_count': sum(query['count'] for query in queries),
+            'query_time': sum(query['time'] for query in queries),
+            'queries': queries,
+            'stacks': dict(self.sampler.stacks.most_common()),
+        }
+
+
+def store_profile(data):
+    """เขียนโปรไฟล์ลงดิสก์และลบโปรไฟล์เก่าที่เกิน PROFILING_MAX_PROFILES คืนค่า id"""
+    directory = get_profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    data = {'id': profile_id, **data}
+    tmp_path = os.path.join(directory, f'.{profile_id}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, os.path.join(directory, f'{profile_id}.json'))
+
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in names[:-get_max_profiles()]:
+        try:
+            os.unlink(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    return profile_id
+
+
+def is_staff_request(request):
+    """ตรวจ JWT ใน Authorization ว่าเป็น staff หรือไม่ (ก่อนถึง view จึงต้องตรวจเอง)"""
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return result is not None and result[0].is_staff
+
+
+def load_profile(profile_id):
+    if not re_profile_id.match(profile_id):
+        raise Http404("Profile not found")
+    try:
+        with open(os.path.join(get_profile_dir(), f'{profile_id}.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise Http404("Profile not found")
+
+
+class ProfilingMiddleware:
+    """
+    โปรไฟล์ request ที่ส่ง ``X-Profile: 1`` (เฉพาะ staff) หรือถูกสุ่มตาม PROFILING_SAMPLE_RATE
+
+    The response of a stored profile carries ``X-Profile-Id``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.META.get(PROFILE_HEADER) == '1' and is_staff_request(request):
+            trigger = 'header'
+        elif random.random() < get_sample_rate():
+            trigger = 'sampled'
+        else:
+            return self.get_response(request)
+
+        with RequestProfile() as profile:
+            response = self.get_response(request)
+        response['X-Profile-Id'] = store_profile(profile.as_dict(request, response, trigger))
+        return response
+
+
+class ProfileListView(APIView):
+    """รายการโปรไฟล์ที่เก็บไว้ (ใหม่สุดก่อน)"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    summary_fields = (
+        'id', 'method', 'path', 'status', 'trigger', 'started_at', 'duration', 'samples', 'query_count', 'query_time',
+    )
+
+    def get(self, request):
+        directory = get_profile_dir()
+        try:
+            names = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+        except FileNotFoundError:
+            names = []
+        profiles = []
+        for name in names:
+            try:
+                data = load_profile(name[:-len('.json')])
+            except Http404:
+                # ถูกลบไปแล้วระหว่างอ่าน
+                continue
+            profiles.append({field: data.get(field) for field in self.summary_fields})
+        return Response(profiles)
+
+
+class ProfileDetailView(APIView):
+    """โปรไฟล์หนึ่งรายการ รวม stack ทั้งหมดและสถิติคิวรี"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, profile_id):
+        return Response(load_profile(profile_id))
+
+
+class ProfileFoldedView(APIView):
+    """ดาวน์โหลด stack แบบ ``frame;frame;frame count`` สำหรับ flamegraph.pl หรือ speedscope"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, profile_id):
+        data = load_profile(profile_id)
+        lines = ''.join(f'{stack} {count}\n' for stack, count in data['stacks'].items())
+        response = HttpResponse(lines, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{profile_id}.folded"'
+        return response
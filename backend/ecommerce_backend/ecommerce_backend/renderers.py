@@ -0,0 +1,79 @@
+"""
+Alternative response renderers for high-volume API clients.
+
+JSON stays the default renderer. Clients opt in to the compact formats
+through the ``Accept`` header or the ``?format=`` query parameter:
+
+    Accept: application/msgpack                        -> MessagePackRenderer
+    Accept: application/vnd.nextmart.columnar+json     -> ColumnarJSONRenderer
+"""
+import datetime
+import decimal
+import uuid
+
+import msgpack
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+def _msgpack_default(obj):
+    """แปลงชนิดข้อมูลที่ msgpack ไม่รู้จัก"""
+    if isinstance(obj, decimal.Decimal):
+        # เป็นสตริงเหมือน COERCE_DECIMAL_TO_STRING เพื่อไม่ให้ราคาเพี้ยนเป็น float
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render the response data as MessagePack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    JSON where every list of same-shaped objects is sent as
+    ``{"columns": [...], "rows": [[...], ...]}`` so keys appear only once.
+
+    Lists whose objects do not share the same keys are left untouched.
+    """
+    media_type = 'application/vnd.nextmart.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(self.to_columnar(data), accepted_media_type, renderer_context)
+
+    @classmethod
+    def to_columnar(cls, value):
+        if isinstance(value, dict):
+            return {key: cls.to_columnar(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            if value and all(isinstance(item, dict) for item in value):
+                columns = list(value[0].keys())
+                if all(list(item.keys()) == columns for item in value):
+                    return {
+                        'columns': columns,
+                        'rows': [[cls.to_columnar(item[key]) for key in columns] for item in value],
+                    }
+            return [cls.to_columnar(item) for item in value]
+        return value
@@ -0,0 +1,177 @@
+"""
+OpenAPI schema served from a prebuilt artifact.
+
+``manage.py build_openapi_schema`` generates the schema once at build or
+deploy time and writes ``OPENAPI_SCHEMA_PATH`` plus ``.gz``/``.br``
+siblings. ``schema_view`` serves those bytes with a content hash ETag
+(so clients revalidate with a 304) in whichever precompressed encoding
+the client accepts.
+
+When the artifact is missing and drf-spectacular is installed, the
+schema is generated in-process on the first request and kept for the
+life of the worker, so introspection still happens at most once.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from .middleware import choose_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPE = 'application/vnd.oai.openapi+json'
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+def get_schema_path():
+    return str(getattr(settings, 'OPENAPI_SCHEMA_PATH', settings.BASE_DIR / 'var' / 'openapi.json'))
+
+
+def get_max_age():
+    return getattr(settings, 'OPENAPI_SCHEMA_MAX_AGE', 300)
+
+
+class SchemaArtifact:
+    def __init__(self, content, encoded=None, stat=None):
+        self.content = content
+        self.etag = 'W/"%s"' % hashlib.sha256(content).hexdigest()[:32]
+        self.encoded = encoded if encoded is not None else compress(content)
+        self.stat = stat
+
+    def body(self, accept_encoding):
+        """คืนค่า (bytes, content-encoding) ตามที่ client รับได้"""
+        encoding = choose_encoding(accept_encoding, [e for e in ('br', 'gzip') if e in self.encoded])
+        if encoding is None:
+            return self.content, None
+        return self.encoded[encoding], encoding
+
+
+def compress(content):
+    encoded = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(content, quality=11)
+    return encoded
+
+
+def generate_schema():
+    """สร้าง schema ด้วย drf-spectacular (ต้องใช้ settings ที่มี drf_spectacular)"""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return OpenApiJsonRenderer().render(schema, renderer_context={})
+
+
+def write_artifact(content, path=None):
+    """เขียน schema และไฟล์ที่บีบอัดแล้วแบบ atomic"""
+    path = path or get_schema_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # ไฟล์บีบอัดเขียนก่อน ไฟล์หลักเขียนท้ายสุด เพราะ reader ดู mtime ของไฟล์หลัก
+    files = [(path + ENCODING_SUFFIXES[encoding], data) for encoding, data in compress(content).items()]
+    files.append((path, content))
+    for target, data in files:
+        tmp_path = f'{target}.tmp{os.getpid()}'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            # ไม่ทิ้งไฟล์ชั่วคราวไว้ถ้าเขียนไม่สำเร็จ (เช่น ดิสก์เต็ม)
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    return path
+
+
+_lock = threading.Lock()
+_artifact = None
+_generated = None
+
+
+def load_artifact(path=None):
+    """
+    Artifact จากไฟล์ หรือ None ถ้ายังไม่ได้ build
+
+    The file is re-read only when its mtime or size changes.
+    """
+    global _artifact
+    path = path or get_schema_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    artifact = _artifact
+    if artifact is not None and artifact.stat == key:
+        return artifact
+    with open(path, 'rb') as f:
+        content = f.read()
+    encoded = {}
+    decompressors = {'gzip': gzip.decompress, 'br': brotli.decompress if brotli else None}
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if decompressors[encoding] is None:
+            continue
+        try:
+            with open(path + suffix, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            encoded = None
+            break
+        # ไฟล์บีบอัดต้องตรงกับไฟล์หลัก (เช่น build ค้างกลางทาง) ไม่งั้นบีบใหม่ในหน่วยความจำ
+        if decompressors[encoding](data) != content:
+            encoded = None
+            break
+        encoded[encoding] = data
+    artifact = SchemaArtifact(content, encoded=encoded, stat=key)
+    _artifact = artifact
+    return artifact
+
+
+def get_artifact():
+    global _generated
+    artifact = load_artifact()
+    if artifact is not None:
+        return artifact
+    if not apps.is_installed('drf_spectacular'):
+        return None
+    if _generated is None:
+        with _lock:
+            if _generated is None:
+                _generated = SchemaArtifact(generate_schema())
+    return _generated
+
+
+def schema_view(request):
+    """ส่ง OpenAPI schema ที่ build ไว้แล้ว พร้อม ETag และการบีบอัด"""
+    artifact = get_artifact()
+    if artifact is None:
+        return JsonResponse(
+            {"detail": "OpenAPI schema has not been built. Run manage.py build_openapi_schema."},
+            status=404
+        )
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    tags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)] if if_none_match else []
+    if '*' in tags or artifact.etag.removeprefix('W/') in tags:
+        # 304 ต้องมี header แคชเหมือน 200 (RFC 9110 §15.4.5)
+        response = HttpResponseNotModified()
+    else:
+        body, encoding = artifact.body(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        response = HttpResponse(body, content_type=CONTENT_TYPE)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = artifact.etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, public=True, max_age=get_max_age())
+    return response
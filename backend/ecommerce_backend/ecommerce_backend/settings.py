@@ -45,10 +45,15 @@ INSTALLED_APPS = [
     'users',
     'products',
     'orders',
+    'carts',
+    'ecommerce_backend',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ecommerce_backend.profiling.ProfilingMiddleware',
+    'ecommerce_backend.traffic.TrafficCaptureMiddleware',
+    'ecommerce_backend.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.common.CommonMiddleware',
@@ -98,6 +103,8 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+DATABASE_ROUTERS = ['orders.routers.OrderArchiveRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -138,6 +145,62 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media and digital-download delivery (ecommerce_backend.media)
+PRIVATE_MEDIA_ROOT = BASE_DIR / 'private_media'
+MEDIA_DELIVERY_MODE = 'django'  # 'django' | 'x-accel' (nginx) | 'x-sendfile'
+MEDIA_ACCEL_PREFIX = '/protected-media/'  # nginx internal location for MEDIA_ROOT
+MEDIA_ACCEL_PRIVATE_PREFIX = '/protected-downloads/'  # nginx internal location for PRIVATE_MEDIA_ROOT
+MEDIA_CACHE_MAX_AGE = 86400  # seconds
+MEDIA_RANGE_SENDFILE = True  # let wsgi.file_wrapper sendfile() Range responses (False under uWSGI)
+DOWNLOAD_LINK_MAX_AGE = 300  # seconds a signed download link stays valid
+
+# Catalog snapshot (products.snapshot)
+CATALOG_SNAPSHOT_ENABLED = True
+CATALOG_SNAPSHOT_PATH = BASE_DIR / 'var' / 'catalog.snapshot'
+CATALOG_SNAPSHOT_DEBOUNCE_SECONDS = 1  # wait after a product change so a burst of edits is one rebuild
+CATALOG_SNAPSHOT_MAX_AGE = 300  # seconds; older snapshots are not served (None to disable)
+
+# Search-box suggestions (products.suggest)
+SUGGEST_REBUILD_INTERVAL = 60  # seconds between full rebuilds of each worker's index
+SUGGEST_MAX_LIMIT = 20
+
+# "Customers also bought" model (products.recommendations)
+RECOMMENDATIONS_MATRIX_PATH = BASE_DIR / 'var' / 'copurchase.npz'
+RECOMMENDATIONS_TOP_K = 20
+
+# Catalog ranking for ?sort=popular|trending (products.ranking)
+RANKING_TRENDING_HALF_LIFE = timedelta(days=7)
+RANKING_RATING_WEIGHT = 1.0
+
+# Helpful-vote counter shards per review (products.helpful)
+HELPFUL_COUNTER_SHARDS = 16
+
+# Review moderation (products.moderation, manage.py publish_reviews)
+REVIEW_BANNED_WORDS = []
+REVIEW_MAX_COMMENT_LENGTH = 5000
+
+# Prebuilt OpenAPI schema (ecommerce_backend.schema, manage.py build_openapi_schema)
+OPENAPI_SCHEMA_PATH = BASE_DIR / 'var' / 'openapi.json'
+OPENAPI_SCHEMA_MAX_AGE = 300  # seconds
+
+# Per-request sampling profiler (ecommerce_backend.profiling); staff trigger it with "X-Profile: 1"
+PROFILING_SAMPLE_RATE = 0.0  # fraction of all requests profiled automatically
+PROFILING_INTERVAL = 0.005  # seconds between stack samples
+PROFILING_DIR = BASE_DIR / 'var' / 'profiles'
+PROFILING_MAX_PROFILES = 200
+
+# Traffic capture for manage.py replay_traffic (ecommerce_backend.traffic)
+TRAFFIC_CAPTURE_SAMPLE_RATE = 0.0  # fraction of /api/ requests written to the capture log
+TRAFFIC_CAPTURE_PATH = BASE_DIR / 'var' / 'traffic' / 'capture.ndjson'  # each process writes capture.<pid>.ndjson
+TRAFFIC_CAPTURE_MAX_BYTES = 50 * 1024 * 1024  # rotate after this size
+TRAFFIC_CAPTURE_BACKUP_COUNT = 10
+TRAFFIC_CAPTURE_KEY = None  # HMAC key for user pseudonyms; defaults to SECRET_KEY
+
+# Bulk user import (users.provisioning, manage.py import_users)
+USER_IMPORT_WORKERS = None  # password-hashing processes; None = CPU count
+USER_IMPORT_BATCH_SIZE = 1000  # rows per bulk_create
+USER_IMPORT_MAX_ROWS = 10000  # per request to /api/auth/admin/import/
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -150,8 +213,36 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON ยังเป็นค่าเริ่มต้น ส่วน msgpack/columnar ต้องขอผ่าน Accept หรือ ?format=
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'ecommerce_backend.renderers.MessagePackRenderer',
+        'ecommerce_backend.renderers.ColumnarJSONRenderer',
+    ),
 }
 
+# Response compression (ecommerce_backend.middleware.CompressionMiddleware)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024  # bytes
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 5
+
+# Idempotency-Key for order creation (orders.idempotency)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_WAIT_TIMEOUT = 10  # seconds a duplicate waits for the in-flight request
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # seconds before an in-flight key is considered abandoned
+
+# Server-side carts (carts.services)
+CART_TTL = timedelta(days=30)
+
+# Order event stream (orders.events)
+# Readers skip events younger than this, so an order transaction that commits
+# later than this after inserting its event may be missed by cursors past it.
+ORDER_EVENTS_SETTLE_SECONDS = 2
+
+# Order archive (orders.archive, manage.py archive_orders)
+ORDERS_HOT_DAYS = 90
+ORDERS_ARCHIVE_DATABASE = 'default'  # or a separate alias in DATABASES
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -183,6 +274,8 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+    'x-profile',
 ]
 
 
@@ -0,0 +1,47 @@
+"""
+API-only settings for JWT-only worker processes.
+
+    DJANGO_SETTINGS_MODULE=ecommerce_backend.settings_api gunicorn ecommerce_backend.wsgi
+
+Inherits everything from ``settings`` and drops what these workers never
+use: the admin, sessions, messages, static files, CSRF/clickjacking
+middleware, templates, the browsable API and drf-spectacular. The
+OpenAPI schema is not introspected here; build it once with the full
+settings and the API workers serve the file::
+
+    python manage.py build_openapi_schema
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+API_UNUSED_APPS = {
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'drf_spectacular',
+}
+
+API_UNUSED_MIDDLEWARE = {
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_UNUSED_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in API_UNUSED_MIDDLEWARE]
+
+ROOT_URLCONF = 'ecommerce_backend.urls_api'
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    key: value for key, value in REST_FRAMEWORK.items()
+    # ใช้ AutoSchema ของ DRF เอง (โหลดเมื่อถูกเรียกใช้เท่านั้น)
+    if key != 'DEFAULT_SCHEMA_CLASS'
+}
+REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = tuple(
+    renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+    if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+)
@@ -0,0 +1,531 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+import msgpack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponse, QueryDict, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from products.models import Product
+
+from . import admin as large_admin
+from . import media, middleware, profiling, schema, settings_api, traffic
+from .management.commands.replay_traffic import load_records
+from .renderers import ColumnarJSONRenderer, MessagePackRenderer
+
+User = get_user_model()
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw')
+
+    def paginator(self, queryset):
+        return large_admin.EstimatedCountPaginator(queryset.order_by('id'), 2)
+
+    def test_uses_estimate_for_large_unfiltered_tables(self):
+        with mock.patch.object(large_admin, 'estimated_count', return_value=50000) as estimate:
+            self.assertEqual(self.paginator(User.objects.all()).count, 50000)
+        estimate.assert_called_once_with(User, 'default')
+
+    def test_counts_small_tables_exactly(self):
+        with mock.patch.object(large_admin, 'estimated_count', return_value=10):
+            self.assertEqual(self.paginator(User.objects.all()).count, 3)
+
+    def test_counts_filtered_querysets_exactly(self):
+        with mock.patch.object(large_admin, 'estimated_count', return_value=50000) as estimate:
+            self.assertEqual(self.paginator(User.objects.filter(username='user1')).count, 1)
+        estimate.assert_not_called()
+
+    def test_falls_back_without_statistics(self):
+        # SQLite ไม่มีสถิติจำนวนแถว
+        self.assertIsNone(large_admin.estimated_count(User))
+        self.assertEqual(self.paginator(User.objects.all()).count, 3)
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(media.parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(media.parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(media.parse_range('bytes=50-500', 100), (50, 99))
+        self.assertEqual(media.parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(media.parse_range('bytes=-500', 100), (0, 99))
+
+    def test_unsupported_ranges_serve_the_whole_file(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-5', 'bytes=a-b'):
+            self.assertIsNone(media.parse_range(header, 100), header)
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=100-', 'bytes=200-300', 'bytes=9-5', 'bytes=-0'):
+            with self.assertRaises(ValueError, msg=header):
+                media.parse_range(header, 100)
+
+
+class ServeFileTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.content = bytes(range(256)) * 4
+        with open(os.path.join(self.root, 'manual.pdf'), 'wb') as f:
+            f.write(self.content)
+        self.factory = RequestFactory()
+
+    def serve(self, **headers):
+        response = media.serve_file(self.factory.get('/media/manual.pdf', **headers), self.root, 'manual.pdf')
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_whole_file(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(self.body(response), self.content)
+
+    def test_range_is_a_seeked_file_response(self):
+        response = self.serve(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+        # wsgi.file_wrapper ส่งจาก offset ปัจจุบันของ fd
+        self.assertEqual(os.lseek(response.file_to_stream.fileno(), 0, os.SEEK_CUR), 10)
+        self.assertEqual(self.body(response), self.content[10:20])
+
+    @override_settings(MEDIA_RANGE_SENDFILE=False)
+    def test_range_without_sendfile(self):
+        response = self.serve(HTTP_RANGE='bytes=-4')
+        self.assertFalse(hasattr(response.file_to_stream, 'fileno'))
+        self.assertEqual(self.body(response), self.content[-4:])
+
+    def test_multi_range_gets_whole_file(self):
+        response = self.serve(HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range_mismatch_ignores_range(self):
+        response = self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+
+    def test_conditional_requests(self):
+        first = self.serve()
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.serve(HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        self.assertEqual(self.serve(HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code, 200)
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-accel', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel(self):
+        response = self.serve(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/manual.pdf')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.serve()
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.root, 'manual.pdf'))
+
+    def test_private_attachment(self):
+        request = self.factory.get('/download/')
+        response = media.serve_file(request, self.root, 'manual.pdf', filename='manual.pdf', public=False)
+        response.close()
+        self.assertEqual(response['Content-Disposition'], "attachment; filename*=UTF-8''manual.pdf")
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_paths_outside_root_are_not_found(self):
+        for path in ('../etc/passwd', 'missing.pdf', ''):
+            with self.assertRaises(Http404, msg=path):
+                media.serve_file(self.factory.get('/'), self.root, path)
+
+
+class AcceptEncodingTests(SimpleTestCase):
+    def test_choose_encoding(self):
+        cases = [
+            ('gzip, deflate, br', 'br'),
+            ('br;q=0, gzip', 'gzip'),
+            ('gzip;q=0', None),
+            ('gzip; q=1.0, br;q=0.5', 'gzip'),
+            ('*', 'br'),
+            ('*, br;q=0', 'gzip'),
+            ('BR;Q=0.2', 'br'),
+            ('gzip;q=abc', None),
+            ('identity', None),
+            ('', None),
+        ]
+        for header, expected in cases:
+            self.assertEqual(middleware.choose_encoding(header, ('br', 'gzip')), expected, header)
+
+    def test_unavailable_codings_are_skipped(self):
+        self.assertEqual(middleware.choose_encoding('br, gzip;q=0.1', ('gzip',)), 'gzip')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps([{'id': i, 'name': 'Keyboard'} for i in range(100)]).encode()
+
+    def process(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware.CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=None, **headers):
+        return HttpResponse(self.body if body is None else body, content_type='application/json', headers=headers)
+
+    def test_compresses_with_weak_etag(self):
+        response = self.process(self.json_response(ETag='"abc"'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_weak_etag_is_kept(self):
+        self.assertEqual(self.process(self.json_response(ETag='W/"abc"'))['ETag'], 'W/"abc"')
+
+    @mock.patch.object(middleware, 'brotli', None)
+    def test_falls_back_to_gzip_without_brotli(self):
+        self.assertEqual(self.process(self.json_response(), 'br, gzip;q=0.5')['Content-Encoding'], 'gzip')
+
+    def test_refused_coding_is_not_used(self):
+        response = self.process(self.json_response(), 'gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1024)
+    def test_small_bodies_are_not_compressed(self):
+        response = self.process(self.json_response(b'{"id": 1}'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_content_type(self):
+        image = HttpResponse(self.body, content_type='image/png')
+        self.assertFalse(self.process(image).has_header('Content-Encoding'))
+        text = HttpResponse(self.body, content_type='text/csv')
+        self.assertEqual(self.process(text)['Content-Encoding'], 'gzip')
+
+    def test_skipped_responses(self):
+        streaming = StreamingHttpResponse(iter([self.body]), content_type='application/json')
+        self.assertFalse(self.process(streaming).has_header('Content-Encoding'))
+        not_modified = self.json_response()
+        not_modified.status_code = 304
+        self.assertFalse(self.process(not_modified).has_header('Content-Encoding'))
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=0)
+    def test_incompressible_body_is_sent_as_is(self):
+        body = os.urandom(64)
+        response = self.process(self.json_response(body))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, body)
+
+
+class RendererTests(TestCase):
+    def test_msgpack_keeps_decimals_exact(self):
+        data = {
+            'price': Decimal('19.99'),
+            'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5),
+            'tags': {'a'},
+        }
+        unpacked = msgpack.unpackb(MessagePackRenderer().render(data), raw=False)
+        self.assertEqual(unpacked, {'price': '19.99', 'created_at': '2024-01-02T03:04:05', 'tags': ['a']})
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+    def test_columnar(self):
+        data = {
+            'results': [{'id': 1, 'tags': [{'n': 'a'}]}, {'id': 2, 'tags': []}],
+            'mixed': [{'id': 1}, {'name': 'x'}],
+            'plain': [1, 2],
+        }
+        self.assertEqual(ColumnarJSONRenderer.to_columnar(data), {
+            'results': {'columns': ['id', 'tags'], 'rows': [[1, {'columns': ['n'], 'rows': [['a']]}], [2, []]]},
+            'mixed': [{'id': 1}, {'name': 'x'}],
+            'plain': [1, 2],
+        })
+
+    def test_negotiation(self):
+        Product.objects.create(name='Pen', description='d', price=Decimal('1.50'), category='physical', stock=1)
+        client = APIClient()
+        packed = client.get('/api/products/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(packed['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(packed.content, raw=False)[0]['price'], '1.50')
+
+        columnar = client.get('/api/products/?format=columnar')
+        self.assertEqual(columnar['Content-Type'], 'application/vnd.nextmart.columnar+json')
+        body = columnar.json()
+        self.assertEqual(dict(zip(body['columns'], body['rows'][0]))['price'], '1.50')
+
+
+class SchemaViewTests(SimpleTestCase):
+    content = json.dumps({'openapi': '3.0.3', 'paths': {f'/api/{i}/': {} for i in range(50)}}).encode()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(directory.name, 'openapi.json')
+        settings_override = override_settings(OPENAPI_SCHEMA_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema.write_artifact(self.content)
+        patcher = mock.patch.object(schema, '_artifact', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **headers):
+        return schema.schema_view(RequestFactory().get('/api/schema/', **headers))
+
+    def test_encoding_selection(self):
+        cases = [('', None), ('gzip', 'gzip'), ('gzip, br', 'br'), ('br;q=0, gzip', 'gzip'), ('gzip;q=0', None)]
+        for accept_encoding, expected in cases:
+            response = self.get(HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertEqual(response.get('Content-Encoding'), expected, accept_encoding)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(self.get(HTTP_ACCEPT_ENCODING='gzip').content), self.content)
+        self.assertEqual(self.get().content, self.content)
+
+    def test_not_modified_keeps_cache_headers(self):
+        etag = self.get()['ETag']
+        for if_none_match in (etag, etag.removeprefix('W/'), '"other", ' + etag, '*'):
+            response = self.get(HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(response.status_code, 304, if_none_match)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_rebuilt_artifact_changes_etag(self):
+        etag = self.get()['ETag']
+        schema.write_artifact(self.content + b' ')
+        self.assertNotEqual(self.get()['ETag'], etag)
+
+    def test_stale_compressed_file_is_not_served(self):
+        with open(self.path + '.gz', 'wb') as f:
+            f.write(gzip.compress(b'{}'))
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzip.decompress(response.content), self.content)
+
+    def test_failed_write_leaves_no_temp_files(self):
+        before = sorted(os.listdir(self.directory))
+        with mock.patch.object(schema.os, 'replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                schema.write_artifact(b'{}')
+        self.assertEqual(sorted(os.listdir(self.directory)), before)
+
+
+class TrafficScrubTests(SimpleTestCase):
+    def test_secrets_are_redacted(self):
+        scrubbed = traffic.scrub({
+            'password': 'hunter2', 'refresh': 'jwt', 'items': [{'token': 't', 'quantity': 2}], 'note': 'ok',
+        })
+        self.assertEqual(scrubbed, {
+            'password': '[redacted]', 'refresh': '[redacted]', 'items': [{'token': '[redacted]', 'quantity': 2}],
+            'note': 'ok',
+        })
+
+    def test_personal_fields_are_pseudonymized(self):
+        scrubbed = traffic.scrub({'username': 'alice', 'email': 'alice@example.com', 'first_name': '', 'phone_number': None})
+        alias = traffic.pseudonym('alice')
+        self.assertEqual(scrubbed['username'], f'u{alias}')
+        self.assertEqual(scrubbed['email'], f"{traffic.pseudonym('alice@example.com')}@example.invalid")
+        self.assertEqual(scrubbed['first_name'], '')
+        self.assertIsNone(scrubbed['phone_number'])
+        self.assertNotIn('alice', json.dumps(scrubbed))
+
+    def test_scrub_query(self):
+        query = QueryDict('email=a@example.com&email=b@example.com&token=abc&sort=price')
+        self.assertEqual(traffic.scrub_query(query), {
+            'email': [f"{traffic.pseudonym(email)}@example.invalid" for email in ('a@example.com', 'b@example.com')],
+            'token': ['[redacted]'],
+            'sort': ['price'],
+        })
+
+    def test_pseudonyms_are_stable_per_key(self):
+        self.assertEqual(traffic.pseudonym(42), traffic.pseudonym('42'))
+        self.assertNotEqual(traffic.pseudonym('alice'), traffic.pseudonym('bob'))
+        with override_settings(TRAFFIC_CAPTURE_KEY='other'):
+            other = traffic.pseudonym('alice')
+        self.assertNotEqual(other, traffic.pseudonym('alice'))
+        with override_settings(TRAFFIC_CAPTURE_KEY='other'):
+            self.assertEqual(traffic.pseudonym('alice'), other)
+
+
+class TrafficCaptureFileTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(TRAFFIC_CAPTURE_PATH=os.path.join(self.directory, 'capture.ndjson'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for name, value in (('_logger', None), ('_logger_pid', None)):
+            patcher = mock.patch.object(traffic, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.close_handlers)
+
+    def close_handlers(self):
+        logger = logging.getLogger('ecommerce_backend.traffic.capture')
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
+
+    def test_each_process_writes_its_own_file(self):
+        with mock.patch.object(traffic.os, 'getpid', return_value=100):
+            traffic.get_capture_logger().info('{"from": 100}')
+        # process ลูกหลัง fork ได้ pid ใหม่ จึงเปิดไฟล์ใหม่และไม่เขียนไฟล์ของ parent ต่อ
+        with mock.patch.object(traffic.os, 'getpid', return_value=101):
+            logger = traffic.get_capture_logger()
+            logger.info('{"from": 101}')
+        self.assertEqual(len(logger.handlers), 1)
+        with open(os.path.join(self.directory, 'capture.100.ndjson')) as f:
+            self.assertEqual(f.read(), '{"from": 100}\n')
+        with open(os.path.join(self.directory, 'capture.101.ndjson')) as f:
+            self.assertEqual(f.read(), '{"from": 101}\n')
+
+    def write(self, name, *records):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+            f.write('\n')
+        return path
+
+    def test_load_records_merges_processes_by_start_time(self):
+        first = self.write('capture.1.ndjson', {'ts': 3, 'route': 'a', 'n': 1}, {'ts': 5, 'route': 'b', 'n': 2})
+        rotated = self.write('capture.1.ndjson.1', {'ts': 1, 'route': 'a', 'n': 3})
+        second = self.write('capture.2.ndjson', {'ts': 3, 'route': 'a', 'n': 4}, {'ts': 2, 'route': 'b', 'n': 5})
+        records = load_records([first, rotated, second])
+        # เวลาเท่ากันคงลำดับของไฟล์ที่ส่งเข้ามา
+        self.assertEqual([record['n'] for record in records], [3, 5, 1, 4, 2])
+        self.assertEqual([record['n'] for record in load_records([first, rotated, second], {'b'})], [3, 1, 4])
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(PROFILING_DIR=self.directory, PROFILING_INTERVAL=0.001)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'pw')
+        Product.objects.create(name='Pen', description='d', price=Decimal('1.50'), category='physical')
+
+    def get(self, path, user=None, token=None, **headers):
+        client = APIClient()
+        if user is not None:
+            token = str(AccessToken.for_user(user))
+        if token is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client.get(path, **headers)
+
+    def test_header_profiles_staff_requests(self):
+        response = self.get('/api/products/', self.staff, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile = profiling.load_profile(response['X-Profile-Id'])
+        self.assertEqual((profile['trigger'], profile['path'], profile['status']), ('header', '/api/products/', 200))
+        self.assertGreaterEqual(profile['query_count'], 1)
+        self.assertTrue(all(query['sql'] for query in profile['queries']))
+
+    def test_header_is_ignored_for_other_requests(self):
+        cases = [
+            ('customer', self.get('/api/products/', self.customer, HTTP_X_PROFILE='1')),
+            ('invalid token', self.get('/api/products/', token='not-a-jwt', HTTP_X_PROFILE='1')),
+            ('anonymous', self.get('/api/products/', HTTP_X_PROFILE='1')),
+            ('other value', self.get('/api/products/', self.staff, HTTP_X_PROFILE='true')),
+        ]
+        for name, response in cases:
+            self.assertFalse(response.has_header('X-Profile-Id'), name)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests(self):
+        response = self.get('/api/products/')
+        self.assertEqual(profiling.load_profile(response['X-Profile-Id'])['trigger'], 'sampled')
+
+    @override_settings(PROFILING_MAX_PROFILES=3)
+    def test_store_profile_keeps_newest(self):
+        stamps = [f'2026101912000{i}' for i in range(5)]
+        with mock.patch.object(profiling.time, 'strftime', side_effect=stamps):
+            ids = [profiling.store_profile({'n': i}) for i in range(5)]
+        self.assertEqual(sorted(os.listdir(self.directory)), [f'{profile_id}.json' for profile_id in ids[2:]])
+        self.assertEqual(profiling.load_profile(ids[4])['n'], 4)
+
+    def test_load_profile_validates_id(self):
+        for profile_id in ('../../settings', '20261019120000', '20261019120000-ABCDEF12', '20261019120000-0123456'):
+            with self.assertRaises(Http404, msg=profile_id):
+                profiling.load_profile(profile_id)
+        with self.assertRaises(Http404):
+            profiling.load_profile('20261019120000-0123abcd')
+
+    def test_views_are_admin_only(self):
+        profile_id = profiling.store_profile({'method': 'GET', 'path': '/api/x/', 'stacks': {'a;b': 3, 'a': 1}})
+        paths = ['/api/profiles/', f'/api/profiles/{profile_id}/', f'/api/profiles/{profile_id}/folded/']
+        for path in paths:
+            self.assertEqual(self.get(path).status_code, 401, path)
+            self.assertEqual(self.get(path, self.customer).status_code, 403, path)
+            self.assertEqual(self.get(path, self.staff).status_code, 200, path)
+
+        listing = self.get(paths[0], self.staff).data
+        self.assertEqual([(row['id'], row['path']) for row in listing], [(profile_id, '/api/x/')])
+        self.assertEqual(self.get(paths[1], self.staff).data['stacks'], {'a;b': 3, 'a': 1})
+        folded = self.get(paths[2], self.staff)
+        self.assertEqual(folded.content, b'a;b 3\na 1\n')
+        self.assertEqual(self.get('/api/profiles/20261019120000-0123abcd/', self.staff).status_code, 404)
+
+
+class ApiSettingsTests(TestCase):
+    def test_api_settings_boot(self):
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'check', '--settings=ecommerce_backend.settings_api'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn('django.contrib.admin', settings_api.INSTALLED_APPS)
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', settings_api.MIDDLEWARE)
+        self.assertNotIn(
+            'rest_framework.renderers.BrowsableAPIRenderer', settings_api.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        )
+
+    @override_settings(
+        ROOT_URLCONF='ecommerce_backend.urls_api',
+        MIDDLEWARE=settings_api.MIDDLEWARE,
+        REST_FRAMEWORK=settings_api.REST_FRAMEWORK,
+    )
+    def test_serves_jwt_requests_without_sessions(self):
+        User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        client = APIClient()
+        token = client.post('/api/auth/token/', {'username': 'buyer', 'password': 'pw'}, format='json')
+        self.assertEqual(token.status_code, 200)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.data['access']}")
+
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 200)
+        # ไม่มี session ให้ logout ล้าง แต่ยังตอบสำเร็จ
+        logout = client.post('/api/auth/logout/')
+        self.assertEqual(logout.status_code, 200)
+        self.assertEqual(logout.data, {'message': 'User logged out successfully'})
+        self.assertFalse(hasattr(logout.wsgi_request, 'session'))
+        self.assertEqual(client.get('/admin/').status_code, 404)
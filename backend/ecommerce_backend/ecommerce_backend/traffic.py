@@ -0,0 +1,180 @@
+"""
+Production traffic capture for replay against staging.
+
+``TrafficCaptureMiddleware`` writes a ``TRAFFIC_CAPTURE_SAMPLE_RATE``
+sample of API requests as one JSON object per line. Each worker process
+writes its own file next to ``TRAFFIC_CAPTURE_PATH`` with the pid in the
+name (``capture.ndjson`` -> ``capture.<pid>.ndjson``), rotated by size
+(``logging.handlers.RotatingFileHandler``); one file shared between
+processes would lose records whenever two of them rotated it at once.
+A record holds the start time, method, resolved route name and URL
+kwargs, query string, JSON body, status and duration::
+
+    {"ts": 1760860800.12, "method": "GET", "route": "product-detail",
+     "kwargs": {"pk": 12}, "path": "/api/products/12/", "query": {},
+     "body": null, "user": "3f9c0e1a2b4d5c6e", "staff": false,
+     "status": 200, "duration": 0.0142}
+
+Nothing that authenticates a request is written: the Authorization
+header and cookies are dropped, and body/query fields that hold secrets
+(``SECRET_FIELDS``) become ``"[redacted]"``. Users are identified only by
+an HMAC of their id keyed with ``TRAFFIC_CAPTURE_KEY`` (the SECRET_KEY by
+default), and personal fields (``PSEUDONYMIZED_FIELDS``) are replaced by
+HMACs of their value, so the same customer maps to the same pseudonym
+throughout a capture without being identifiable. Requests whose URL
+itself carries a secret (signed download links) are recorded without a
+``path`` and are not replayable.
+
+``manage.py replay_traffic`` plays a capture back, merging the files of
+all processes by start time.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+REDACTED = '[redacted]'
+SECRET_FIELDS = {'password', 'password2', 'old_password', 'new_password', 'token', 'access', 'refresh', 'secret', 'key'}
+PSEUDONYMIZED_FIELDS = {'username', 'email', 'first_name', 'last_name', 'phone_number', 'address'}
+JSON_CONTENT_TYPE = 'application/json'
+
+_logger = None
+_logger_pid = None
+_logger_lock = threading.Lock()
+
+
+def get_sample_rate():
+    return getattr(settings, 'TRAFFIC_CAPTURE_SAMPLE_RATE', 0.0)
+
+
+def get_capture_path():
+    return Path(getattr(settings, 'TRAFFIC_CAPTURE_PATH', settings.BASE_DIR / 'var' / 'traffic' / 'capture.ndjson'))
+
+
+def get_path_prefixes():
+    return tuple(getattr(settings, 'TRAFFIC_CAPTURE_PATH_PREFIXES', ('/api/',)))
+
+
+def get_process_capture_path():
+    """ไฟล์ capture ของ process นี้: capture.ndjson -> capture.<pid>.ndjson"""
+    path = get_capture_path()
+    return path.with_name(f'{path.stem}.{os.getpid()}{path.suffix}')
+
+
+def get_max_body_size():
+    return getattr(settings, 'TRAFFIC_CAPTURE_MAX_BODY_SIZE', 64 * 1024)
+
+
+def pseudonym(value):
+    """HMAC ของค่าที่ระบุตัวบุคคล: ค่าเดิมได้ผลเดิมเสมอแต่ย้อนกลับไม่ได้"""
+    key = getattr(settings, 'TRAFFIC_CAPTURE_KEY', None) or settings.SECRET_KEY
+    return salted_hmac('ecommerce_backend.traffic', str(value), secret=key).hexdigest()[:16]
+
+
+def scrub(value, field=None):
+    """คัดลอก ``value`` โดยปิดค่าลับและแทนข้อมูลส่วนบุคคลด้วย pseudonym"""
+    if isinstance(value, dict):
+        return {key: scrub(item, key) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub(item, field) for item in value]
+    if field in SECRET_FIELDS:
+        return REDACTED
+    if field in PSEUDONYMIZED_FIELDS and value not in (None, ''):
+        alias = pseudonym(value)
+        # ยังเป็นอีเมลที่ผ่าน validation เมื่อ replay
+        return f'{alias}@example.invalid' if field == 'email' else f'u{alias}'
+    return value
+
+
+def scrub_query(query):
+    return {key: scrub(query.getlist(key), key) for key in query}
+
+
+def read_body(request):
+    """คืนค่า body แบบ JSON ที่ผ่าน scrub แล้ว หรือ None ถ้าไม่ใช่ JSON/ใหญ่เกินไป"""
+    if request.content_type != JSON_CONTENT_TYPE:
+        return None
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return None
+    if not length or length > get_max_body_size():
+        return None
+    try:
+        return scrub(json.loads(request.body))
+    except ValueError:
+        return None
+
+
+def get_capture_logger():
+    global _logger, _logger_pid
+    # process ที่ fork มา (เช่น gunicorn --preload) ต้องเปิดไฟล์ของตัวเอง
+    if _logger_pid != os.getpid():
+        with _logger_lock:
+            if _logger_pid != os.getpid():
+                path = get_process_capture_path()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=getattr(settings, 'TRAFFIC_CAPTURE_MAX_BYTES', 50 * 1024 * 1024),
+                    backupCount=getattr(settings, 'TRAFFIC_CAPTURE_BACKUP_COUNT', 10),
+                    encoding='utf-8',
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger = logging.getLogger('ecommerce_backend.traffic.capture')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                for inherited in logger.handlers[:]:
+                    logger.removeHandler(inherited)
+                    inherited.close()
+                logger.addHandler(handler)
+                _logger = logger
+                _logger_pid = os.getpid()
+    return _logger
+
+
+class TrafficCaptureMiddleware:
+    """บันทึก request ตัวอย่างตาม TRAFFIC_CAPTURE_SAMPLE_RATE ลงไฟล์ NDJSON สำหรับ replay_traffic"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(get_path_prefixes()) or random.random() >= get_sample_rate():
+            return self.get_response(request)
+
+        # อ่าน body ก่อน view เพราะ view ที่อ่าน stream เองจะทำให้อ่านซ้ำไม่ได้
+        body = read_body(request)
+        started = time.time()
+        response = self.get_response(request)
+        duration = time.time() - started
+
+        match = request.resolver_match
+        if match is None:
+            return response
+        kwargs = scrub(match.kwargs)
+        user = getattr(request, 'user', None)
+        authenticated = bool(getattr(user, 'is_authenticated', False))
+        record = {
+            'ts': round(started, 6),
+            'method': request.method,
+            'route': match.view_name,
+            'kwargs': kwargs,
+            # path ที่มีค่าลับ (เช่น token ดาวน์โหลด) replay ไม่ได้
+            'path': None if kwargs != match.kwargs else request.path,
+            'query': scrub_query(request.GET),
+            'body': body,
+            'user': pseudonym(user.pk) if authenticated else None,
+            'staff': authenticated and user.is_staff,
+            'status': response.status_code,
+            'duration': round(duration, 6),
+        }
+        get_capture_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+        return response
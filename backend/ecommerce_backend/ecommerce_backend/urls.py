@@ -15,10 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+import re
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
+from .media import media_view
+from .profiling import ProfileDetailView, ProfileFoldedView, ProfileListView
+from .schema import schema_view
 
 
 urlpatterns = [
@@ -26,6 +29,12 @@ urlpatterns = [
     path('api/products/', include('products.urls')),
     path('api/auth/', include('users.urls')),
     path('api/orders/', include('orders.urls')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/cart/', include('carts.urls')),
+    path('api/schema/', schema_view, name='schema'),
+    path('api/profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('api/profiles/<str:profile_id>/', ProfileDetailView.as_view(), name='profile-detail'),
+    path('api/profiles/<str:profile_id>/folded/', ProfileFoldedView.as_view(), name='profile-folded'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # ต่างจาก static() ที่ทำงานเฉพาะตอน DEBUG: ใช้ใน production ได้ (โหมด 'django' ส่งไฟล์เอง หรือ offload ให้ nginx)
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media_view, name='media'),
+]
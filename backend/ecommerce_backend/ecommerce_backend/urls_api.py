@@ -0,0 +1,22 @@
+"""
+URL configuration for API-only workers (``ecommerce_backend.settings_api``).
+
+Same API routes as ``urls`` without the admin, Swagger UI and media
+serving; the schema is served from the prebuilt file.
+"""
+from django.urls import path, include
+
+from .profiling import ProfileDetailView, ProfileFoldedView, ProfileListView
+from .schema import schema_view
+
+
+urlpatterns = [
+    path('api/products/', include('products.urls')),
+    path('api/auth/', include('users.urls')),
+    path('api/orders/', include('orders.urls')),
+    path('api/cart/', include('carts.urls')),
+    path('api/schema/', schema_view, name='schema'),
+    path('api/profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('api/profiles/<str:profile_id>/', ProfileDetailView.as_view(), name='profile-detail'),
+    path('api/profiles/<str:profile_id>/folded/', ProfileFoldedView.as_view(), name='profile-folded'),
+]
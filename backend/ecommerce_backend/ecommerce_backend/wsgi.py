@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_backend.settings')
 
 application = get_wsgi_application()
+
+# เริ่ม build index คำแนะนำการค้นหาตั้งแต่ worker เริ่ม ไม่ให้คำขอแรกได้ผลว่าง
+from products import suggest  # noqa: E402
+
+suggest.start()
@@ -1,6 +1,112 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
 
 # Register your models here.
-from .models import Order
+from ecommerce_backend.admin import LargeTableAdmin
+from products import ranking
+from . import events
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
 
-admin.site.register(Order)
\ No newline at end of file
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    autocomplete_fields = ['product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+def set_status(queryset, new_status):
+    """
+    เปลี่ยนสถานะหลายคำสั่งซื้อด้วย UPDATE เดียว
+
+    Still records a STATUS_CHANGED event per order and moves units in and
+    out of the sales ranking, like a change made through the API.
+    """
+    with transaction.atomic():
+        changes = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=queryset.values('pk')).exclude(status=new_status)
+            .values_list('id', 'user_id', 'status')
+        )
+        if changes:
+            Order.objects.filter(id__in=[order_id for order_id, _, _ in changes]).update(status=new_status)
+            events.record_status_changes(changes, new_status)
+            completed = [order_id for order_id, _, _ in changes] if new_status == 'completed' else []
+            uncompleted = [order_id for order_id, _, old_status in changes if old_status == 'completed']
+            if completed:
+                ranking.record_sales(OrderItem.objects.filter(order_id__in=completed))
+            if uncompleted:
+                ranking.record_sales(OrderItem.objects.filter(order_id__in=uncompleted), sign=-1)
+    return len(changes)
+
+
+def status_action(new_status, label):
+    def action(modeladmin, request, queryset):
+        changed = set_status(queryset, new_status)
+        modeladmin.message_user(request, f"{changed} orders marked as {new_status}.", messages.SUCCESS)
+    action.__name__ = f'mark_{new_status}'
+    return admin.action(description=label)(action)
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'status', 'total_price', 'created_at']
+    list_select_related = ['user']
+    # ทั้งสองฟิลด์มี index (status, created_at)
+    list_filter = ['status', 'created_at']
+    search_fields = ['=id', '=user__username']
+    autocomplete_fields = ['user']
+    ordering = ['-created_at']
+    inlines = [OrderItemInline]
+    actions = [
+        status_action('completed', "Mark selected orders as completed"),
+        status_action('cancelled', "Mark selected orders as cancelled"),
+        status_action('pending', "Mark selected orders as pending"),
+    ]
+
+    def save_model(self, request, obj, form, change):
+        # สถานะใหม่ใช้ผ่าน set_status หลังบันทึกรายการสินค้า (save_related) ให้ event และคะแนนขายตรงกับ API
+        if change and 'status' in form.changed_data:
+            obj.status = form.initial['status']
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        order = form.instance
+        if not change:
+            items = list(order.orderitem_set.all())
+            events.record_created(order, items)
+            if order.status == 'completed':
+                ranking.record_sales(items)
+            return
+        if any(formset.has_changed() for formset in formsets):
+            events.record_items_changed(order, order.orderitem_set.all())
+        if 'status' in form.changed_data:
+            set_status(Order.objects.filter(pk=order.pk), form.cleaned_data['status'])
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ['product_id', 'quantity']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    """คำสั่งซื้อใน archive (อ่านอย่างเดียว)"""
+    list_display = ['id', 'user_id', 'status', 'total_price', 'created_at', 'archived_at']
+    search_fields = ['=id', '=user_id']
+    ordering = ['-created_at']
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
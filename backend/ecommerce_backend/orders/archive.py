@@ -0,0 +1,129 @@
+"""
+Archival of old orders.
+
+Orders older than ``ORDERS_HOT_DAYS`` that are no longer pending are
+moved, in batches, from ``Order``/``OrderItem`` to ``ArchivedOrder``/
+``ArchivedOrderItem`` (on ``ORDERS_ARCHIVE_DATABASE``, see
+``orders.routers``). The hot tables and their indexes then only hold
+recent history.
+
+Reads go to the archive whenever the requested date range reaches back
+past the newest archived order (``needs_archive``), including ranges with
+no lower bound, so order history stays complete; only queries whose
+``since`` is newer than the archive (e.g. "recent orders") skip it.
+
+Each batch is copied first and deleted from the hot tables second. When
+the archive is a separate database the two steps cannot share a
+transaction; a batch interrupted between them is copied again (upsert) on
+the next run, and readers skip archived rows that are still hot.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from .routers import get_archive_database
+
+
+def get_hot_days():
+    return getattr(settings, 'ORDERS_HOT_DAYS', 90)
+
+
+def get_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(days=get_hot_days())
+
+
+def archive_orders(before=None, batch_size=1000):
+    """ย้ายคำสั่งซื้อที่สร้างก่อน ``before`` และไม่ใช่ pending ไปยัง archive คืนค่าจำนวนที่ย้าย"""
+    before = before or get_cutoff()
+    alias = get_archive_database()
+    moved = 0
+    while True:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update()
+                .filter(created_at__lt=before).exclude(status='pending')
+                .order_by('id').values_list('id', 'user_id', 'total_price', 'status', 'created_at')[:batch_size]
+            )
+            if not orders:
+                return moved
+            order_ids = [order[0] for order in orders]
+            items = list(
+                OrderItem.objects.filter(order_id__in=order_ids).values_list('id', 'order_id', 'product_id', 'quantity')
+            )
+            with transaction.atomic(using=alias):
+                ArchivedOrder.objects.using(alias).bulk_create(
+                    [
+                        ArchivedOrder(id=pk, user_id=user_id, total_price=total, status=order_status, created_at=created)
+                        for pk, user_id, total, order_status, created in orders
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['id'],
+                    update_fields=['user_id', 'total_price', 'status', 'created_at'],
+                )
+                ArchivedOrderItem.objects.using(alias).filter(order_id__in=order_ids).delete()
+                ArchivedOrderItem.objects.using(alias).bulk_create([
+                    ArchivedOrderItem(id=pk, order_id=order_id, product_id=product_id, quantity=quantity)
+                    for pk, order_id, product_id, quantity in items
+                ])
+            OrderItem.objects.filter(order_id__in=order_ids).delete()
+            # Review.order ถูกตั้งเป็น NULL ตาม on_delete ของ FK
+            Order.objects.filter(id__in=order_ids).delete()
+        moved += len(orders)
+
+
+def archive_watermark():
+    """created_at ของคำสั่งซื้อใหม่สุดใน archive (None ถ้ายังว่าง)"""
+    return ArchivedOrder.objects.aggregate(latest=Max('created_at'))['latest']
+
+
+def needs_archive(since):
+    """ช่วงเวลาที่เริ่มตั้งแต่ ``since`` (None คือไม่มีขอบล่าง) มีข้อมูลอยู่ใน archive หรือไม่"""
+    watermark = archive_watermark()
+    if watermark is None:
+        return False
+    return since is None or since <= watermark
+
+
+def archived_orders(user=None, since=None, until=None):
+    queryset = ArchivedOrder.objects.prefetch_related('items').order_by('id')
+    if user is not None:
+        queryset = queryset.filter(user_id=user.pk)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+def without_hot(archived):
+    """ตัดแถวที่ยังอยู่ในตารางหลัก (batch ที่ค้างระหว่างคัดลอกกับลบ) ออก"""
+    archived = list(archived)
+    if not archived:
+        return archived
+    hot = set(Order.objects.filter(id__in=[order.id for order in archived]).values_list('id', flat=True))
+    return [order for order in archived if order.id not in hot]
+
+
+def has_completed_purchase(user, product_id):
+    """ผู้ใช้เคยซื้อสินค้านี้ในคำสั่งซื้อที่ completed หรือไม่ (รวม archive)"""
+    if OrderItem.objects.filter(order__user=user, order__status='completed', product_id=product_id).exists():
+        return True
+    return ArchivedOrderItem.objects.filter(
+        order__user_id=user.pk, order__status='completed', product_id=product_id
+    ).exists()
+
+
+def purchased_product_ids(user):
+    """id ของสินค้าที่ผู้ใช้ซื้อในคำสั่งซื้อที่ completed (รวม archive)"""
+    ids = set(
+        OrderItem.objects.filter(order__user=user, order__status='completed').values_list('product_id', flat=True)
+    )
+    ids.update(
+        ArchivedOrderItem.objects.filter(order__user_id=user.pk, order__status='completed')
+        .values_list('product_id', flat=True)
+    )
+    return ids
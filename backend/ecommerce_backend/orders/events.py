@@ -0,0 +1,129 @@
+"""
+Append-only order event stream.
+
+Writers call ``record_event`` inside the same transaction as the order
+change, so an event exists if and only if the change was committed.
+Readers page through the stream by sequence number (``OrderEvent.id``)
+with ``read_events`` or keep a named, persisted position with
+``EventConsumer``.
+
+Known limit: sequence numbers are allocated when a row is inserted, not
+when its transaction commits, so a slow transaction can make a lower id
+visible after a higher one, and a cursor that has already moved past it
+will never see that event. Readers only see events whose ``created_at``
+is older than ``ORDER_EVENTS_SETTLE_SECONDS`` to cover the usual case.
+This is a heuristic, not a guarantee: an order transaction that stays
+open longer than the delay (lock waits, a slow payment call) can still
+commit an event below a cursor. Raise the setting above the longest
+order transaction you expect; consumers that must not miss a change
+should also reconcile against ``Order`` periodically.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OrderEvent, OrderEventCursor
+
+
+def get_settle_delay():
+    return timedelta(seconds=getattr(settings, 'ORDER_EVENTS_SETTLE_SECONDS', 2))
+
+
+def item_payload(items):
+    """รายการสินค้าในรูปแบบที่เก็บใน payload"""
+    return [{'product': item.product_id, 'quantity': item.quantity} for item in items]
+
+
+def record_event(order_id, event_type, **payload):
+    return OrderEvent.objects.create(order_id=order_id, event_type=event_type, payload=payload)
+
+
+def record_created(order, items):
+    return record_event(
+        order.id, OrderEvent.CREATED,
+        user_id=order.user_id,
+        status=order.status,
+        total_price=str(order.total_price),
+        items=item_payload(items),
+    )
+
+
+def record_status_changed(order, old_status):
+    return record_event(
+        order.id, OrderEvent.STATUS_CHANGED,
+        user_id=order.user_id,
+        old_status=old_status,
+        new_status=order.status,
+    )
+
+
+def record_status_changes(changes, new_status):
+    """บันทึก STATUS_CHANGED ของหลายคำสั่งซื้อพร้อมกัน ``changes`` คือ (order_id, user_id, old_status)"""
+    return OrderEvent.objects.bulk_create([
+        OrderEvent(
+            order_id=order_id, event_type=OrderEvent.STATUS_CHANGED,
+            payload={'user_id': user_id, 'old_status': old_status, 'new_status': new_status},
+        )
+        for order_id, user_id, old_status in changes
+    ])
+
+
+def record_items_changed(order, items):
+    return record_event(
+        order.id, OrderEvent.ITEMS_CHANGED,
+        user_id=order.user_id,
+        total_price=str(order.total_price),
+        items=item_payload(items),
+    )
+
+
+def read_events(after=0, limit=100, event_types=None):
+    """Events with ``id > after`` in sequence order, at most ``limit`` of them."""
+    queryset = OrderEvent.objects.filter(id__gt=after, created_at__lte=timezone.now() - get_settle_delay())
+    if event_types:
+        queryset = queryset.filter(event_type__in=event_types)
+    return list(queryset.order_by('id')[:limit])
+
+
+class EventConsumer:
+    """
+    อ่าน OrderEvent ต่อจากตำแหน่งล่าสุดของ consumer ชื่อ ``name``
+
+    Usage::
+
+        consumer = EventConsumer('recommendations')
+        for batch in consumer.batches(event_types=[OrderEvent.STATUS_CHANGED]):
+            ...  # apply the batch; the position is saved after each batch
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def position(self):
+        cursor, _ = OrderEventCursor.objects.get_or_create(name=self.name)
+        return cursor.position
+
+    def poll(self, limit=500, event_types=None):
+        return read_events(after=self.position, limit=limit, event_types=event_types)
+
+    def commit(self, position):
+        OrderEventCursor.objects.update_or_create(name=self.name, defaults={'position': position})
+
+    def batches(self, limit=500, event_types=None):
+        """
+        Yield batches until the stream is drained. The position advances
+        only after the caller's loop body for a batch finishes, so an
+        exception leaves the batch to be re-read next time.
+        """
+        after = self.position
+        while True:
+            events = read_events(after=after, limit=limit, event_types=event_types)
+            if not events:
+                return
+            yield events
+            after = events[-1].id
+            with transaction.atomic():
+                self.commit(after)
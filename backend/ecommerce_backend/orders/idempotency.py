@@ -0,0 +1,163 @@
+"""
+Idempotency-Key handling for order creation.
+
+The first request with a given key runs normally and its response is
+stored. Retries with the same key and body get the stored response back
+instead of creating another order. A retry that arrives while the first
+request is still running waits for it to finish.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_key_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+
+
+def get_wait_timeout():
+    return getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 10)
+
+
+def get_lock_timeout():
+    return getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60)
+
+
+def request_fingerprint(request):
+    """Hash ของ path + body ใช้ตรวจว่า key เดิมถูกใช้กับคำขอที่ต่างกันหรือไม่"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.path}\n{body}".encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user, key, fingerprint):
+    """
+    Return ``(record, owner)``. ``owner`` is True when this request must
+    run the handler, either because the key is new or because the
+    previous owner expired or abandoned it.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(user=user, key=key, request_hash=fingerprint)
+        return record, True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.get(user=user, key=key)
+
+    # key หมดอายุแล้ว (ยังไม่ถูก sweep) ให้เริ่มใหม่เหมือนเป็น key ใหม่
+    if record.created_at < now - get_key_ttl():
+        claimed = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).update(
+            request_hash=fingerprint, status='in_progress', response_status=None,
+            response_body=None, created_at=now, locked_at=now,
+        )
+        record.refresh_from_db()
+        return record, bool(claimed)
+
+    # เจ้าของเดิมค้างนานเกินไป (เช่น worker ตาย) ให้คำขอนี้รับช่วงต่อ
+    if (record.status == 'in_progress' and record.request_hash == fingerprint
+            and record.locked_at < now - timedelta(seconds=get_lock_timeout())):
+        claimed = IdempotencyKey.objects.filter(
+            pk=record.pk, status='in_progress', locked_at=record.locked_at,
+        ).update(locked_at=now)
+        record.refresh_from_db()
+        return record, bool(claimed)
+
+    return record, False
+
+
+def _wait_for_completion(record):
+    deadline = time.monotonic() + get_wait_timeout()
+    delay = 0.05
+    while record.status != 'completed' and time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        try:
+            record.refresh_from_db()
+        except IdempotencyKey.DoesNotExist:
+            return None
+    return record
+
+
+def run_idempotent(request, key, handler):
+    """
+    Run ``handler()`` at most once per ``(request.user, key)``.
+
+    Responses with a 5xx status and handlers that raise are not stored,
+    so the client can retry them with the same key.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {"error": f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fingerprint = request_fingerprint(request)
+    record, owner = _claim(request.user, key, fingerprint)
+
+    if not owner:
+        if record.request_hash != fingerprint:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} was already used with a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        record = _wait_for_completion(record)
+        if record is None:
+            # เจ้าของเดิมล้มเหลวและลบ key ทิ้งแล้ว ให้ลองใหม่อีกรอบ
+            return run_idempotent(request, key, handler)
+        if record.status == 'completed':
+            return _replay(record)
+        response = Response(
+            {"error": "A request with this Idempotency-Key is still in progress"},
+            status=status.HTTP_409_CONFLICT
+        )
+        response['Retry-After'] = '1'
+        return response
+
+    try:
+        response = handler()
+    except Exception:
+        record.delete()
+        raise
+
+    if response.status_code >= 500:
+        record.delete()
+        return response
+
+    record.status = 'completed'
+    record.response_status = response.status_code
+    record.response_body = response.data
+    record.save(update_fields=['status', 'response_status', 'response_body'])
+    return response
+
+
+def purge_expired_keys(batch_size=1000):
+    """ลบ key ที่หมดอายุทีละ batch คืนค่าจำนวนที่ลบ"""
+    cutoff = timezone.now() - get_key_ttl()
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import archive_orders, get_hot_days
+
+
+class Command(BaseCommand):
+    help = "Move completed/cancelled orders older than ORDERS_HOT_DAYS to the archive tables. Run periodically (e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive orders older than this many days (default: ORDERS_HOT_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_hot_days()
+        before = timezone.now() - timedelta(days=days)
+        moved = archive_orders(before=before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} orders created before {before:%Y-%m-%d %H:%M}"))
@@ -0,0 +1,66 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import export
+from orders.models import Order
+from orders.views import parse_moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream orders or order lines as CSV/NDJSON for accounting. Prints the cursor of the last row "
+        "written to stderr so an interrupted export can be continued with --after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-format', choices=sorted(export.EXPORT_FORMATS), default='csv')
+        parser.add_argument('--level', choices=sorted(export.LEVELS), default='lines')
+        parser.add_argument('--since', help="Orders created at or after this date/datetime")
+        parser.add_argument('--until', help="Orders created before this date/datetime")
+        parser.add_argument(
+            '--status', action='append', choices=[choice for choice, _ in Order.STATUS_CHOICES], default=[],
+            help="Only orders with this status (repeatable)",
+        )
+        parser.add_argument('--after', help="Resume after this cursor (order_id or order_id:item_id)")
+        parser.add_argument('--include-archive', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('-o', '--output', help="File to append to (default: stdout)")
+
+    def handle(self, *args, **options):
+        level = options['level']
+        try:
+            since = parse_moment(options['since']) if options['since'] else None
+            until = parse_moment(options['until']) if options['until'] else None
+            after = export.parse_cursor(options['after'], level) if options['after'] else None
+        except ValueError as exc:
+            raise CommandError(f"Invalid value: {exc}")
+
+        progress = {'rows': 0, 'last': None}
+
+        def tracked(rows):
+            for row in rows:
+                yield row
+                progress['rows'] += 1
+                progress['last'] = row
+
+        rows = export.export_rows(
+            level, since=since, until=until, statuses=options['status'], after=after,
+            include_archive=options['include_archive'], chunk_size=options['chunk_size'],
+        )
+        chunks = export.render(tracked(rows), options['output_format'], level)
+        if after is not None and options['output_format'] == 'csv':
+            # ต่อท้ายไฟล์เดิม ไม่ต้องเขียนหัวตารางซ้ำ
+            next(chunks)
+
+        # เปิดแบบ append เพื่อให้ resume ต่อไฟล์เดิมได้
+        out = open(options['output'], 'a', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+            last = progress['last']
+            cursor = export.format_cursor(last, level) if last is not None else options['after']
+            self.stderr.write(f"Wrote {progress['rows']} rows; last cursor: {cursor}")
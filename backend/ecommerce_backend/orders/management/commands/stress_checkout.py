@@ -0,0 +1,214 @@
+import multiprocessing
+import os
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+# ไม่ import models ที่ระดับ module: worker process (spawn) import module นี้ก่อน django.setup()
+
+# SELECT ... FOR UPDATE และคำสั่งเขียน คือจุดที่ต้องรอ lock (SQLite รอ lock ทั้งฐานข้อมูลที่คำสั่งเขียนแรก)
+LOCKING_PREFIXES = ('UPDATE', 'INSERT', 'DELETE')
+
+
+def is_locking(sql):
+    statement = sql.lstrip().upper()
+    return statement.startswith(LOCKING_PREFIXES) or 'FOR UPDATE' in statement
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def checkout_once(path, factory, user, product_id, quantity):
+    """ส่งคำขอ checkout หนึ่งครั้งผ่าน view จริง คืนค่า HTTP status"""
+    from rest_framework.test import force_authenticate
+    from carts.views import CartCheckoutView, CartItemView
+    from orders.views import OrderCreateView
+
+    if path == 'order':
+        request = factory.post('/api/orders/create/', {
+            'cartItems': [{'product': product_id, 'quantity': quantity}],
+            'total_price': '0',
+        }, format='json')
+        force_authenticate(request, user=user)
+        return OrderCreateView.as_view()(request).status_code
+
+    request = factory.post('/api/cart/items/', {'product': product_id, 'quantity': quantity}, format='json')
+    force_authenticate(request, user=user)
+    response = CartItemView.as_view()(request)
+    if response.status_code >= 400:
+        return response.status_code
+    request = factory.post('/api/cart/checkout/', {}, format='json')
+    force_authenticate(request, user=user)
+    return CartCheckoutView.as_view()(request).status_code
+
+
+def worker(index, user_id, product_id, options, barrier, results):
+    """รันใน process แยก: checkout ซ้ำ ``options['checkouts']`` ครั้ง"""
+    import django
+    django.setup()
+    from django.db import connection
+    from rest_framework.test import APIRequestFactory
+
+    lock_time = [0.0]
+
+    def timer(execute, sql, params, many, context):
+        if not is_locking(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            lock_time[0] += time.perf_counter() - started
+
+    user = get_user_model().objects.get(pk=user_id)
+    factory = APIRequestFactory()
+    samples = []
+    barrier.wait()
+    with connection.execute_wrapper(timer):
+        for _ in range(options['checkouts']):
+            lock_time[0] = 0.0
+            started = time.perf_counter()
+            try:
+                outcome = checkout_once(options['path'], factory, user, product_id, options['quantity'])
+            except Exception as exc:
+                outcome = type(exc).__name__
+            samples.append((outcome, time.perf_counter() - started, lock_time[0]))
+    connection.close()
+    results.put((index, samples))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent checkouts from several processes at one limited-stock product, "
+        "then check stock/total invariants and report throughput and lock wait time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 8))
+        parser.add_argument('--checkouts', type=int, default=20, help="Checkouts per worker")
+        parser.add_argument('--stock', type=int, default=50, help="Initial stock of the test product")
+        parser.add_argument('--quantity', type=int, default=1, help="Units per checkout")
+        parser.add_argument('--price', default='19.99')
+        parser.add_argument(
+            '--path', choices=['order', 'cart'], default='order',
+            help="order: POST /api/orders/create/; cart: add to cart + POST /api/cart/checkout/",
+        )
+        parser.add_argument('--keep', action='store_true', help="Keep the test product, users and orders")
+
+    def handle(self, *args, **options):
+        from orders.models import Order
+        from products.models import Product
+
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "SQLite serializes all writers; run against PostgreSQL for meaningful lock numbers."
+            ))
+
+        run = uuid.uuid4().hex[:8]
+        product = Product.objects.create(
+            name=f"stress-{run}", description="stress_checkout test product",
+            price=options['price'], category='physical', stock=options['stock'],
+        )
+        User = get_user_model()
+        users = []
+        for index in range(options['workers']):
+            user = User(username=f"stress-{run}-{index}", email=f"stress-{run}-{index}@example.invalid")
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users)
+        user_ids = list(User.objects.filter(username__startswith=f"stress-{run}-").values_list('id', flat=True))
+
+        try:
+            samples, elapsed = self.run_workers(user_ids, product.id, options)
+            self.report(samples, elapsed)
+            violations = self.check_invariants(product, user_ids, options['stock'])
+        finally:
+            if not options['keep']:
+                Order.objects.filter(user_id__in=user_ids).delete()
+                User.objects.filter(id__in=user_ids).delete()
+                product.delete()
+
+        if violations:
+            raise CommandError("Invariant violations:\n  " + "\n  ".join(violations))
+        self.stdout.write(self.style.SUCCESS("All invariants hold"))
+
+    def run_workers(self, user_ids, product_id, options):
+        # child process ต้องเปิด connection ของตัวเอง
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(len(user_ids) + 1)
+        results = context.Queue()
+        worker_options = {key: options[key] for key in ('checkouts', 'quantity', 'path')}
+        processes = [
+            context.Process(target=worker, args=(index, user_id, product_id, worker_options, barrier, results))
+            for index, user_id in enumerate(user_ids)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        started = time.perf_counter()
+        samples = []
+        for _ in processes:
+            samples.extend(results.get()[1])
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+        return samples, elapsed
+
+    def report(self, samples, elapsed):
+        outcomes = Counter(outcome for outcome, _, _ in samples)
+        succeeded = [sample for sample in samples if sample[0] == 201]
+        latencies = [latency * 1000 for _, latency, _ in samples]
+        lock_waits = [lock * 1000 for _, _, lock in samples]
+
+        self.stdout.write(f"{len(samples)} checkouts in {elapsed:.2f}s: " + ", ".join(
+            f"{outcome} x{count}" for outcome, count in sorted(outcomes.items(), key=str)
+        ))
+        self.stdout.write(f"  throughput       {len(succeeded) / elapsed:8.1f} successful checkouts/s")
+        self.stdout.write(
+            f"  latency          p50 {percentile(latencies, 50):7.1f} ms   p95 {percentile(latencies, 95):7.1f} ms"
+            f"   p99 {percentile(latencies, 99):7.1f} ms"
+        )
+        self.stdout.write(
+            f"  lock/write wait  p50 {percentile(lock_waits, 50):7.1f} ms   p95 {percentile(lock_waits, 95):7.1f} ms"
+            f"   total {sum(lock_waits) / 1000:.2f}s ({sum(lock_waits) / max(sum(latencies), 1e-9):.0%} of request time)"
+        )
+
+    def check_invariants(self, product, user_ids, initial_stock):
+        from orders.models import Order, OrderItem
+
+        product.refresh_from_db()
+        lines = list(
+            OrderItem.objects.filter(order__user_id__in=user_ids)
+            .exclude(order__status='cancelled')
+            .values_list('order_id', 'product_id', 'quantity', 'product__price')
+        )
+        sold = sum(quantity for _, product_id, quantity, _ in lines if product_id == product.id)
+        self.stdout.write(f"  stock            initial {initial_stock}, sold {sold}, remaining {product.stock}")
+
+        violations = []
+        if product.stock < 0:
+            violations.append(f"negative stock: {product.stock}")
+        if sold > initial_stock:
+            violations.append(f"oversold: {sold} units ordered from a stock of {initial_stock}")
+
+        expected = {}
+        for order_id, _, quantity, price in lines:
+            expected[order_id] = expected.get(order_id, 0) + price * quantity
+        totals = Order.objects.filter(id__in=list(expected)).values_list('id', 'total_price')
+        mismatched = [(order_id, total) for order_id, total in totals if total != expected[order_id]]
+        if mismatched:
+            order_id, total = mismatched[0]
+            violations.append(
+                f"{len(mismatched)} orders with total != sum(price * quantity), "
+                f"e.g. order {order_id}: {total} != {expected[order_id]}"
+            )
+        return violations
@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.events import EventConsumer, read_events
+from orders.serializers import OrderEventSerializer
+
+
+class Command(BaseCommand):
+    help = "Print order events as NDJSON, starting after a sequence number or a named consumer's position."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after', type=int, default=None, help="Start after this event id")
+        parser.add_argument('--consumer', help="Resume from (and save progress to) this named cursor")
+        parser.add_argument('--type', action='append', dest='event_types', help="Only this event type (repeatable)")
+        parser.add_argument('--limit', type=int, default=500, help="Events fetched per query")
+        parser.add_argument('--follow', action='store_true', help="Keep polling for new events")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --follow")
+
+    def handle(self, *args, **options):
+        if options['consumer'] and options['after'] is not None:
+            raise CommandError("Use either --after or --consumer, not both")
+
+        consumer = EventConsumer(options['consumer']) if options['consumer'] else None
+        after = consumer.position if consumer else (options['after'] or 0)
+
+        try:
+            while True:
+                events = read_events(after=after, limit=options['limit'], event_types=options['event_types'])
+                for event in events:
+                    self.stdout.write(json.dumps(OrderEventSerializer(event).data, default=str))
+                if events:
+                    after = events[-1].id
+                    if consumer:
+                        consumer.commit(after)
+                    continue
+                if not options['follow']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
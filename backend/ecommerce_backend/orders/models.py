@@ -15,7 +15,13 @@ class Order(models.Model):
     products = models.ManyToManyField(Product, through='OrderItem')
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='pending')
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # ตัวกรองสถานะใน admin เรียงตามวันที่
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
@@ -27,3 +33,92 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
+
+
+class IdempotencyKey(models.Model):
+    """ผลลัพธ์ของคำขอสร้างคำสั่งซื้อตาม Idempotency-Key สำหรับตอบซ้ำเมื่อ client retry"""
+    STATUS_CHOICES = [
+        ('in_progress', 'In progress'),
+        ('completed', 'Completed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    locked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+
+class OrderEvent(models.Model):
+    """
+    บันทึกเหตุการณ์ของคำสั่งซื้อแบบ append-only
+
+    ``id`` is the stream's sequence number. ``order_id`` is a plain
+    column rather than a foreign key so the log outlives the order rows.
+    """
+    CREATED = 'created'
+    STATUS_CHANGED = 'status_changed'
+    ITEMS_CHANGED = 'items_changed'
+    EVENT_CHOICES = [
+        (CREATED, 'Created'),
+        (STATUS_CHANGED, 'Status changed'),
+        (ITEMS_CHANGED, 'Items changed'),
+    ]
+
+    order_id = models.BigIntegerField(db_index=True)
+    event_type = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.event_type} order {self.order_id}"
+
+
+class OrderEventCursor(models.Model):
+    """ตำแหน่งล่าสุดที่ consumer แต่ละตัวอ่าน OrderEvent ไปแล้ว"""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    คำสั่งซื้อเก่าที่ย้ายออกจากตาราง Order (ดู orders.archive)
+
+    Keeps the original primary key. ``user_id`` is a plain column so the
+    archive can live in a separate database (``ORDERS_ARCHIVE_DATABASE``).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user_id = models.BigIntegerField(db_index=True)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=50, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived order {self.id}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product_id = models.BigIntegerField(db_index=True)
+    quantity = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id}"
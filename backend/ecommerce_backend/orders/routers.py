@@ -0,0 +1,44 @@
+"""
+Database router for the order archive.
+
+``ArchivedOrder`` and ``ArchivedOrderItem`` are read from, written to and
+migrated on ``ORDERS_ARCHIVE_DATABASE``. With the default setting
+(``'default'``) the archive tables sit next to the hot tables; point it
+at another alias in ``DATABASES`` to keep cold history on separate
+storage, then run ``manage.py migrate orders --database=<alias>``.
+"""
+from django.conf import settings
+
+ARCHIVE_MODELS = {'archivedorder', 'archivedorderitem'}
+
+
+def get_archive_database():
+    return getattr(settings, 'ORDERS_ARCHIVE_DATABASE', 'default')
+
+
+def is_archive_model(app_label, model_name):
+    return app_label == 'orders' and model_name in ARCHIVE_MODELS
+
+
+class OrderArchiveRouter:
+    def db_for_read(self, model, **hints):
+        if is_archive_model(model._meta.app_label, model._meta.model_name):
+            return get_archive_database()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        archived = [is_archive_model(obj._meta.app_label, obj._meta.model_name) for obj in (obj1, obj2)]
+        if all(archived):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = get_archive_database()
+        if model_name is not None and is_archive_model(app_label, model_name):
+            return db == alias
+        if alias != 'default' and db == alias:
+            # ฐานข้อมูล archive เก็บเฉพาะตาราง archive
+            return False
+        return None
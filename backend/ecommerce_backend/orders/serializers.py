@@ -1,12 +1,61 @@
 from rest_framework import serializers
-from .models import Order, OrderItem, Product
+from .models import Order, OrderItem, OrderEvent, ArchivedOrder, ArchivedOrderItem, Product
 from django.db import transaction
+from . import events
+from products import ranking
+from products.serializers import ProductSummarySerializer
 
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'quantity']
 
+class OrderItemExpandedSerializer(serializers.ModelSerializer):
+    product = ProductSummarySerializer(read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'quantity']
+
+class OrderExpandedSerializer(serializers.ModelSerializer):
+    """OrderSerializer แบบฝังข้อมูลสินค้า (?expand=product) ใช้อ่านอย่างเดียว"""
+    cartItems = OrderItemExpandedSerializer(source='orderitem_set', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'user', 'cartItems', 'total_price', 'status', 'created_at']
+        read_only_fields = fields
+
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+    product = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['id', 'product', 'quantity']
+
+    def get_product(self, item):
+        # ?expand=product: view ส่ง {product_id: Product} มาใน context
+        products = self.context.get('products')
+        if products is None:
+            return item.product_id
+        product = products.get(item.product_id)
+        return ProductSummarySerializer(product).data if product else None
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    """คำสั่งซื้อใน archive ในรูปแบบเดียวกับ OrderSerializer (อ่านอย่างเดียว)"""
+    user = serializers.IntegerField(source='user_id')
+    cartItems = ArchivedOrderItemSerializer(source='items', many=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'user', 'cartItems', 'total_price', 'status', 'created_at']
+        read_only_fields = fields
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderEvent
+        fields = ['id', 'order_id', 'event_type', 'payload', 'created_at']
+
 class OrderSerializer(serializers.ModelSerializer):
     cartItems = OrderItemSerializer(source='orderitem_set', many=True)
 
@@ -31,13 +80,42 @@ class OrderSerializer(serializers.ModelSerializer):
         with transaction.atomic():
             order = Order.objects.create(user=user, **validated_data)
             total_price = 0
+            items = []
             for item_data in items_data:
                 product = item_data['product']
                 quantity = item_data['quantity']
-                OrderItem.objects.create(order=order, product=product, quantity=quantity)
+                items.append(OrderItem.objects.create(order=order, product=product, quantity=quantity))
                 total_price += product.price * quantity
             order.total_price = total_price
             order.save()
+            events.record_created(order, items)
             if order.status == 'completed':
+                ranking.record_sales(items)
                 order.update_stock()
-        return order
\ No newline at end of file
+        return order
+
+    def update(self, instance, validated_data):
+        """อัปเดต Order และบันทึก event เมื่อสถานะหรือรายการสินค้าเปลี่ยน"""
+        items_data = validated_data.pop('orderitem_set', None)
+        old_status = instance.status
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            if items_data is not None:
+                instance.orderitem_set.all().delete()
+                items = OrderItem.objects.bulk_create([
+                    OrderItem(order=instance, product=item_data['product'], quantity=item_data['quantity'])
+                    for item_data in items_data
+                ])
+                instance.total_price = sum(item.product.price * item.quantity for item in items)
+            instance.save()
+            if items_data is not None:
+                events.record_items_changed(instance, items)
+            if instance.status != old_status:
+                events.record_status_changed(instance, old_status)
+                if 'completed' in (instance.status, old_status):
+                    ranking.record_sales(
+                        instance.orderitem_set.all(),
+                        sign=1 if instance.status == 'completed' else -1,
+                    )
+        return instance
\ No newline at end of file
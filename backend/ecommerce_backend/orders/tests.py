@@ -1,3 +1,381 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Product
+from . import export
+from .archive import archive_orders
+from .events import record_event
+from .models import ArchivedOrder, ArchivedOrderItem, IdempotencyKey, Order, OrderEvent, OrderItem
+
+User = get_user_model()
+
+
+class OrderTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.product = Product.objects.create(
+            name='Keyboard', description='d', price=Decimal('10.00'), category='physical', stock=100,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, quantity=1, order_status='completed', user=None):
+        order = Order.objects.create(
+            user=user or self.user, total_price=self.product.price * quantity, status=order_status,
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+        return order
+
+
+class OrderArchiveTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = self.create_order()
+        Order.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=200))
+        self.recent = self.create_order(quantity=2)
+        archive_orders()
+
+    def test_old_order_is_archived(self):
+        self.assertFalse(Order.objects.filter(pk=self.old.pk).exists())
+        self.assertTrue(ArchivedOrder.objects.filter(pk=self.old.pk).exists())
+
+    def test_default_list_includes_archived_orders(self):
+        response = self.client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['id'] for order in response.data], [self.old.pk, self.recent.pk])
+
+    def test_admin_list_includes_archived_orders(self):
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/orders/admin/')
+        self.assertEqual({order['id'] for order in response.data}, {self.old.pk, self.recent.pk})
+
+    def test_recent_since_skips_archive(self):
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = self.client.get(f'/api/orders/?since={since}')
+        self.assertEqual([order['id'] for order in response.data], [self.recent.pk])
+
+    def test_archived_order_detail(self):
+        response = self.client.get(f'/api/orders/{self.old.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.old.pk)
+
+    def test_expand_product_has_the_same_shape_for_hot_and_archived_orders(self):
+        response = self.client.get('/api/orders/?expand=product')
+        archived, hot = response.data
+        self.assertEqual((archived['id'], hot['id']), (self.old.pk, self.recent.pk))
+        self.assertEqual(set(archived), set(hot))
+        summary = {'id': self.product.pk, 'name': 'Keyboard', 'price': '10.00', 'category': 'physical', 'image': None}
+        for order in (archived, hot):
+            [item] = order['cartItems']
+            self.assertEqual(set(item), {'id', 'product', 'quantity'})
+            self.assertEqual(item['product'], summary)
+
+        detail = self.client.get(f'/api/orders/{self.old.pk}/?expand=product').data
+        self.assertEqual(detail['cartItems'][0]['product'], summary)
+        plain = self.client.get('/api/orders/').data
+        self.assertEqual([order['cartItems'][0]['product'] for order in plain], [self.product.pk] * 2)
+
+    def test_expand_product_of_a_deleted_product(self):
+        # สินค้าใน archive ไม่มี foreign key จึงอาจถูกลบไปแล้ว
+        ArchivedOrderItem.objects.filter(order_id=self.old.pk).update(product_id=999999)
+        response = self.client.get(f'/api/orders/{self.old.pk}/?expand=product')
+        self.assertIsNone(response.data['cartItems'][0]['product'])
+
+
+@override_settings(ORDER_EVENTS_SETTLE_SECONDS=0)
+class OrderEventListTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        order = self.create_order()
+        OrderEvent.objects.all().delete()
+        self.events = [record_event(order.id, OrderEvent.STATUS_CHANGED, step=step) for step in range(5)]
+
+    def test_pages_follow_the_cursor_in_order(self):
+        seen = []
+        cursor = 0
+        while True:
+            response = self.client.get(f'/api/orders/admin/events/?after={cursor}&limit=2')
+            self.assertEqual(response.status_code, 200)
+            if not response.data['events']:
+                break
+            seen += [event['id'] for event in response.data['events']]
+            cursor = response.data['next_cursor']
+        self.assertEqual(seen, [event.id for event in self.events])
+        self.assertEqual(cursor, self.events[-1].id)
+
+    def test_filters_by_type(self):
+        response = self.client.get('/api/orders/admin/events/?type=created')
+        self.assertEqual(response.data['events'], [])
+        self.assertEqual(response.data['next_cursor'], 0)
+
+    @override_settings(ORDER_EVENTS_SETTLE_SECONDS=60)
+    def test_recent_events_wait_for_the_settle_delay(self):
+        response = self.client.get('/api/orders/admin/events/')
+        self.assertEqual(response.data['events'], [])
+
+    def test_rejects_invalid_limit(self):
+        for limit in ('0', '-1', 'abc'):
+            response = self.client.get(f'/api/orders/admin/events/?limit={limit}')
+            self.assertEqual(response.status_code, 400, limit)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/orders/admin/events/')
+        self.assertEqual(response.status_code, 403)
+
+
+class OrderIdempotencyTests(OrderTestCase):
+    def order_body(self, quantity=1):
+        return {'cartItems': [{'product': self.product.id, 'quantity': quantity}], 'total_price': '0', 'status': 'pending'}
+
+    def post(self, body, key='key-1'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key is not None else {}
+        return self.client.post('/api/orders/create/', body, format='json', **headers)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post(self.order_body())
+        self.assertEqual(first.status_code, 201)
+        retry = self.post(self.order_body())
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        self.post(self.order_body())
+        response = self.post(self.order_body(quantity=2))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post(self.order_body())
+        self.client.force_authenticate(User.objects.create_user('other', 'other@example.com', 'pw'))
+        self.assertEqual(self.post(self.order_body()).status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_requests_without_a_key_are_not_deduplicated(self):
+        self.post(self.order_body(), key=None)
+        self.post(self.order_body(), key=None)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_invalid_key_is_rejected(self):
+        self.assertEqual(self.post(self.order_body(), key='').status_code, 400)
+        self.assertEqual(self.post(self.order_body(), key='k' * 256).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_retry_during_first_request_gets_conflict(self):
+        self.post(self.order_body())
+        IdempotencyKey.objects.update(status='in_progress', locked_at=timezone.now())
+        response = self.post(self.order_body())
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_abandoned_key_is_taken_over(self):
+        self.post(self.order_body())
+        IdempotencyKey.objects.update(status='in_progress', locked_at=timezone.now() - timedelta(minutes=5))
+        response = self.post(self.order_body())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status, 'completed')
+
+
+@override_settings(ORDER_EVENTS_SETTLE_SECONDS=0)
+class OrderAdminTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        self.order = self.create_order(quantity=2, order_status='pending')
+        self.item = self.order.orderitem_set.get()
+
+    def change_form(self, order_status, quantity=2):
+        return {
+            'user': self.user.pk, 'total_price': '20.00', 'status': order_status,
+            'orderitem_set-TOTAL_FORMS': '1', 'orderitem_set-INITIAL_FORMS': '1',
+            'orderitem_set-MIN_NUM_FORMS': '0', 'orderitem_set-MAX_NUM_FORMS': '1000',
+            'orderitem_set-0-id': self.item.pk, 'orderitem_set-0-order': self.order.pk,
+            'orderitem_set-0-product': self.product.pk, 'orderitem_set-0-quantity': quantity,
+        }
+
+    def event_types(self):
+        return list(OrderEvent.objects.filter(order_id=self.order.pk).values_list('event_type', flat=True))
+
+    def test_action_records_events_and_sales(self):
+        response = self.client.post('/admin/orders/order/', {
+            'action': 'mark_completed', '_selected_action': [self.order.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.order.status, 'completed')
+        self.assertEqual(self.event_types(), [OrderEvent.STATUS_CHANGED])
+        self.assertEqual(self.product.units_sold, 2)
+
+    def test_change_form_status_goes_through_set_status(self):
+        response = self.client.post(f'/admin/orders/order/{self.order.pk}/change/', self.change_form('completed'))
+        self.assertEqual(response.status_code, 302)
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.order.status, 'completed')
+        event = OrderEvent.objects.get(order_id=self.order.pk)
+        self.assertEqual(event.payload['old_status'], 'pending')
+        self.assertEqual(self.product.units_sold, 2)
+
+    def test_change_form_item_edit_records_items_changed(self):
+        self.client.post(f'/admin/orders/order/{self.order.pk}/change/', self.change_form('cancelled', quantity=3))
+        self.assertEqual(self.event_types(), [OrderEvent.ITEMS_CHANGED, OrderEvent.STATUS_CHANGED])
+        items_event = OrderEvent.objects.get(order_id=self.order.pk, event_type=OrderEvent.ITEMS_CHANGED)
+        self.assertEqual(items_event.payload['items'], [{'product': self.product.pk, 'quantity': 3}])
+
+    def test_unchanged_form_records_nothing(self):
+        self.client.post(f'/admin/orders/order/{self.order.pk}/change/', self.change_form('pending'))
+        self.assertEqual(self.event_types(), [])
+
+    def test_add_form_records_created_event(self):
+        response = self.client.post('/admin/orders/order/add/', {
+            'user': self.user.pk, 'total_price': '10.00', 'status': 'completed',
+            'orderitem_set-TOTAL_FORMS': '1', 'orderitem_set-INITIAL_FORMS': '0',
+            'orderitem_set-MIN_NUM_FORMS': '0', 'orderitem_set-MAX_NUM_FORMS': '1000',
+            'orderitem_set-0-product': self.product.pk, 'orderitem_set-0-quantity': 1,
+        })
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.latest('id')
+        event = OrderEvent.objects.get(order_id=order.pk)
+        self.assertEqual(event.event_type, OrderEvent.CREATED)
+        self.assertEqual(event.payload['items'], [{'product': self.product.pk, 'quantity': 1}])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.units_sold, 1)
+
+
+class OrderExportTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', is_staff=True)
+        self.mouse = Product.objects.create(name='Mouse', description='d', price=Decimal('2.50'), category='physical')
+        self.old = self.create_order(quantity=3)
+        Order.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=200))
+        archive_orders()
+        self.pending = self.create_order(order_status='pending')
+        OrderItem.objects.create(order=self.pending, product=self.mouse, quantity=2)
+        self.completed = self.create_order(quantity=2)
+        self.client.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.client.get('/api/orders/admin/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def ndjson(self, **params):
+        return [json.loads(line) for line in self.export(output='ndjson', **params).splitlines()]
+
+    def line_ids(self, rows):
+        return [(row['order_id'], row['item_id']) for row in rows]
+
+    def test_parse_cursor(self):
+        self.assertEqual(export.parse_cursor('12', 'orders'), (12,))
+        self.assertEqual(export.parse_cursor('12', 'lines'), (12,))
+        self.assertEqual(export.parse_cursor('12:34', 'lines'), (12, 34))
+        for value, level in (('12:34', 'orders'), ('1:2:3', 'lines'), ('-1', 'lines'), ('a', 'lines'), ('', 'orders')):
+            with self.assertRaises(ValueError, msg=value):
+                export.parse_cursor(value, level)
+
+    def test_csv_lines(self):
+        rows = list(csv.reader(io.StringIO(self.export())))
+        self.assertEqual(tuple(rows[0]), export.LINE_COLUMNS)
+        line = dict(zip(rows[0], rows[1]))
+        self.assertEqual(line['order_id'], str(self.pending.pk))
+        self.assertEqual(
+            (line['username'], line['product_name'], line['category'], line['unit_price'], line['quantity']),
+            ('buyer', 'Keyboard', 'physical', '10.00', '1'),
+        )
+        self.assertEqual(len(rows), 4)
+
+    def test_ndjson_orders(self):
+        rows = self.ndjson(level='orders')
+        self.assertEqual([tuple(row) for row in rows], [export.ORDER_COLUMNS] * 2)
+        self.assertEqual(
+            [(row['order_id'], row['item_count'], row['units']) for row in rows],
+            [(self.pending.pk, 2, 3), (self.completed.pk, 1, 2)],
+        )
+
+    def test_resume_after_cursor(self):
+        lines = self.ndjson()
+        first = f"{lines[0]['order_id']}:{lines[0]['item_id']}"
+        self.assertEqual(self.line_ids(self.ndjson(after=first)), self.line_ids(lines[1:]))
+        self.assertEqual(self.ndjson(after=str(self.pending.pk)), lines[2:])
+        orders = self.ndjson(level='orders', after=str(self.pending.pk))
+        self.assertEqual([row['order_id'] for row in orders], [self.completed.pk])
+
+    def test_invalid_parameters(self):
+        for params in ({'after': '1:x'}, {'level': 'orders', 'after': '1:2'}, {'status': 'lost'}, {'since': 'soon'}):
+            response = self.client.get('/api/orders/admin/export/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_status_and_date_filters(self):
+        self.assertEqual({row['order_id'] for row in self.ndjson(status='pending')}, {self.pending.pk})
+        self.assertEqual(
+            {row['order_id'] for row in self.ndjson(status='pending,completed', include_archive='1')},
+            {self.old.pk, self.pending.pk, self.completed.pk},
+        )
+        yesterday = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertEqual(
+            {row['order_id'] for row in self.ndjson(level='orders', since=yesterday, include_archive='1')},
+            {self.pending.pk, self.completed.pk},
+        )
+        self.assertEqual([row['order_id'] for row in self.ndjson(until=yesterday, include_archive='1')], [self.old.pk])
+
+    def test_include_archive_merges_in_order_without_duplicates(self):
+        # batch ที่คัดลอกไป archive แล้วแต่ยังไม่ถูกลบจากตารางหลัก
+        item = self.completed.orderitem_set.get()
+        ArchivedOrder.objects.create(
+            id=self.completed.pk, user_id=self.user.pk, total_price=self.completed.total_price,
+            status='completed', created_at=self.completed.created_at,
+        )
+        ArchivedOrderItem.objects.create(id=item.pk, order_id=self.completed.pk, product_id=self.product.pk, quantity=2)
+
+        lines = self.ndjson(include_archive='true')
+        self.assertEqual(self.line_ids(lines), sorted(set(self.line_ids(lines))))
+        self.assertEqual(
+            [row['order_id'] for row in lines], [self.old.pk, self.pending.pk, self.pending.pk, self.completed.pk]
+        )
+        archived = lines[0]
+        self.assertEqual(
+            (archived['username'], archived['product_name'], archived['unit_price'], archived['quantity']),
+            ('buyer', 'Keyboard', '10.00', 3),
+        )
+        orders = self.ndjson(level='orders', include_archive='true', after=str(self.old.pk))
+        self.assertEqual([row['order_id'] for row in orders], [self.pending.pk, self.completed.pk])
+
+    def test_command_resumes_into_the_same_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.csv')
+            stderr = io.StringIO()
+            call_command('export_orders', '--status', 'pending', '-o', path, stderr=stderr)
+            cursor = stderr.getvalue().strip().rsplit(' ', 1)[-1]
+            self.assertEqual(stderr.getvalue().strip(), f'Wrote 2 rows; last cursor: {cursor}')
+
+            call_command(
+                'export_orders', '--after', str(self.pending.pk), '--include-archive', '-o', path, stderr=io.StringIO()
+            )
+            with open(path, newline='') as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(tuple(rows[0]), export.LINE_COLUMNS)
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.pending.pk)] * 2 + [str(self.completed.pk)])
+
+    def test_command_rejects_invalid_cursor(self):
+        with self.assertRaises(CommandError):
+            call_command('export_orders', '--level', 'orders', '--after', '1:2', stderr=io.StringIO())
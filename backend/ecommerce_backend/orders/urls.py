@@ -1,10 +1,13 @@
 # backend/app/urls.py
 from django.urls import path
-from .views import OrderCreateView, AdminOrderView,OrderView
+from .views import OrderCreateView, AdminOrderView,OrderView, OrderEventListView, AdminOrderExportView
 
 urlpatterns = [
     path('', OrderView.as_view(), name='order-list'),
+    path('<int:pk>/', OrderView.as_view(), name='order-detail'),
     path('create/', OrderCreateView.as_view(), name='order-create'),
     path('admin/', AdminOrderView.as_view(), name='admin-order-list'),
     path('admin/<int:pk>/', AdminOrderView.as_view(), name='admin-order-detail'),
+    path('admin/events/', OrderEventListView.as_view(), name='admin-order-events'),
+    path('admin/export/', AdminOrderExportView.as_view(), name='admin-order-export'),
 ]
\ No newline at end of file
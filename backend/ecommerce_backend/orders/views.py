@@ -6,8 +6,86 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import Order
-from .serializers import OrderSerializer
+from datetime import datetime, time
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from products.models import Product
+from .models import Order, OrderItem, ArchivedOrder
+from .serializers import OrderSerializer, OrderExpandedSerializer, ArchivedOrderSerializer, OrderEventSerializer
+from . import archive, export
+from .events import read_events
+from .idempotency import IDEMPOTENCY_HEADER, run_idempotent
+
+
+def read_serializer(request, queryset):
+    """
+    เลือก serializer และ prefetch รายการสินค้าให้จำนวนคิวรีคงที่ไม่ว่าจะมีกี่คำสั่งซื้อ
+
+    ``?expand=product`` embeds a product summary in every cart item.
+    """
+    if request.query_params.get('expand') == 'product':
+        items = OrderItem.objects.select_related('product')
+        return OrderExpandedSerializer, queryset.prefetch_related(Prefetch('orderitem_set', queryset=items))
+    return OrderSerializer, queryset.prefetch_related('orderitem_set')
+
+
+def parse_moment(value):
+    """รับได้ทั้ง YYYY-MM-DD และ ISO 8601 datetime"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def date_range(request):
+    """อ่าน ?since= และ ?until= (ValueError ถ้ารูปแบบไม่ถูกต้อง)"""
+    since = request.query_params.get('since')
+    until = request.query_params.get('until')
+    return (parse_moment(since) if since else None), (parse_moment(until) if until else None)
+
+
+def history_response(request, orders, user=None):
+    """
+    รายการคำสั่งซื้อตามช่วงวันที่ รวมคำสั่งซื้อใน archive เมื่อจำเป็น
+
+    The archive is read unless ``?since=`` is newer than every archived
+    order (``?include_archive=true`` forces it); archived orders come first.
+    """
+    try:
+        since, until = date_range(request)
+    except ValueError:
+        return Response(
+            {"error": "since/until must be YYYY-MM-DD or an ISO 8601 datetime"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if since is not None:
+        orders = orders.filter(created_at__gte=since)
+    if until is not None:
+        orders = orders.filter(created_at__lt=until)
+    serializer_class, orders = read_serializer(request, orders)
+    data = serializer_class(orders, many=True).data
+
+    include_archive = request.query_params.get('include_archive', '').lower() in ('1', 'true', 'yes')
+    if include_archive or archive.needs_archive(since):
+        archived = archive.without_hot(archive.archived_orders(user=user, since=since, until=until))
+        data = archived_data(request, archived, many=True) + list(data)
+    return Response(data)
+
+
+def archived_data(request, archived, many=False):
+    context = {}
+    if request.query_params.get('expand') == 'product':
+        orders = archived if many else [archived]
+        product_ids = {item.product_id for order in orders for item in order.items.all()}
+        context['products'] = Product.objects.in_bulk(product_ids)
+    return ArchivedOrderSerializer(archived, many=many, context=context).data
 
 
 class OrderView(APIView):
@@ -20,33 +98,44 @@ class OrderView(APIView):
         # If pk is provided, return a specific order (checking if it belongs to the user)
         if pk:
             try:
+                serializer_class, queryset = read_serializer(request, Order.objects.all())
                 # For regular users, only allow access to their own orders
                 if not user.is_staff:
-                    order = Order.objects.get(pk=pk, user=user)
+                    order = queryset.get(pk=pk, user=user)
                 else:
                     # Admin users can access any order
-                    order = Order.objects.get(pk=pk)
+                    order = queryset.get(pk=pk)
                     
-                serializer = OrderSerializer(order)
+                serializer = serializer_class(order)
                 return Response(serializer.data)
             except Order.DoesNotExist:
+                pass
+            # คำสั่งซื้อเก่าอาจถูกย้ายไป archive แล้ว
+            try:
+                archived = ArchivedOrder.objects.prefetch_related('items')
+                if not user.is_staff:
+                    archived = archived.filter(user_id=user.pk)
+                return Response(archived_data(request, archived.get(pk=pk)))
+            except ArchivedOrder.DoesNotExist:
                 return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         
         # For listing all orders
         if user.is_staff:
             # Admin users can see all orders
-            orders = Order.objects.all()
-        else:
-            # Regular users can only see their own orders
-            orders = Order.objects.filter(user=user)
-            
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+            return history_response(request, Order.objects.all())
+        # Regular users can only see their own orders
+        return history_response(request, Order.objects.filter(user=user), user=user)
 
 class OrderCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is not None:
+            return run_idempotent(request, key, lambda: self.create_order(request))
+        return self.create_order(request)
+
+    def create_order(self, request):
         serializer = OrderSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()  # ไม่ต้องส่ง user= เพราะ serializer จัดการเอง
@@ -58,9 +147,7 @@ class AdminOrderView(APIView):
 
     def get(self, request, pk=None):
         """ดึงข้อมูลคำสั่งซื้อทั้งหมด"""
-        orders = Order.objects.all()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return history_response(request, Order.objects.all())
 
     def put(self, request, pk):
         """อัปเดตคำสั่งซื้อ (เช่น เปลี่ยนสถานะ)"""
@@ -83,4 +170,74 @@ class AdminOrderView(APIView):
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class AdminOrderExportView(APIView):
+    """
+    ส่งออกคำสั่งซื้อแบบ streaming สำหรับฝ่ายบัญชี
+
+    ``?output=csv|ndjson&level=lines|orders&since=&until=&status=completed,pending&after=<cursor>&include_archive=``;
+    see ``orders.export`` for the columns and the resume cursor.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    statuses = {choice for choice, _ in Order.STATUS_CHOICES}
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in export.EXPORT_FORMATS:
+            return Response({"error": "output must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        level = request.query_params.get('level', 'lines')
+        if level not in export.LEVELS:
+            return Response({"error": "level must be lines or orders"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since, until = date_range(request)
+        except ValueError:
+            return Response(
+                {"error": "since/until must be YYYY-MM-DD or an ISO 8601 datetime"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+        if not self.statuses.issuperset(statuses):
+            return Response({"error": "Invalid status value"}, status=status.HTTP_400_BAD_REQUEST)
+        after = request.query_params.get('after')
+        try:
+            after = export.parse_cursor(after, level) if after else None
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = export.export_rows(
+            level, since=since, until=until, statuses=statuses, after=after,
+            include_archive=request.query_params.get('include_archive', '').lower() in ('1', 'true', 'yes'),
+        )
+        response = StreamingHttpResponse(
+            export.render(rows, output, level), content_type=export.EXPORT_FORMATS[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders-{level}.{output}"'
+        return response
+
+
+class OrderEventListView(APIView):
+    """อ่าน event ของคำสั่งซื้อต่อจาก cursor (?after=<id>)"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    max_limit = 1000
+
+    def get(self, request):
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = min(int(request.query_params.get('limit', 100)), self.max_limit)
+        except ValueError:
+            return Response(
+                {"error": "after and limit must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit < 1:
+            return Response({"error": "Invalid limit value"}, status=status.HTTP_400_BAD_REQUEST)
+        event_types = request.query_params.getlist('type') or None
+        events = read_events(after=after, limit=limit, event_types=event_types)
+        return Response({
+            'events': OrderEventSerializer(events, many=True).data,
+            'next_cursor': events[-1].id if events else after,
+        })
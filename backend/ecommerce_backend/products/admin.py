@@ -1,7 +1,81 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 
 # Register your models here.
-from .models import Product,Review
+from ecommerce_backend.admin import LargeTableAdmin
+from . import moderation, snapshot
+from .models import Product, Review
 
-admin.site.register(Product)
-admin.site.register(Review)
\ No newline at end of file
+
+class StockActionForm(admin.helpers.ActionForm):
+    amount = forms.IntegerField(required=False, help_text="Units for the stock actions")
+
+
+def _amount(modeladmin, request):
+    try:
+        return int(request.POST.get('amount', ''))
+    except ValueError:
+        modeladmin.message_user(request, "Enter an amount for the stock action.", messages.ERROR)
+        return None
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'category', 'price', 'stock', 'average_rating', 'review_count', 'units_sold']
+    # category เป็นคอลัมน์แรกของ index ราคา/คะแนน
+    list_filter = ['category']
+    search_fields = ['=id', '^name']
+    ordering = ['id']
+    readonly_fields = ['average_rating', 'review_count', 'units_sold', 'popularity_score', 'trending_score']
+    action_form = StockActionForm
+    actions = ['add_stock', 'set_stock']
+
+    @admin.action(description="Add amount to stock (negative to subtract)")
+    def add_stock(self, request, queryset):
+        amount = _amount(self, request)
+        if amount is None:
+            return
+        updated = queryset.update(stock=Greatest(F('stock') + amount, Value(0)))
+        snapshot.schedule_rebuild()
+        self.message_user(request, f"Adjusted stock of {updated} products by {amount:+d}.", messages.SUCCESS)
+
+    @admin.action(description="Set stock to amount")
+    def set_stock(self, request, queryset):
+        amount = _amount(self, request)
+        if amount is None:
+            return
+        if amount < 0:
+            self.message_user(request, "Stock cannot be negative.", messages.ERROR)
+            return
+        updated = queryset.update(stock=amount)
+        snapshot.schedule_rebuild()
+        self.message_user(request, f"Set stock of {updated} products to {amount}.", messages.SUCCESS)
+
+
+@admin.register(Review)
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ['id', 'product', 'user', 'rating', 'status', 'helpful_count', 'created_at']
+    list_select_related = ['product', 'user']
+    # status มี index (status, id)
+    list_filter = ['status', 'rating']
+    search_fields = ['=id', '=user__username']
+    raw_id_fields = ['product', 'user', 'order']
+    ordering = ['-id']
+    actions = ['publish', 'reject']
+
+    def _set_status(self, request, queryset, new_status):
+        product_ids = set(queryset.values_list('product_id', flat=True))
+        updated = queryset.update(status=new_status, moderation_reason='')
+        # คะแนนเฉลี่ยคำนวณใหม่ครั้งเดียวต่อสินค้า
+        moderation.refresh_aggregates(product_ids)
+        self.message_user(request, f"{updated} reviews marked as {new_status}.", messages.SUCCESS)
+
+    @admin.action(description="Publish selected reviews")
+    def publish(self, request, queryset):
+        self._set_status(request, queryset, Review.PUBLISHED)
+
+    @admin.action(description="Reject selected reviews")
+    def reject(self, request, queryset):
+        self._set_status(request, queryset, Review.REJECTED)
@@ -0,0 +1,81 @@
+"""
+Category browse queries: price range filters with keyset pagination.
+
+Every sort order is served by a composite index on ``Product``
+(``category, price, id`` and ``category, -average_rating, id``), so a
+page is an index range scan that starts right after the previous page's
+last row, however deep the client has paged. The index is maintained by
+the database on every product write.
+
+Every query is scoped to one category, the leading column of both
+indexes; without it the database would have to sort the whole table.
+
+Cursors are the sort order, sort value and id of the last row on the
+page, encoded as an opaque URL-safe string. A cursor issued for one
+sort order is rejected for another rather than silently skipping or
+repeating rows.
+"""
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+# sort -> (ordering, field, ascending)
+BROWSE_ORDERINGS = {
+    'price': (('price', 'id'), 'price', True),
+    '-price': (('-price', '-id'), 'price', False),
+    'rating': (('-average_rating', 'id'), 'average_rating', False),
+}
+
+
+def parse_price(value):
+    """แปลงราคาจาก query string เป็น Decimal (ValueError ถ้าไม่ถูกต้อง)"""
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(value)
+    if not price.is_finite():
+        raise ValueError(value)
+    return price
+
+
+def encode_cursor(sort, value, pk):
+    raw = json.dumps([sort, str(value), pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """คืนค่า (Decimal, id) จาก cursor ที่ออกให้ลำดับ ``sort`` (ValueError ถ้าไม่ถูกต้อง)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, pk = json.loads(raw)
+        if cursor_sort != sort:
+            raise ValueError(cursor)
+        return parse_price(value), int(pk)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError(cursor)
+
+
+def after_cursor(sort, cursor):
+    """เงื่อนไข keyset สำหรับแถวที่อยู่หลัง cursor ในลำดับ ``sort``"""
+    _, field, ascending = BROWSE_ORDERINGS[sort]
+    value, pk = decode_cursor(cursor, sort)
+    if ascending:
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+    # rating เรียงมากไปน้อยแต่ id น้อยไปมาก ส่วน -price ถอยหลังทั้งคู่
+    id_lookup = 'id__gt' if sort == 'rating' else 'id__lt'
+    return Q(**{f'{field}__lt': value}) | Q(**{field: value, id_lookup: pk})
+
+
+def browse_page(queryset, sort, after=None, limit=24):
+    """คืนค่า (products, next_cursor)"""
+    ordering, field, _ = BROWSE_ORDERINGS[sort]
+    if after:
+        queryset = queryset.filter(after_cursor(sort, after))
+    products = list(queryset.order_by(*ordering)[:limit + 1])
+    if len(products) <= limit:
+        return products, None
+    products = products[:limit]
+    last = products[-1]
+    return products, encode_cursor(sort, getattr(last, field), last.id)
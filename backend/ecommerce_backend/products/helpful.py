@@ -0,0 +1,90 @@
+"""
+Helpful votes on reviews.
+
+A vote inserts one ``ReviewHelpfulVote`` row (the unique constraint
+enforces one vote per user per review) and adds +1/-1 to a randomly
+chosen ``ReviewHelpfulCounter`` shard instead of updating the review
+row, so a burst of votes on one popular review does not serialize on a
+single row lock. ``fold_counters`` periodically moves the shard totals
+into ``Review.helpful_count``, which is what lists and sorting read.
+"""
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import Review, ReviewHelpfulCounter, ReviewHelpfulVote
+
+
+def get_shard_count():
+    return getattr(settings, 'HELPFUL_COUNTER_SHARDS', 16)
+
+
+def _bump(review_id, amount):
+    shard = random.randrange(get_shard_count())
+    counters = ReviewHelpfulCounter.objects.filter(review_id=review_id, shard=shard)
+    if counters.update(delta=F('delta') + amount):
+        return
+    try:
+        with transaction.atomic():
+            ReviewHelpfulCounter.objects.create(review_id=review_id, shard=shard, delta=amount)
+    except IntegrityError:
+        # มีคนสร้าง shard นี้ไปพร้อมกันแล้ว
+        counters.update(delta=F('delta') + amount)
+
+
+def add_vote(review, user):
+    """คืนค่า True ถ้าเป็นโหวตใหม่ False ถ้าผู้ใช้เคยโหวตรีวิวนี้แล้ว"""
+    try:
+        with transaction.atomic():
+            ReviewHelpfulVote.objects.create(review=review, user=user)
+            _bump(review.id, 1)
+    except IntegrityError:
+        return False
+    return True
+
+
+def remove_vote(review, user):
+    """คืนค่า True ถ้ามีโหวตให้ลบ"""
+    with transaction.atomic():
+        deleted, _ = ReviewHelpfulVote.objects.filter(review=review, user=user).delete()
+        if deleted:
+            _bump(review.id, -1)
+    return bool(deleted)
+
+
+def current_count(review):
+    """helpful_count ที่รวมส่วนต่างที่ยังไม่ได้ fold แล้ว"""
+    pending = ReviewHelpfulCounter.objects.filter(review=review).aggregate(total=Sum('delta'))['total'] or 0
+    return Review.objects.filter(pk=review.pk).values_list('helpful_count', flat=True).get() + pending
+
+
+def fold_counters(batch_size=500):
+    """
+    รวม shard ของแต่ละรีวิวเข้า Review.helpful_count แล้วลบ shard ทิ้ง
+
+    Works through reviews in batches; each batch is one transaction that
+    locks only the counter rows it folds. Returns the number of reviews
+    updated.
+    """
+    folded = 0
+    while True:
+        review_ids = list(
+            ReviewHelpfulCounter.objects.values_list('review_id', flat=True).distinct().order_by('review_id')[:batch_size]
+        )
+        if not review_ids:
+            return folded
+        with transaction.atomic():
+            counters = list(
+                ReviewHelpfulCounter.objects.select_for_update()
+                .filter(review_id__in=review_ids).values_list('id', 'review_id', 'delta')
+            )
+            totals = {}
+            for _, review_id, delta in counters:
+                totals[review_id] = totals.get(review_id, 0) + delta
+            for review_id, delta in totals.items():
+                if delta:
+                    Review.objects.filter(pk=review_id).update(helpful_count=F('helpful_count') + delta)
+            ReviewHelpfulCounter.objects.filter(id__in=[counter_id for counter_id, _, _ in counters]).delete()
+        folded += len(totals)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products import snapshot
+
+
+class Command(BaseCommand):
+    help = "Build the catalog snapshot served by the product list and category endpoints. Run on deploy."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Output file (default: CATALOG_SNAPSHOT_PATH)")
+
+    def handle(self, *args, **options):
+        path = options['path'] or snapshot.get_snapshot_path()
+        generation = snapshot.build_snapshot(path=path)
+        self.stdout.write(self.style.SUCCESS(f"Wrote catalog snapshot {generation} to {path}"))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import recommendations
+
+
+class Command(BaseCommand):
+    help = "Refresh the \"customers also bought\" table from completed orders. Incremental unless --full."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild from all completed OrderItems")
+        parser.add_argument('--top-k', type=int, default=None, help="Products kept per product (default: RECOMMENDATIONS_TOP_K)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Order events applied per batch")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['full']:
+            count = recommendations.full_build(k=options['top_k'])
+        else:
+            count = recommendations.incremental_update(k=options['top_k'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Updated recommendations for {count} products in {elapsed:.2f}s"))
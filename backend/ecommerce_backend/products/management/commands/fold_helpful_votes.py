@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.helpful import fold_counters
+
+
+class Command(BaseCommand):
+    help = "Fold sharded helpful-vote counters into Review.helpful_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Reviews folded per transaction")
+        parser.add_argument('--loop', action='store_true', help="Keep folding every --interval seconds")
+        parser.add_argument('--interval', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                folded = fold_counters(batch_size=options['batch_size'])
+                self.stdout.write(f"Folded helpful votes for {folded} reviews")
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.moderation import publish_pending
+
+
+class Command(BaseCommand):
+    help = "Moderate pending reviews and publish them in batches, refreshing product ratings once per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--follow', action='store_true', help="Keep running and publish new reviews as they arrive")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between runs with --follow")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                published, rejected = publish_pending(batch_size=options['batch_size'])
+                if published or rejected or not options['follow']:
+                    self.stdout.write(self.style.SUCCESS(f"Published {published} reviews, rejected {rejected}"))
+                if not options['follow']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
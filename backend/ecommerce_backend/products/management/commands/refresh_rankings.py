@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import ranking
+
+
+class Command(BaseCommand):
+    help = "Recompute popularity and trending scores for every product from completed orders (backfill / repair)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = ranking.refresh_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed ranking scores for {count} products"))
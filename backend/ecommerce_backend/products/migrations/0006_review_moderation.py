@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-19 17:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_archive'),
+        ('products', '0005_review_helpful_votes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='moderation_reason',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        # รีวิวที่มีอยู่แล้วถือว่าเผยแพร่แล้ว รีวิวใหม่เริ่มที่ pending
+        migrations.AddField(
+            model_name='review',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('published', 'Published'), ('rejected', 'Rejected')], default='published', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('published', 'Published'), ('rejected', 'Rejected')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['status', 'id'], name='review_status_idx'),
+        ),
+    ]
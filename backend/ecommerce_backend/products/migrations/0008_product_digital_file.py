@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 17:36
+
+import ecommerce_backend.media
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_browse_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='digital_file',
+            field=models.FileField(blank=True, null=True, storage=ecommerce_backend.media.private_storage, upload_to='downloads/'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Exp, Ln
+
+
+def to_log(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(trending_score__gt=0).update(trending_score=Ln(F('trending_score')))
+
+
+def from_log(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.exclude(trending_score=0).update(trending_score=Exp(F('trending_score')))
+
+
+class Migration(migrations.Migration):
+    """trending_score เก็บเป็น log ของผลรวม forward decay (ดู products.ranking)"""
+
+    dependencies = [
+        ('products', '0008_product_digital_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log, from_log),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+NO_SALES = -1e300
+
+
+def zero_to_no_sales(apps, schema_editor):
+    # ก่อนหน้านี้ 0 หมายถึงยังไม่มียอดขาย
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(trending_score=0).update(trending_score=NO_SALES)
+
+
+def no_sales_to_zero(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(trending_score__lte=NO_SALES).update(trending_score=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_trending_score_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=-1e+300),
+        ),
+        migrations.RunPython(zero_to_no_sales, no_sales_to_zero),
+    ]
@@ -2,6 +2,8 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from ecommerce_backend.media import private_storage
+from . import ranking
 
 class Product(models.Model):
     CATEGORY_CHOICES = [
@@ -15,29 +17,58 @@ class Product(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
     stock = models.PositiveIntegerField(default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # ไฟล์ของสินค้าดิจิทัล ดาวน์โหลดได้ผ่านลิงก์ที่ลงชื่อแล้วเท่านั้น (ไม่อยู่ใน MEDIA_ROOT)
+    digital_file = models.FileField(upload_to='downloads/', storage=private_storage, blank=True, null=True)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     review_count = models.PositiveIntegerField(default=0)
+    # คะแนนสำหรับเรียงสินค้า ?sort=popular|trending (ดู products.ranking)
+    units_sold = models.PositiveIntegerField(default=0)
+    popularity_score = models.FloatField(default=0, db_index=True)
+    trending_score = models.FloatField(default=ranking.NO_SALES, db_index=True)
+
+    class Meta:
+        indexes = [
+            # หน้า browse ตามหมวดหมู่: ช่วงราคาและ keyset pagination (products.browse)
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            models.Index(fields=['category', '-average_rating', 'id'], name='product_category_rating_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.popularity_score = ranking.popularity(self.average_rating, self.review_count, self.units_sold)
+        super().save(*args, **kwargs)
      # เพิ่มฟิลด์สำหรับคะแนนเฉลี่ย
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     review_count = models.PositiveIntegerField(default=0)
 
-    # เพิ่มเมธอดอัพเดตคะแนนเฉลี่ยของสินค้า
+    # เพิ่มเมธอดอัพเดตคะแนนเฉลี่ยของสินค้า (นับเฉพาะรีวิวที่เผยแพร่แล้ว)
     def update_rating(self):
-        reviews = self.reviews.all()
-        if reviews:
-            avg = sum(review.rating for review in reviews) / reviews.count()
-            self.average_rating = round(avg, 2)
-            self.review_count = reviews.count()
+        summary = self.reviews.filter(status=Review.PUBLISHED).aggregate(
+            avg=models.Avg('rating'), count=models.Count('id')
+        )
+        if summary['count']:
+            self.average_rating = round(summary['avg'], 2)
+            self.review_count = summary['count']
         else:
             self.average_rating = 0
             self.review_count = 0
-        self.save(update_fields=['average_rating', 'review_count'])
+        self.popularity_score = ranking.popularity(self.average_rating, self.review_count, self.units_sold)
+        self.save(update_fields=['average_rating', 'review_count', 'popularity_score'])
 
 class Review(models.Model):
     RATING_CHOICES = [(1, '1'), (2, '2'), (3, '3'), (4, '4'), (5, '5')]
+    # รีวิวใหม่รอ moderation ก่อนเผยแพร่ (ดู products.moderation)
+    PENDING = 'pending'
+    PUBLISHED = 'published'
+    REJECTED = 'rejected'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PUBLISHED, 'Published'),
+        (REJECTED, 'Rejected'),
+    ]
     
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,  # ใช้ AUTH_USER_MODEL จาก settings
@@ -54,15 +85,66 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     helpful_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    moderation_reason = models.CharField(max_length=255, blank=True)
     
     class Meta:
         # ป้องกันการรีวิวซ้ำ
         unique_together = ('user', 'product')
+        indexes = [
+            # เรียงรีวิวตาม "มีประโยชน์มากที่สุด"
+            models.Index(fields=['product', '-helpful_count', '-created_at'], name='review_product_helpful_idx'),
+            # คิวรีวิวที่รอ publish_reviews
+            models.Index(fields=['status', 'id'], name='review_status_idx'),
+        ]
     
     def __str__(self):
         return f"Review by {self.user.username} on {self.product.name}"
     
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        # อัพเดทคะแนนเฉลี่ยของสินค้า
-        self.product.update_rating()
\ No newline at end of file
+        # อัพเดทคะแนนเฉลี่ยของสินค้า (รีวิวที่รอ moderation ยังไม่นับ)
+        if self.status != self.PENDING:
+            self.product.update_rating()
+
+
+class ReviewHelpfulVote(models.Model):
+    """โหวตว่ารีวิวมีประโยชน์ ผู้ใช้หนึ่งคนโหวตรีวิวหนึ่งได้ครั้งเดียว"""
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='helpful_votes')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='helpful_votes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('review', 'user')
+
+    def __str__(self):
+        return f"{self.user_id} found review {self.review_id} helpful"
+
+
+class ReviewHelpfulCounter(models.Model):
+    """
+    ส่วนต่างของ helpful_count ที่ยังไม่ได้รวมเข้า Review
+
+    Votes are spread over ``HELPFUL_COUNTER_SHARDS`` rows per review so
+    concurrent voters rarely wait on the same row lock.
+    """
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='helpful_counters')
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('review', 'shard')
+
+    def __str__(self):
+        return f"Review {self.review_id} shard {self.shard}: {self.delta:+d}"
+
+
+class ProductRecommendation(models.Model):
+    """สินค้าที่ลูกค้ามักซื้อคู่กัน คำนวณล่วงหน้าโดย products.recommendations"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='recommendation')
+    # [[product_id, score], ...] เรียงจาก score มากไปน้อย
+    related = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recommendations for {self.product_id}"
@@ -0,0 +1,107 @@
+"""
+Review moderation and batched publishing.
+
+``ProductReviewsAPIView.post`` only inserts a ``pending`` review. A
+periodic ``manage.py publish_reviews`` takes pending reviews in id order,
+runs every rule in ``RULES`` over each one, and marks it ``published`` or
+``rejected`` (with the first rule's reason). Product aggregates
+(``average_rating``, ``review_count``, ``popularity_score``) are then
+recomputed once per affected product per batch, so a burst of reviews on
+one product costs one aggregate query and one product write per batch
+instead of a full rescan per review.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from . import ranking
+from .models import Product, Review
+
+re_link = re.compile(r'https?://|www\.', re.IGNORECASE)
+
+
+def get_banned_words():
+    return getattr(settings, 'REVIEW_BANNED_WORDS', [])
+
+
+def get_max_comment_length():
+    return getattr(settings, 'REVIEW_MAX_COMMENT_LENGTH', 5000)
+
+
+def rule_banned_words(review):
+    comment = review.comment.lower()
+    for word in get_banned_words():
+        if word.lower() in comment:
+            return "contains a banned word"
+    return None
+
+
+def rule_links(review):
+    if re_link.search(review.comment):
+        return "contains a link"
+    return None
+
+
+def rule_length(review):
+    if len(review.comment) > get_max_comment_length():
+        return "comment is too long"
+    return None
+
+
+# แต่ละกฎคืนค่าเหตุผลที่ปฏิเสธ หรือ None ถ้าผ่าน
+RULES = [rule_banned_words, rule_links, rule_length]
+
+
+def moderate(review):
+    """คืนค่า (status, reason) ของรีวิว"""
+    for rule in RULES:
+        reason = rule(review)
+        if reason:
+            return Review.REJECTED, reason
+    return Review.PUBLISHED, ''
+
+
+def refresh_aggregates(product_ids):
+    """คำนวณคะแนนเฉลี่ย/จำนวนรีวิวของสินค้าที่ระบุใหม่ด้วยคิวรีเดียว"""
+    summary = {
+        row['product_id']: row
+        for row in Review.objects.filter(product_id__in=product_ids, status=Review.PUBLISHED)
+        .values('product_id').annotate(avg=Avg('rating'), count=Count('id')).order_by()
+    }
+    products = list(Product.objects.filter(id__in=product_ids).only('id', 'units_sold'))
+    for product in products:
+        row = summary.get(product.id)
+        product.average_rating = round(row['avg'], 2) if row else 0
+        product.review_count = row['count'] if row else 0
+        product.popularity_score = ranking.popularity(product.average_rating, product.review_count, product.units_sold)
+    Product.objects.bulk_update(products, ['average_rating', 'review_count', 'popularity_score'])
+    return len(products)
+
+
+def publish_pending(batch_size=500):
+    """
+    Moderate every pending review, one batch per transaction.
+
+    Returns ``(published, rejected)`` counts.
+    """
+    published = rejected = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            reviews = list(
+                Review.objects.select_for_update(skip_locked=True)
+                .filter(status=Review.PENDING, id__gt=last_id).order_by('id')
+                .only('id', 'product_id', 'comment', 'status', 'moderation_reason')[:batch_size]
+            )
+            if not reviews:
+                return published, rejected
+            for review in reviews:
+                review.status, review.moderation_reason = moderate(review)
+            Review.objects.bulk_update(reviews, ['status', 'moderation_reason'])
+            refresh_aggregates({review.product_id for review in reviews if review.status == Review.PUBLISHED})
+        last_id = reviews[-1].id
+        batch_published = sum(1 for review in reviews if review.status == Review.PUBLISHED)
+        published += batch_published
+        rejected += len(reviews) - batch_published
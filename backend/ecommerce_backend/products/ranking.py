@@ -0,0 +1,165 @@
+"""
+Popularity and trending scores for catalog sorting.
+
+``popularity_score`` combines a Bayesian-smoothed rating (so one 5-star
+review does not beat a hundred 4.8-star ones) with lifetime units sold::
+
+    popularity = log(1 + units_sold) + RANKING_RATING_WEIGHT * bayes_rating
+
+``trending_score`` is recent sales velocity with exponential time decay,
+kept in "forward decay" form: each sale adds ``quantity * exp((t - EPOCH) / tau)``
+instead of decaying every stored score over time. Ordering by the stored
+value is the same as ordering by the decayed score at any moment, so the
+column never needs a periodic rewrite.
+
+Those weights grow without bound (a 1 day half-life overflows a float in
+under three years), so the column stores the natural log of the sum and
+sales are added with log-add-exp (``log_add``, ``log_add_expression``).
+The log grows linearly with time and cannot overflow; ordering is
+unchanged because log is monotonic. Any float, including 0 and negative
+values (sales before ``TRENDING_EPOCH``), is a real score, so products
+with no sales yet hold ``NO_SALES``, far below any score a sale can
+produce, and sort last.
+
+Both scores are updated in place as orders complete and reviews change;
+listing endpoints only ``ORDER BY`` the indexed columns.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast, Exp, Greatest, Least, Ln
+from django.utils import timezone
+
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# ค่าเริ่มต้นของ Bayesian average: เหมือนมีรีวิว 3 ดาวอยู่แล้ว 5 รีวิว
+PRIOR_RATING = 3.0
+PRIOR_WEIGHT = 5
+
+# exp() ของค่าที่ต่ำกว่านี้ underflow บน PostgreSQL (error แทนที่จะเป็น 0)
+MIN_EXPONENT = -700.0
+# trending_score ของสินค้าที่ยังไม่มียอดขาย (log ของ 0) ต่ำกว่าคะแนนจริงใด ๆ
+NO_SALES = -1e300
+
+SORT_ORDERINGS = {
+    'popular': ('-popularity_score', 'id'),
+    'trending': ('-trending_score', 'id'),
+}
+
+
+def get_half_life():
+    return getattr(settings, 'RANKING_TRENDING_HALF_LIFE', timedelta(days=7))
+
+
+def get_rating_weight():
+    return getattr(settings, 'RANKING_RATING_WEIGHT', 1.0)
+
+
+def log_decay_weight(at=None):
+    """log ของน้ำหนักยอดขาย ณ เวลา ``at`` ในรูปแบบ forward decay"""
+    at = at or timezone.now()
+    tau = get_half_life().total_seconds() / math.log(2)
+    return (at - TRENDING_EPOCH).total_seconds() / tau
+
+
+def log_add(a, b):
+    """``log(exp(a) + exp(b))`` โดยไม่ overflow"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(max(low - high, MIN_EXPONENT)))
+
+
+def log_add_expression(field, value):
+    """``log_add`` ของคอลัมน์ ``field`` กับ ``value`` เป็น database expression (``NO_SALES`` คือยังไม่มียอดขาย)"""
+    high = Greatest(F(field), Value(value))
+    low = Least(F(field), Value(value))
+    return Case(
+        When(**{f'{field}__lte': NO_SALES}, then=Value(value)),
+        default=high + Ln(Value(1.0) + Exp(Greatest(low - high, Value(MIN_EXPONENT)))),
+        output_field=FloatField(),
+    )
+
+
+def bayes_rating(average_rating, review_count):
+    return (PRIOR_RATING * PRIOR_WEIGHT + float(average_rating) * review_count) / (PRIOR_WEIGHT + review_count)
+
+
+def popularity(average_rating, review_count, units_sold):
+    return math.log1p(units_sold) + get_rating_weight() * bayes_rating(average_rating, review_count)
+
+
+def popularity_expression():
+    """``popularity`` as a database expression over the product's current columns"""
+    review_count = Cast(F('review_count'), FloatField())
+    rating = (
+        (Value(PRIOR_RATING * PRIOR_WEIGHT) + Cast(F('average_rating'), FloatField()) * review_count)
+        / (Value(float(PRIOR_WEIGHT)) + review_count)
+    )
+    return Ln(Cast(F('units_sold'), FloatField()) + Value(1.0)) + Value(get_rating_weight()) * rating
+
+
+def record_sales(items, sign=1, at=None):
+    """
+    ปรับคะแนนสินค้าเมื่อคำสั่งซื้อเปลี่ยนเป็น (sign=1) หรือออกจาก (sign=-1) completed
+
+    ``items`` are OrderItems (or anything with ``product_id`` and
+    ``quantity``). Reversals only take the units back out of
+    ``units_sold``; the trending score keeps the sale, since subtracting
+    today's larger weight would over-correct it.
+    """
+    from .models import Product
+
+    quantities = {}
+    for item in items:
+        # บรรทัดจำนวน 0 ไม่มีผลกับคะแนน (และ log(0) ใช้ไม่ได้)
+        if item.quantity > 0:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        return
+
+    log_weight = log_decay_weight(at)
+    for product_id, quantity in quantities.items():
+        if sign > 0:
+            Product.objects.filter(pk=product_id).update(
+                units_sold=F('units_sold') + quantity,
+                trending_score=log_add_expression('trending_score', math.log(quantity) + log_weight),
+            )
+        else:
+            Product.objects.filter(pk=product_id, units_sold__gte=quantity).update(
+                units_sold=F('units_sold') - quantity,
+            )
+    Product.objects.filter(pk__in=list(quantities)).update(popularity_score=popularity_expression())
+
+
+def refresh_all(batch_size=1000):
+    """
+    คำนวณคะแนนของสินค้าทุกชิ้นใหม่จากคำสั่งซื้อที่ completed ทั้งหมด
+
+    The trending score uses each order's ``created_at`` as its sale time.
+    """
+    from orders.models import ArchivedOrderItem, OrderItem
+    from .models import Product
+
+    units = {}
+    trending = {}
+    # คำสั่งซื้อที่ถูกย้ายไป archive ยังนับเป็นยอดขาย
+    for model in (OrderItem, ArchivedOrderItem):
+        lines = (
+            model.objects.filter(order__status='completed', quantity__gt=0)
+            .values_list('product_id', 'quantity', 'order__created_at').order_by().iterator(chunk_size=5000)
+        )
+        for product_id, quantity, created_at in lines:
+            units[product_id] = units.get(product_id, 0) + quantity
+            score = math.log(quantity) + log_decay_weight(created_at)
+            trending[product_id] = log_add(trending[product_id], score) if product_id in trending else score
+
+    products = list(Product.objects.only('id', 'average_rating', 'review_count'))
+    for product in products:
+        product.units_sold = units.get(product.id, 0)
+        product.trending_score = trending.get(product.id, NO_SALES)
+        product.popularity_score = popularity(product.average_rating, product.review_count, product.units_sold)
+    Product.objects.bulk_update(
+        products, ['units_sold', 'trending_score', 'popularity_score'], batch_size=batch_size
+    )
+    return len(products)
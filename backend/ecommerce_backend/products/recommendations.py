@@ -0,0 +1,258 @@
+"""
+"Customers also bought" model built from completed orders.
+
+The model is a sparse product x product co-occurrence matrix ``C`` where
+``C[a, b]`` is the number of completed orders containing both ``a`` and
+``b``. It is computed as ``X.T @ X`` from the binary order x product
+incidence matrix ``X`` and stored on disk (``RECOMMENDATIONS_MATRIX_PATH``)
+so later runs only add the orders that changed.
+
+The top-k row of every product is written to ``ProductRecommendation``,
+which the API reads with a single primary-key lookup.
+
+Incremental runs consume the order event stream (consumer name
+``recommendations``): orders that become ``completed`` are added, orders
+that leave ``completed`` are subtracted, and only the rows of products
+in those orders are re-ranked. Each batch is applied in this order: the
+matrix is saved, then the re-ranked rows and the consumer position are
+written in one transaction, so a crash never leaves rows stale behind an
+advanced position. A crash between the two steps, like orders completed
+while a full build is reading ``OrderItem``, may count a batch twice
+until the next full build.
+"""
+import os
+import tempfile
+from array import array
+
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from django.db import transaction
+
+from orders.events import EventConsumer, read_events
+from orders.models import ArchivedOrderItem, OrderEvent, OrderItem
+from .models import ProductRecommendation
+
+CONSUMER_NAME = 'recommendations'
+
+
+def get_matrix_path():
+    return str(getattr(settings, 'RECOMMENDATIONS_MATRIX_PATH', settings.BASE_DIR / 'var' / 'copurchase.npz'))
+
+
+def get_top_k():
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 20)
+
+
+def cooccurrence_matrix(order_ids, product_ids, n_products=None):
+    """
+    Co-occurrence counts for parallel arrays of ``(order_id, product_id)``.
+
+    Product ids are used directly as matrix indices, so the matrix has
+    ``max(product_id) + 1`` rows and columns.
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if n_products is None:
+        n_products = int(product_ids.max()) + 1 if product_ids.size else 0
+    if not order_ids.size:
+        return sp.csr_matrix((n_products, n_products), dtype=np.int32)
+
+    _, rows = np.unique(order_ids, return_inverse=True)
+    incidence = sp.csr_matrix(
+        (np.ones(rows.size, dtype=np.int32), (rows, product_ids)),
+        shape=(int(rows.max()) + 1, n_products),
+    )
+    # สินค้าเดียวกันหลายบรรทัดในคำสั่งซื้อเดียวนับเป็นหนึ่ง
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+
+    matrix = (incidence.T @ incidence).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def resize(matrix, n):
+    if matrix.shape[0] >= n:
+        return matrix
+    matrix = matrix.tocsr(copy=True)
+    matrix.resize((n, n))
+    return matrix
+
+
+def top_k(matrix, rows, k):
+    """คืนค่า {row: [[product_id, score], ...]} ของแถวที่ระบุ เรียงตาม score มากไปน้อย"""
+    result = {}
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    for row in rows:
+        start, end = indptr[row], indptr[row + 1]
+        scores = data[start:end]
+        columns = indices[start:end]
+        positive = scores > 0
+        scores, columns = scores[positive], columns[positive]
+        if scores.size > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            scores, columns = scores[keep], columns[keep]
+        # score มากก่อน ถ้าเท่ากันเรียงตาม id
+        order = np.lexsort((columns, -scores))
+        result[int(row)] = [[int(columns[i]), int(scores[i])] for i in order]
+    return result
+
+
+def load_matrix(path=None):
+    path = path or get_matrix_path()
+    if not os.path.exists(path):
+        return None
+    return sp.load_npz(path).tocsr()
+
+
+def save_matrix(matrix, path=None):
+    path = path or get_matrix_path()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.copurchase-', suffix='.npz')
+    os.close(fd)
+    try:
+        sp.save_npz(tmp_path, matrix)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def store_recommendations(rankings, batch_size=1000):
+    """Upsert top-k lists ทีละ batch"""
+    from .models import Product
+
+    existing = set(Product.objects.filter(id__in=list(rankings)).values_list('id', flat=True))
+    objs = [
+        ProductRecommendation(product_id=product_id, related=related)
+        for product_id, related in rankings.items()
+        if product_id in existing
+    ]
+    for start in range(0, len(objs), batch_size):
+        ProductRecommendation.objects.bulk_create(
+            objs[start:start + batch_size],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['related', 'updated_at'],
+        )
+    return len(objs)
+
+
+def _completed_order_lines(chunk_size=50000):
+    orders, products = array('q'), array('q')
+    # รวมคำสั่งซื้อใน archive ด้วย (id เดิมของคำสั่งซื้อไม่ซ้ำกับตารางหลัก)
+    for model in (OrderItem, ArchivedOrderItem):
+        queryset = model.objects.filter(order__status='completed').values_list('order_id', 'product_id').order_by()
+        for order_id, product_id in queryset.iterator(chunk_size=chunk_size):
+            orders.append(order_id)
+            products.append(product_id)
+    return np.frombuffer(orders, dtype=np.int64), np.frombuffer(products, dtype=np.int64)
+
+
+def full_build(k=None):
+    """สร้างโมเดลใหม่ทั้งหมดจาก OrderItem ของคำสั่งซื้อที่ completed"""
+    k = k or get_top_k()
+    consumer = EventConsumer(CONSUMER_NAME)
+    # จำตำแหน่ง stream ก่อนอ่านข้อมูล เพื่อให้รอบ incremental ต่อจากจุดนี้
+    position = OrderEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    order_ids, product_ids = _completed_order_lines()
+    matrix = cooccurrence_matrix(order_ids, product_ids)
+    rankings = top_k(matrix, range(matrix.shape[0]), k)
+    rankings = {product_id: related for product_id, related in rankings.items() if related}
+
+    # บันทึก matrix ก่อนเลื่อนตำแหน่ง ถ้าล้มระหว่างนั้นคำสั่งซื้อจะถูกนับซ้ำแทนที่จะหายไป
+    save_matrix(matrix)
+    with transaction.atomic():
+        ProductRecommendation.objects.exclude(product_id__in=list(rankings)).delete()
+        stored = store_recommendations(rankings)
+        consumer.commit(position)
+    return stored
+
+
+def _event_deltas(events):
+    """แยก event เป็นคำสั่งซื้อที่ต้องบวกเข้า (+1) หรือลบออก (-1) จากโมเดล"""
+    signs = {}
+    created_lines = {}
+    for event in events:
+        payload = event.payload
+        if event.event_type == OrderEvent.CREATED and payload.get('status') == 'completed':
+            signs[event.order_id] = signs.get(event.order_id, 0) + 1
+            created_lines[event.order_id] = [item['product'] for item in payload.get('items', [])]
+        elif event.event_type == OrderEvent.STATUS_CHANGED:
+            if payload.get('new_status') == 'completed' and payload.get('old_status') != 'completed':
+                signs[event.order_id] = signs.get(event.order_id, 0) + 1
+            elif payload.get('old_status') == 'completed' and payload.get('new_status') != 'completed':
+                signs[event.order_id] = signs.get(event.order_id, 0) - 1
+    return {order_id: sign for order_id, sign in signs.items() if sign}, created_lines
+
+
+def _order_lines(order_ids, created_lines):
+    lines = {order_id: created_lines[order_id] for order_id in order_ids if order_id in created_lines}
+    missing = [order_id for order_id in order_ids if order_id not in lines]
+    if missing:
+        # คำสั่งซื้อที่ถูกยกเลิกหลัง completed ไม่ผ่าน filter status จึงดึงรายการตรงๆ
+        queryset = OrderItem.objects.filter(order_id__in=missing).values_list('order_id', 'product_id')
+        for order_id, product_id in queryset:
+            lines.setdefault(order_id, []).append(product_id)
+    return lines
+
+
+def store_rankings(rankings):
+    """บันทึก top-k ของแถวที่ re-rank แล้ว ลบแถวที่ไม่มีสินค้าที่เกี่ยวข้องเหลือ"""
+    ProductRecommendation.objects.filter(
+        product_id__in=[product_id for product_id, related in rankings.items() if not related]
+    ).delete()
+    store_recommendations({product_id: related for product_id, related in rankings.items() if related})
+
+
+def incremental_update(k=None, batch_size=1000):
+    """
+    Apply order events since the last run. Falls back to a full build
+    when no matrix has been saved yet. Returns the number of products
+    re-ranked.
+    """
+    k = k or get_top_k()
+    matrix = load_matrix()
+    if matrix is None:
+        return full_build(k)
+
+    consumer = EventConsumer(CONSUMER_NAME)
+    event_types = [OrderEvent.CREATED, OrderEvent.STATUS_CHANGED]
+    position = consumer.position
+    reranked = 0
+    while True:
+        events = read_events(after=position, limit=batch_size, event_types=event_types)
+        if not events:
+            return reranked
+        position = events[-1].id
+
+        signs, created_lines = _event_deltas(events)
+        lines = _order_lines(list(signs), created_lines) if signs else {}
+        affected = set()
+        for sign in (1, -1):
+            pairs = [(order_id, product_id)
+                     for order_id, products in lines.items() if signs.get(order_id) == sign
+                     for product_id in products]
+            if not pairs:
+                continue
+            order_ids, product_ids = (np.array(column, dtype=np.int64) for column in zip(*pairs))
+            delta = cooccurrence_matrix(order_ids, product_ids)
+            n = max(matrix.shape[0], delta.shape[0])
+            matrix = resize(matrix, n) + sign * resize(delta, n)
+            affected.update(int(product_id) for product_id in np.unique(product_ids))
+
+        rankings = {}
+        if affected:
+            matrix.eliminate_zeros()
+            save_matrix(matrix)
+            rankings = top_k(matrix, sorted(affected), k)
+        # อันดับของ batch นี้กับตำแหน่ง consumer บันทึกพร้อมกัน
+        with transaction.atomic():
+            store_rankings(rankings)
+            consumer.commit(position)
+        reranked += len(rankings)
@@ -5,10 +5,12 @@ from users.serializers import UserSerializer
 
 class ProductSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False)
+    # อัปโหลดได้แต่ไม่ส่งกลับ ลูกค้าขอลิงก์ดาวน์โหลดผ่าน download-link
+    digital_file = serializers.FileField(required=False, write_only=True)
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'category', 'stock', 'image']
+        fields = ['id', 'name', 'description', 'price', 'category', 'stock', 'image', 'digital_file']
 
     def get_image(self, obj):
         if obj.image:
@@ -32,13 +34,31 @@ class ProductSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
     
+class ProductFieldsSerializer(ProductSerializer):
+    """ProductSerializer ที่เลือกส่งเฉพาะบางฟิลด์ได้ (``fields=[...]``)"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    """ข้อมูลสินค้าแบบย่อสำหรับฝังในคำสั่งซื้อ"""
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price', 'category', 'image']
+        read_only_fields = fields
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = Review
-        fields = ['id', 'user', 'rating', 'comment', 'created_at', 'helpful_count']
-        read_only_fields = ['id', 'user', 'created_at', 'helpful_count']
+        fields = ['id', 'user', 'rating', 'comment', 'created_at', 'helpful_count', 'status']
+        read_only_fields = ['id', 'user', 'created_at', 'helpful_count', 'status']
     
     def get_user_name(self, obj):
         if obj.user.first_name or obj.user.last_name:
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import snapshot, suggest
+from .models import Product
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, update_fields=None, **kwargs):
+    if not update_fields or {'name', 'popularity_score'} & set(update_fields):
+        product_id, name, weight = instance.pk, instance.name, instance.popularity_score
+        transaction.on_commit(lambda: suggest.patch(product_id, name, weight))
+    if update_fields and snapshot.NON_SERIALIZED_FIELDS.issuperset(update_fields):
+        return
+    snapshot.schedule_rebuild()
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: suggest.patch(product_id, deleted=True))
+    snapshot.schedule_rebuild()
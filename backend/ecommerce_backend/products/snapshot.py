@@ -0,0 +1,235 @@
+"""
+Read-through snapshot of the serialized catalog.
+
+The builder renders the product list (and one list per category) with
+the same serializer and JSON renderer the API uses and writes them to a
+single file:
+
+    MAGIC (4 bytes) | FORMAT_VERSION (u32) | index length (u32) | index JSON | sections...
+
+The index maps section names (``all``, ``category:<name>``) to
+``[offset, length]`` within the file. Files are written to a temporary
+name and moved into place with ``os.replace``, so readers only ever see
+a complete snapshot. Readers ``mmap`` the file and slice sections
+straight out of the page cache; a worker picks up a new snapshot on the
+next request after the file changes.
+
+Product saves and deletes (``products.signals``) call
+``schedule_rebuild``, which only wakes a background thread once the
+transaction commits. The thread waits ``CATALOG_SNAPSHOT_DEBOUNCE_SECONDS``
+so a burst of edits costs one build, then rebuilds off the request path.
+
+Changes that bypass model signals (``QuerySet.update``,
+``bulk_update``, raw SQL) must call ``schedule_rebuild`` themselves.
+As a backstop, a snapshot older than ``CATALOG_SNAPSHOT_MAX_AGE`` is not
+served: readers fall back to the database and a rebuild is requested.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'NMCS'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sII')
+
+# ฟิลด์ที่ ProductSerializer ไม่ได้ส่งออก แก้แล้วไม่ต้อง build ใหม่
+NON_SERIALIZED_FIELDS = frozenset({
+    'average_rating', 'review_count', 'units_sold', 'popularity_score', 'trending_score', 'digital_file',
+})
+
+
+def get_snapshot_path():
+    return str(getattr(settings, 'CATALOG_SNAPSHOT_PATH', settings.BASE_DIR / 'var' / 'catalog.snapshot'))
+
+
+def is_enabled():
+    return getattr(settings, 'CATALOG_SNAPSHOT_ENABLED', True)
+
+
+def get_debounce():
+    return getattr(settings, 'CATALOG_SNAPSHOT_DEBOUNCE_SECONDS', 1.0)
+
+
+def get_max_age():
+    return getattr(settings, 'CATALOG_SNAPSHOT_MAX_AGE', 300)
+
+
+def category_section(category):
+    return f'category:{category}'
+
+
+def build_sections():
+    # import ตอนใช้งาน เพื่อไม่ให้ signals ที่โหลดใน AppConfig.ready ดึง DRF มาตอนเริ่ม worker
+    from rest_framework.renderers import JSONRenderer
+    from .models import Product
+    from .serializers import ProductSerializer
+
+    renderer = JSONRenderer()
+    data = ProductSerializer(Product.objects.all().order_by('id'), many=True).data
+    sections = {'all': renderer.render(data)}
+    for category, _ in Product.CATEGORY_CHOICES:
+        rows = [row for row in data if row['category'] == category]
+        sections[category_section(category)] = renderer.render(rows)
+    return sections
+
+
+def write_snapshot(sections, path=None):
+    """เขียน snapshot แบบ atomic แล้วคืนค่า generation ของไฟล์ใหม่"""
+    path = path or get_snapshot_path()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    generation = time.time_ns()
+    index = {'generation': generation, 'sections': {}}
+    # offset ขึ้นกับความยาวของ index เอง จึงคำนวณซ้ำจนกว่าจะคงที่
+    while True:
+        index_bytes = json.dumps(index).encode()
+        offset = HEADER.size + len(index_bytes)
+        locations = {}
+        for name, payload in sections.items():
+            locations[name] = [offset, len(payload)]
+            offset += len(payload)
+        if locations == index['sections']:
+            break
+        index['sections'] = locations
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index_bytes)))
+            f.write(index_bytes)
+            for payload in sections.values():
+                f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return generation
+
+
+def build_snapshot(path=None):
+    return write_snapshot(build_sections(), path=path)
+
+
+class CatalogSnapshot:
+    """Snapshot ที่ mmap ไว้ อ่าน section ได้โดยไม่ต้องแตะฐานข้อมูล"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a catalog snapshot (format {FORMAT_VERSION})")
+        index = json.loads(self._mmap[HEADER.size:HEADER.size + index_length])
+        self.generation = index['generation']
+        self.sections = index['sections']
+        self._view = memoryview(self._mmap)
+
+    def get(self, name):
+        location = self.sections.get(name)
+        if location is None:
+            return None
+        offset, length = location
+        return self._view[offset:offset + length]
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def get_snapshot():
+    """
+    Snapshot ปัจจุบันของ worker นี้ หรือ None ถ้ายังไม่มีไฟล์
+
+    Costs one ``stat`` per call; the file is re-mapped only when it has
+    been replaced.
+    """
+    global _current
+    path = get_snapshot_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    current = _current
+    if current is not None and (current.stat.st_ino, current.stat.st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns):
+        return current
+    with _lock:
+        current = _current
+        if current is None or (current.stat.st_ino, current.stat.st_mtime_ns) != (stat.st_ino, stat.st_mtime_ns):
+            try:
+                current = CatalogSnapshot(path)
+            except (OSError, ValueError, struct.error):
+                return None
+            # mmap เดิมปล่อยให้ GC ปิดเอง เพราะ request อื่นอาจยังอ่านอยู่
+            _current = current
+    return current
+
+
+def is_stale(snapshot):
+    max_age = get_max_age()
+    return max_age is not None and time.time_ns() - snapshot.generation > max_age * 1_000_000_000
+
+
+def get_section(name):
+    if not is_enabled():
+        return None
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    if is_stale(snapshot):
+        # อาจมีการแก้ที่ไม่ผ่าน signal (QuerySet.update) ตอบจากฐานข้อมูลไปก่อน
+        request_rebuild()
+        return None
+    return snapshot.get(name)
+
+
+_dirty = threading.Event()
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def _build_forever():
+    while True:
+        _dirty.wait()
+        # รอให้การแก้ที่ตามมาติด ๆ กันรวมเป็น build เดียว
+        time.sleep(get_debounce())
+        _dirty.clear()
+        try:
+            build_snapshot()
+        except Exception:
+            logger.exception("Catalog snapshot rebuild failed")
+        finally:
+            connection.close()
+
+
+def request_rebuild():
+    """ปลุก thread เบื้องหลังให้ build ใหม่ (เรียกซ้ำได้ การเรียกระหว่างรอจะรวมเป็นครั้งเดียว)"""
+    global _builder
+    _dirty.set()
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                _builder = threading.Thread(target=_build_forever, name='catalog-snapshot', daemon=True)
+                _builder.start()
+
+
+def schedule_rebuild():
+    """Build ใหม่ในเบื้องหลังหลัง transaction ปัจจุบัน commit (ถ้า rollback จะไม่เกิดอะไรขึ้น)"""
+    if not is_enabled():
+        return
+    transaction.on_commit(request_rebuild)
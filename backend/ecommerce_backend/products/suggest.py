@@ -0,0 +1,212 @@
+"""
+In-memory prefix index for search-box suggestions.
+
+Every product name is indexed under each of its word-start suffixes
+("iphone 15 pro" -> "iphone 15 pro", "15 pro", "pro"), normalized with
+NFKC + casefold, in one sorted list. A query is a ``bisect`` into that
+list for the range of keys that start with it; the best ``limit``
+products in that range by ``popularity_score`` win. Rankings of short,
+broad prefixes (more than ``CACHE_MIN_MATCHES`` keys) are cached until a
+product under that prefix changes.
+
+Each worker builds its own index in a background thread started when
+the WSGI/ASGI application loads (or by the first suggestion request) and
+rebuilds it every ``SUGGEST_REBUILD_INTERVAL`` seconds. Requests never
+wait for a build: until the first one finishes they get no suggestions. Product saves and deletes in the
+same process patch it immediately (``products.signals``); patches that
+arrive while a rebuild is loading are recorded and replayed onto the new
+index before it replaces the old one, so they are not lost with it.
+Changes made by other processes or by ``QuerySet.update()`` (sales
+ranking) show up after the next rebuild. Lookups never touch the
+database.
+"""
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# prefix ที่ตรงกับคีย์มากกว่านี้จะเก็บผลจัดอันดับไว้ (จนกว่าสินค้าภายใต้ prefix นั้นจะเปลี่ยน)
+CACHE_MIN_MATCHES = 256
+CACHE_MAX_ENTRIES = 10000
+# มากกว่าอักขระใด ๆ ในชื่อสินค้า: bisect หา prefix + PREFIX_END คือจุดสิ้นสุดช่วงคีย์ที่ขึ้นต้นด้วย prefix
+PREFIX_END = '\U0010ffff'
+
+re_whitespace = re.compile(r'\s+')
+
+
+def get_rebuild_interval():
+    return getattr(settings, 'SUGGEST_REBUILD_INTERVAL', 60)
+
+
+def get_max_limit():
+    return getattr(settings, 'SUGGEST_MAX_LIMIT', 20)
+
+
+def normalize(text):
+    return re_whitespace.sub(' ', unicodedata.normalize('NFKC', text).casefold()).strip()
+
+
+def index_keys(name):
+    """คีย์ของชื่อสินค้า: ชื่อเต็มและส่วนท้ายที่เริ่มจากแต่ละคำ"""
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class SuggestIndex:
+    def __init__(self, products=()):
+        """``products`` คือ (id, name, weight)"""
+        self.lock = threading.Lock()
+        self.products = {}
+        entries = []
+        for product_id, name, weight in products:
+            self.products[product_id] = (name, weight)
+            entries.extend((key, product_id) for key in index_keys(name))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ids = [product_id for _, product_id in entries]
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.products)
+
+    def search(self, query, limit=8):
+        """คืนค่า [(id, name), ...] ที่ชื่อมีคำขึ้นต้นด้วย ``query`` เรียงตามความนิยม"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self.lock:
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix + PREFIX_END, start)
+            if end - start <= CACHE_MIN_MATCHES:
+                ranked = self._rank(start, end, limit)
+            else:
+                ranked = self.cache.get(prefix)
+                if ranked is None:
+                    if len(self.cache) >= CACHE_MAX_ENTRIES:
+                        self.cache.clear()
+                    ranked = self.cache[prefix] = self._rank(start, end, get_max_limit())
+            return [(product_id, self.products[product_id][0]) for product_id in ranked[:limit]]
+
+    def _rank(self, start, end, limit):
+        matched = set(self.ids[start:end])
+        return heapq.nsmallest(limit, matched, key=lambda product_id: (-self.products[product_id][1], product_id))
+
+    def update(self, product_id, name, weight):
+        with self.lock:
+            self._remove(product_id)
+            self.products[product_id] = (name, weight)
+            for key in index_keys(name):
+                position = bisect.bisect_left(self.keys, key)
+                self.keys.insert(position, key)
+                self.ids.insert(position, product_id)
+                self._invalidate(key)
+
+    def remove(self, product_id):
+        with self.lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        old = self.products.pop(product_id, None)
+        if old is None:
+            return
+        for key in index_keys(old[0]):
+            position = bisect.bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key:
+                if self.ids[position] == product_id:
+                    del self.keys[position]
+                    del self.ids[position]
+                    break
+                position += 1
+            self._invalidate(key)
+
+    def _invalidate(self, key):
+        for length in range(1, len(key) + 1):
+            self.cache.pop(key[:length], None)
+
+
+def load_index():
+    from .models import Product
+
+    return SuggestIndex(Product.objects.values_list('id', 'name', 'popularity_score').iterator(chunk_size=5000))
+
+
+_index = None
+# patch ที่เกิดระหว่าง rebuild (None เมื่อไม่ได้ rebuild) และ lock ที่ใช้ร่วมกับการสลับ index
+_pending = None
+_swap_lock = threading.Lock()
+_started = threading.Lock()
+_thread = None
+_thread_pid = None
+
+
+def rebuild():
+    """สร้าง index ใหม่ทั้งก้อนแล้วสลับ reference ระหว่างนั้นคำขอยังใช้ index เดิมได้"""
+    global _index, _pending
+    with _swap_lock:
+        _pending = []
+    try:
+        index = load_index()
+        with _swap_lock:
+            for args in _pending:
+                _apply(index, *args)
+            _index = index
+    finally:
+        with _swap_lock:
+            _pending = None
+
+
+def _rebuild_forever():
+    from django.db import connection
+
+    while True:
+        try:
+            rebuild()
+        except Exception:
+            logger.exception("Rebuilding the suggest index failed")
+        finally:
+            connection.close()
+        time.sleep(get_rebuild_interval())
+
+
+def start():
+    """เริ่ม thread ที่ build index ในเบื้องหลัง (เรียกซ้ำได้)"""
+    global _thread, _thread_pid
+    # thread ไม่ติดไปกับ fork (เช่น gunicorn --preload) process ลูกต้องเริ่มของตัวเอง
+    if _thread is not None and _thread_pid == os.getpid():
+        return
+    with _started:
+        if _thread is None or _thread_pid != os.getpid():
+            _thread = threading.Thread(target=_rebuild_forever, name='suggest-index', daemon=True)
+            _thread.start()
+            _thread_pid = os.getpid()
+
+
+def get_index():
+    """Index ปัจจุบันของ process นี้ หรือ None ถ้ายัง build ครั้งแรกไม่เสร็จ (ไม่รอ)"""
+    start()
+    return _index
+
+
+def patch(product_id, name=None, weight=0.0, deleted=False):
+    """ปรับ index ของ process นี้ตามการแก้ไขสินค้า (ไม่ทำอะไรถ้ายังไม่ได้ build)"""
+    with _swap_lock:
+        if _pending is not None:
+            _pending.append((product_id, name, weight, deleted))
+        index = _index
+    if index is not None:
+        _apply(index, product_id, name, weight, deleted)
+
+
+def _apply(index, product_id, name, weight, deleted):
+    if deleted:
+        index.remove(product_id)
+    else:
+        index.update(product_id, name, weight)
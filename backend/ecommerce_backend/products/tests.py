@@ -1,3 +1,708 @@
-from django.test import TestCase
+import math
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from orders import events
+from orders.models import Order, OrderEvent, OrderEventCursor, OrderItem
+from . import browse, helpful, moderation, ranking, recommendations, snapshot, suggest
+from .models import Product, ProductRecommendation, Review, ReviewHelpfulCounter
+from .views import DOWNLOAD_SALT
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(CATALOG_SNAPSHOT_PATH=f'{directory.name}/catalog.snapshot')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.product = Product.objects.create(
+            name='Keyboard', description='d', price=Decimal('10.00'), category='physical', stock=5,
+        )
+
+    def test_save_requests_rebuild_after_commit(self):
+        with mock.patch.object(snapshot, 'request_rebuild') as request_rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.stock = 4
+                self.product.save()
+                self.product.save()
+                request_rebuild.assert_not_called()
+        self.assertEqual(request_rebuild.call_count, 2)
+
+    def test_non_serialized_update_does_not_rebuild(self):
+        with mock.patch.object(snapshot, 'request_rebuild') as request_rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.save(update_fields=['popularity_score'])
+        request_rebuild.assert_not_called()
+
+    def test_serves_fresh_snapshot(self):
+        snapshot.build_snapshot()
+        self.assertIn(b'Keyboard', bytes(snapshot.get_section('all')))
+
+    @override_settings(CATALOG_SNAPSHOT_MAX_AGE=60)
+    def test_stale_snapshot_falls_back_and_requests_rebuild(self):
+        snapshot.write_snapshot({'all': b'[]'})
+        with mock.patch.object(snapshot.time, 'time_ns', return_value=time.time_ns() + 61 * 10**9), \
+                mock.patch.object(snapshot, 'request_rebuild') as request_rebuild:
+            self.assertIsNone(snapshot.get_section('all'))
+        request_rebuild.assert_called_once()
+
+
+@override_settings(RANKING_TRENDING_HALF_LIFE=timedelta(days=1))
+class TrendingScoreTests(TestCase):
+    def setUp(self):
+        self.old = Product.objects.create(name='Old', description='d', price=Decimal('1.00'), category='physical')
+        self.new = Product.objects.create(name='New', description='d', price=Decimal('1.00'), category='physical')
+
+    def sell(self, product, quantity, at):
+        ranking.record_sales([SimpleNamespace(product_id=product.pk, quantity=quantity)], at=at)
+        product.refresh_from_db()
+        return product.trending_score
+
+    def test_scores_do_not_overflow_decades_after_the_epoch(self):
+        at = ranking.TRENDING_EPOCH + timedelta(days=365 * 30)
+        self.sell(self.old, 100, at - timedelta(days=7))
+        score = self.sell(self.new, 1, at)
+        self.assertTrue(math.isfinite(score))
+        self.assertGreater(score, self.old.trending_score)
+
+    def test_repeated_sales_add_up(self):
+        at = ranking.TRENDING_EPOCH + timedelta(days=10)
+        self.sell(self.old, 1, at)
+        self.sell(self.old, 1, at)
+        self.assertAlmostEqual(self.sell(self.new, 2, at), self.old.trending_score)
+
+    def test_zero_quantity_is_ignored(self):
+        self.assertEqual(self.sell(self.new, 0, ranking.TRENDING_EPOCH + timedelta(days=1)), ranking.NO_SALES)
+
+    def test_sale_at_the_epoch_is_not_treated_as_no_sales(self):
+        self.assertEqual(self.sell(self.new, 1, ranking.TRENDING_EPOCH), 0)
+        self.assertAlmostEqual(self.sell(self.new, 1, ranking.TRENDING_EPOCH), math.log(2))
+
+    def test_pre_epoch_sales_rank_above_products_without_sales(self):
+        user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw')
+        order = Order.objects.create(user=user, total_price=Decimal('1.00'), status='completed')
+        OrderItem.objects.create(order=order, product=self.old, quantity=1)
+        Order.objects.filter(pk=order.pk).update(created_at=ranking.TRENDING_EPOCH - timedelta(days=30))
+        ranking.refresh_all()
+        self.old.refresh_from_db()
+        self.new.refresh_from_db()
+        self.assertLess(self.old.trending_score, 0)
+        self.assertEqual(self.new.trending_score, ranking.NO_SALES)
+        response = APIClient().get('/api/products/?sort=trending')
+        self.assertEqual([product['id'] for product in response.data], [self.old.id, self.new.id])
+
+    def test_log_add(self):
+        self.assertAlmostEqual(ranking.log_add(math.log(2), math.log(3)), math.log(5))
+        self.assertEqual(ranking.log_add(5000.0, 1.0), 5000.0)
+
+
+class ProductSuggestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        patcher = mock.patch.object(suggest, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_empty_results_while_index_is_building(self):
+        with mock.patch.object(suggest, '_index', None):
+            response = self.client.get('/api/products/suggest/?q=key')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'results': []})
+
+    def test_matches_word_prefixes_by_popularity(self):
+        index = suggest.SuggestIndex([(1, 'Mechanical Keyboard', 1.0), (2, 'Keyboard Cover', 5.0), (3, 'Mouse', 9.0)])
+        with mock.patch.object(suggest, '_index', index):
+            response = self.client.get('/api/products/suggest/?q=KEY')
+        self.assertEqual(response.data['results'], [
+            {'id': 2, 'name': 'Keyboard Cover'}, {'id': 1, 'name': 'Mechanical Keyboard'},
+        ])
+
+
+    def test_patches_during_rebuild_reach_the_new_index(self):
+        old = suggest.SuggestIndex([(1, 'Keyboard', 1.0), (2, 'Mouse', 1.0)])
+        loaded = suggest.SuggestIndex([(1, 'Keyboard', 1.0), (2, 'Mouse', 1.0)])
+
+        def load_index():
+            # สินค้าถูกแก้ใน process นี้ระหว่างที่อ่านฐานข้อมูลอยู่
+            suggest.patch(3, 'Keycap Set', 2.0)
+            suggest.patch(2, deleted=True)
+            return loaded
+
+        with mock.patch.object(suggest, '_index', old), mock.patch.object(suggest, 'load_index', load_index):
+            suggest.rebuild()
+            self.assertIs(suggest._index, loaded)
+            self.assertIsNone(suggest._pending)
+            self.assertEqual(loaded.search('key'), [(3, 'Keycap Set'), (1, 'Keyboard')])
+            self.assertEqual(loaded.search('mouse'), [])
+            # index เดิมก็ได้ patch ด้วยระหว่างที่ยังใช้งานอยู่
+            self.assertEqual(old.search('keycap'), [(3, 'Keycap Set')])
+
+            suggest.patch(1, 'Keyboard', 9.0)
+        self.assertEqual(loaded.search('k'), [(1, 'Keyboard'), (3, 'Keycap Set')])
+
+    def test_failed_rebuild_keeps_the_old_index(self):
+        old = suggest.SuggestIndex([(1, 'Keyboard', 1.0)])
+        failing = mock.patch.object(suggest, 'load_index', side_effect=RuntimeError('db down'))
+        with mock.patch.object(suggest, '_index', old), failing:
+            with self.assertRaises(RuntimeError):
+                suggest.rebuild()
+            self.assertIs(suggest._index, old)
+            self.assertIsNone(suggest._pending)
+
+
+class ProductReviewCreateTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.product = Product.objects.create(name='Keyboard', description='d', price=Decimal('10.00'), category='physical')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def review(self):
+        return self.client.post(f'/api/products/{self.product.id}/reviews/', {'rating': 5, 'comment': 'Great'}, format='json')
+
+    def test_new_review_is_created_pending(self):
+        order = Order.objects.create(user=self.user, total_price=Decimal('10.00'), status='completed')
+        OrderItem.objects.create(order=order, product=self.product, quantity=1)
+        response = self.review()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], Review.PENDING)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+
+    def test_requires_a_completed_purchase(self):
+        self.assertEqual(self.review().status_code, 403)
+
+
+
+@override_settings(REVIEW_BANNED_WORDS=['scam'], REVIEW_MAX_COMMENT_LENGTH=50)
+class ReviewModerationTests(TestCase):
+    def setUp(self):
+        self.keyboard = Product.objects.create(name='Keyboard', description='d', price=Decimal('10.00'), category='physical')
+        self.mouse = Product.objects.create(name='Mouse', description='d', price=Decimal('5.00'), category='physical')
+        self.users = [get_user_model().objects.create_user(f'user{i}', f'user{i}@example.com', 'pw') for i in range(4)]
+
+    def review(self, user, product, rating, comment='Good', status=Review.PENDING):
+        return Review.objects.create(user=user, product=product, rating=rating, comment=comment, status=status)
+
+    def test_moderate(self):
+        cases = [
+            ('Works well', (Review.PUBLISHED, '')),
+            ('Total SCAM', (Review.REJECTED, 'contains a banned word')),
+            ('see www.example.com', (Review.REJECTED, 'contains a link')),
+            ('x' * 51, (Review.REJECTED, 'comment is too long')),
+        ]
+        for comment, expected in cases:
+            self.assertEqual(moderation.moderate(Review(comment=comment)), expected, comment)
+
+    def test_batches_refresh_aggregates_once_per_batch(self):
+        self.review(self.users[0], self.keyboard, 5)
+        self.review(self.users[1], self.keyboard, 2)
+        rejected = self.review(self.users[2], self.keyboard, 1, comment='a scam')
+        self.review(self.users[0], self.mouse, 4)
+        refresh = mock.patch.object(moderation, 'refresh_aggregates', wraps=moderation.refresh_aggregates)
+        with refresh as refresh_aggregates:
+            self.assertEqual(moderation.publish_pending(batch_size=2), (3, 1))
+        self.assertEqual([call.args[0] for call in refresh_aggregates.call_args_list], [
+            {self.keyboard.id}, {self.mouse.id},
+        ])
+
+        rejected.refresh_from_db()
+        self.assertEqual((rejected.status, rejected.moderation_reason), (Review.REJECTED, 'contains a banned word'))
+        self.keyboard.refresh_from_db()
+        self.assertEqual((self.keyboard.average_rating, self.keyboard.review_count), (Decimal('3.50'), 2))
+        self.mouse.refresh_from_db()
+        self.assertEqual((self.mouse.average_rating, self.mouse.review_count), (Decimal('4.00'), 1))
+        self.assertEqual(moderation.publish_pending(), (0, 0))
+
+    def test_pending_and_rejected_reviews_are_hidden(self):
+        published = self.review(self.users[0], self.keyboard, 4, status=Review.PUBLISHED)
+        self.review(self.users[1], self.keyboard, 1)
+        self.review(self.users[2], self.keyboard, 1, status=Review.REJECTED)
+        response = APIClient().get(f'/api/products/{self.keyboard.id}/reviews/')
+        self.assertEqual([review['id'] for review in response.data['reviews']], [published.id])
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['average_rating'], 4)
+        self.assertEqual(response.data['rating_distribution'][1], 0)
+
+    def test_publish_reviews_command(self):
+        self.review(self.users[0], self.keyboard, 5)
+        self.review(self.users[1], self.keyboard, 3, comment='http://spam.example')
+        out = StringIO()
+        call_command('publish_reviews', '--batch-size', '1', stdout=out)
+        self.assertIn('Published 1 reviews, rejected 1', out.getvalue())
+        self.keyboard.refresh_from_db()
+        self.assertEqual(self.keyboard.review_count, 1)
+
+
+
+class ReviewHelpfulTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        self.voters = [User.objects.create_user(f'voter{i}', f'voter{i}@example.com', 'pw') for i in range(4)]
+        self.product = Product.objects.create(name='Keyboard', description='d', price=Decimal('10.00'), category='physical')
+        self.review = Review.objects.create(
+            user=self.author, product=self.product, rating=5, comment='Great', status=Review.PUBLISHED,
+        )
+        self.client = APIClient()
+
+    def vote(self, user, method='post', review=None):
+        self.client.force_authenticate(user)
+        return getattr(self.client, method)(f'/api/products/reviews/{(review or self.review).id}/helpful/')
+
+    def test_vote_and_unvote_are_idempotent(self):
+        first = self.vote(self.voters[0])
+        self.assertEqual((first.status_code, first.data['helpful_count']), (201, 1))
+        again = self.vote(self.voters[0])
+        self.assertEqual((again.status_code, again.data['helpful_count']), (200, 1))
+
+        removed = self.vote(self.voters[0], 'delete')
+        self.assertEqual((removed.status_code, removed.data['helpful_count']), (200, 0))
+        self.assertEqual(self.vote(self.voters[0], 'delete').status_code, 404)
+        self.assertEqual(helpful.current_count(self.review), 0)
+
+    def test_own_and_unpublished_reviews(self):
+        self.assertEqual(self.vote(self.author).status_code, 400)
+        pending = Review.objects.create(user=self.voters[1], product=self.product, rating=3)
+        self.assertEqual(self.vote(self.voters[0], review=pending).status_code, 404)
+
+    @override_settings(HELPFUL_COUNTER_SHARDS=4)
+    def test_count_sums_every_shard(self):
+        with mock.patch.object(helpful.random, 'randrange', side_effect=[0, 1, 2, 1, 3]):
+            for voter in self.voters:
+                helpful.add_vote(self.review, voter)
+            helpful.remove_vote(self.review, self.voters[0])
+        shards = dict(ReviewHelpfulCounter.objects.values_list('shard', 'delta'))
+        self.assertEqual(shards, {0: 1, 1: 2, 2: 1, 3: -1})
+        self.assertEqual(helpful.current_count(self.review), 3)
+
+    def test_fold_counters(self):
+        other = Review.objects.create(user=self.voters[0], product=self.product, rating=4, status=Review.PUBLISHED)
+        for voter in self.voters:
+            helpful.add_vote(self.review, voter)
+        helpful.add_vote(other, self.voters[1])
+        helpful.remove_vote(other, self.voters[1])
+
+        self.assertEqual(helpful.fold_counters(batch_size=1), 2)
+        self.assertFalse(ReviewHelpfulCounter.objects.exists())
+        self.review.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.review.helpful_count, other.helpful_count), (4, 0))
+        self.assertEqual(helpful.current_count(self.review), 4)
+
+        helpful.remove_vote(self.review, self.voters[0])
+        out = StringIO()
+        call_command('fold_helpful_votes', stdout=out)
+        self.assertIn('Folded helpful votes for 1 reviews', out.getvalue())
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 3)
+
+    def test_sort_by_helpful_uses_folded_counts(self):
+        other = Review.objects.create(user=self.voters[0], product=self.product, rating=4, status=Review.PUBLISHED)
+        helpful.add_vote(other, self.voters[1])
+        helpful.fold_counters()
+        for voter in self.voters[1:]:
+            helpful.add_vote(self.review, voter)
+        url = f'/api/products/{self.product.id}/reviews/?sort=helpful'
+        # โหวตที่ยังไม่ fold ยังไม่มีผลต่อการเรียง
+        self.assertEqual([review['id'] for review in self.client.get(url).data['reviews']], [other.id, self.review.id])
+        helpful.fold_counters()
+        self.assertEqual([review['id'] for review in self.client.get(url).data['reviews']], [self.review.id, other.id])
+        self.assertEqual(self.client.get(f'/api/products/{self.product.id}/reviews/?sort=rating').status_code, 400)
+
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f'P{i}', description='d', price=Decimal('1.00') * (i + 1), category='physical')
+            for i in range(3)
+        ]
+        self.client = APIClient()
+
+    def test_keeps_request_order_and_reports_missing(self):
+        first, second, third = (product.id for product in self.products)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/products/batch/?ids={third}, {first},,{third},999999')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['id'] for product in response.data['results']], [third, first])
+        self.assertEqual(response.data['missing'], [999999])
+        self.assertEqual(response.data['results'][0]['price'], '3.00')
+        self.assertNotIn('digital_file', response.data['results'][0])
+
+    def test_selected_fields(self):
+        response = self.client.get(f'/api/products/batch/?ids={self.products[0].id}&fields=price,name')
+        self.assertEqual(response.data['results'], [{'id': self.products[0].id, 'name': 'P0', 'price': '1.00'}])
+
+    def test_post_body(self):
+        ids = [product.id for product in self.products]
+        response = self.client.post('/api/products/batch/', {'ids': ids[::-1], 'fields': ['name']}, format='json')
+        expected = [{'id': pk, 'name': f'P{i}'} for i, pk in enumerate(ids)]
+        self.assertEqual(response.data['results'], expected[::-1])
+        self.assertEqual(response.data['missing'], [])
+
+    def test_invalid_requests(self):
+        cases = [
+            ('?ids=', "ids is required"),
+            ('', "ids is required"),
+            ('?ids=1,x', "ids must be integers"),
+            ('?ids=' + ','.join(str(i) for i in range(501)), "At most 500 ids per request"),
+            ('?ids=1&fields=name,secret', "Unknown fields: secret"),
+            ('?ids=1&fields=digital_file', "Unknown fields: digital_file"),
+        ]
+        for query, error in cases:
+            response = self.client.get('/api/products/batch/' + query)
+            self.assertEqual((response.status_code, response.data), (400, {"error": error}), query)
+        response = self.client.post('/api/products/batch/', {'ids': [1, None]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        # id ซ้ำนับครั้งเดียวก่อนเทียบกับ max_ids
+        response = self.client.get('/api/products/batch/?ids=' + ','.join(['999999'] * 600))
+        self.assertEqual(response.data['missing'], [999999])
+
+
+def order_event(order_id, event_type, **payload):
+    return SimpleNamespace(order_id=order_id, event_type=event_type, payload=payload)
+
+
+class CooccurrenceTests(TestCase):
+    def test_counts_orders_containing_both_products(self):
+        # คำสั่งซื้อ 10 มีสินค้า 1 สองบรรทัด นับเป็นหนึ่ง
+        matrix = recommendations.cooccurrence_matrix([10, 10, 10, 11, 11, 12], [1, 1, 2, 1, 2, 3])
+        self.assertEqual(matrix.shape, (4, 4))
+        self.assertEqual(matrix[1, 2], 2)
+        self.assertEqual(matrix[2, 1], 2)
+        self.assertEqual(matrix[1, 1], 0)
+        self.assertEqual(matrix[3].nnz, 0)
+
+    def test_empty_input(self):
+        self.assertEqual(recommendations.cooccurrence_matrix([], [], n_products=3).nnz, 0)
+
+    def test_top_k_orders_by_score_then_id(self):
+        matrix = recommendations.cooccurrence_matrix(
+            [1, 1, 1, 1, 2, 2, 3, 3, 4, 4], [1, 2, 3, 4, 1, 3, 1, 3, 1, 4],
+        )
+        self.assertEqual(recommendations.top_k(matrix, [1], 2), {1: [[3, 3], [4, 2]]})
+        self.assertEqual(recommendations.top_k(matrix, [2], 5), {2: [[1, 1], [3, 1], [4, 1]]})
+
+
+class EventDeltaTests(TestCase):
+    def test_completed_orders_are_added_and_cancellations_subtracted(self):
+        signs, created_lines = recommendations._event_deltas([
+            order_event(1, OrderEvent.CREATED, status='completed', items=[{'product': 5, 'quantity': 1}]),
+            order_event(2, OrderEvent.CREATED, status='pending', items=[]),
+            order_event(2, OrderEvent.STATUS_CHANGED, old_status='pending', new_status='completed'),
+            order_event(3, OrderEvent.STATUS_CHANGED, old_status='completed', new_status='cancelled'),
+            order_event(4, OrderEvent.STATUS_CHANGED, old_status='pending', new_status='cancelled'),
+        ])
+        self.assertEqual(signs, {1: 1, 2: 1, 3: -1})
+        self.assertEqual(created_lines, {1: [5]})
+
+    def test_completed_then_cancelled_in_one_batch_cancels_out(self):
+        signs, _ = recommendations._event_deltas([
+            order_event(1, OrderEvent.CREATED, status='completed', items=[{'product': 5, 'quantity': 1}]),
+            order_event(1, OrderEvent.STATUS_CHANGED, old_status='completed', new_status='cancelled'),
+        ])
+        self.assertEqual(signs, {})
+
+    def test_order_lines_fall_back_to_order_items(self):
+        user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw')
+        product = Product.objects.create(name='Pen', description='d', price=Decimal('1.00'), category='physical')
+        order = Order.objects.create(user=user, total_price=Decimal('1.00'), status='cancelled')
+        OrderItem.objects.create(order=order, product=product, quantity=1)
+        lines = recommendations._order_lines([order.id, 99], {99: [7, 8]})
+        self.assertEqual(lines, {order.id: [product.id], 99: [7, 8]})
+
+
+@override_settings(ORDER_EVENTS_SETTLE_SECONDS=0)
+class RecommendationUpdateTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.matrix_path = os.path.join(directory.name, 'copurchase.npz')
+        override = override_settings(RECOMMENDATIONS_MATRIX_PATH=self.matrix_path)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.pen, self.ink, self.paper = (
+            Product.objects.create(name=name, description='d', price=Decimal('1.00'), category='physical')
+            for name in ('Pen', 'Ink', 'Paper')
+        )
+
+    def order(self, products, order_status='completed'):
+        order = Order.objects.create(user=self.user, total_price=Decimal('1.00'), status=order_status)
+        items = [OrderItem.objects.create(order=order, product=product, quantity=1) for product in products]
+        events.record_created(order, items)
+        return order
+
+    def related(self, product):
+        return ProductRecommendation.objects.get(product=product).related
+
+    def test_full_build_then_incremental_add_and_cancel(self):
+        self.order([self.pen, self.ink])
+        recommendations.full_build()
+        self.assertTrue(os.path.exists(self.matrix_path))
+        self.assertEqual(self.related(self.pen), [[self.ink.id, 1]])
+
+        order = self.order([self.pen, self.paper])
+        recommendations.incremental_update()
+        self.assertEqual(self.related(self.pen), [[self.ink.id, 1], [self.paper.id, 1]])
+
+        order.status = 'cancelled'
+        order.save()
+        events.record_status_changed(order, 'completed')
+        recommendations.incremental_update()
+        self.assertEqual(self.related(self.pen), [[self.ink.id, 1]])
+        self.assertFalse(ProductRecommendation.objects.filter(product=self.paper).exists())
+
+    def test_each_batch_is_stored_before_the_cursor_moves(self):
+        recommendations.full_build()
+        self.order([self.pen, self.ink])
+        self.order([self.pen, self.paper])
+        order_lines = recommendations._order_lines
+        calls = []
+
+        def fail_on_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("crash")
+            return order_lines(*args)
+
+        with mock.patch.object(recommendations, '_order_lines', side_effect=fail_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                recommendations.incremental_update(batch_size=1)
+        # batch แรกถูกบันทึกครบ และตำแหน่งหยุดที่ batch แรก
+        self.assertEqual(self.related(self.pen), [[self.ink.id, 1]])
+        first_event = OrderEvent.objects.order_by('id').first()
+        self.assertEqual(OrderEventCursor.objects.get(name=recommendations.CONSUMER_NAME).position, first_event.id)
+
+        recommendations.incremental_update(batch_size=1)
+        self.assertEqual(self.related(self.pen), [[self.ink.id, 1], [self.paper.id, 1]])
+
+    def test_full_build_saves_matrix_before_moving_the_cursor(self):
+        self.order([self.pen, self.ink])
+        with mock.patch.object(recommendations, 'save_matrix', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                recommendations.full_build()
+        self.assertFalse(OrderEventCursor.objects.filter(name=recommendations.CONSUMER_NAME, position__gt=0).exists())
+
+    def test_also_bought_endpoint(self):
+        self.order([self.pen, self.ink])
+        self.order([self.pen, self.ink, self.paper])
+        recommendations.full_build()
+        response = APIClient().get(f'/api/products/{self.pen.id}/also-bought/?limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item['id'], item['score']) for item in response.data['results']], [(self.ink.id, 2)])
+        response = APIClient().get('/api/products/999/also-bought/')
+        self.assertEqual(response.data['results'], [])
+
+
+class ProductAdminStockTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.pen = Product.objects.create(name='Pen', description='d', price=Decimal('1.00'), category='physical', stock=5)
+        self.ink = Product.objects.create(name='Ink', description='d', price=Decimal('1.00'), category='physical', stock=1)
+        patcher = mock.patch.object(snapshot, 'schedule_rebuild')
+        self.schedule_rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def act(self, action, amount):
+        return self.client.post('/admin/products/product/', {
+            'action': action, 'amount': amount, '_selected_action': [self.pen.pk, self.ink.pk],
+        })
+
+    def stock(self):
+        return list(Product.objects.order_by('id').values_list('stock', flat=True))
+
+    def test_add_stock_clamps_at_zero(self):
+        self.act('add_stock', -3)
+        self.assertEqual(self.stock(), [2, 0])
+        self.schedule_rebuild.assert_called_once()
+
+    def test_set_stock(self):
+        self.act('set_stock', 7)
+        self.assertEqual(self.stock(), [7, 7])
+
+    def test_invalid_amounts_change_nothing(self):
+        self.act('set_stock', -1)
+        self.act('add_stock', '')
+        self.assertEqual(self.stock(), [5, 1])
+        self.schedule_rebuild.assert_not_called()
+
+
+class DigitalDownloadTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = Product._meta.get_field('digital_file').storage
+        patcher = mock.patch.dict(storage.__dict__, {'base_location': directory.name, 'location': directory.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.buyer = get_user_model().objects.create_user(username='buyer', password='pw')
+        self.other = get_user_model().objects.create_user(username='other', password='pw')
+        self.ebook = Product.objects.create(name='Ebook', description='d', price=Decimal('5.00'), category='digital')
+        self.ebook.digital_file.save('ebook.pdf', ContentFile(b'%PDF-ebook'))
+        self.other_ebook = Product.objects.create(name='Other', description='d', price=Decimal('5.00'), category='digital')
+        self.other_ebook.digital_file.save('other.pdf', ContentFile(b'%PDF-other'))
+        self.order = Order.objects.create(user=self.buyer, total_price=Decimal('5.00'), status='completed')
+        OrderItem.objects.create(order=self.order, product=self.ebook, quantity=1)
+        self.client = APIClient()
+
+    def link(self, user, product):
+        self.client.force_authenticate(user)
+        response = self.client.post(f'/api/products/{product.id}/download-link/')
+        self.client.force_authenticate(None)
+        return response
+
+    def sign(self, product_id, user_id):
+        return signing.TimestampSigner(salt=DOWNLOAD_SALT).sign_object({'p': product_id, 'u': user_id})
+
+    def download(self, token, **headers):
+        response = self.client.get(f'/api/products/download/{token}/', **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_link_downloads_the_file(self):
+        response = self.link(self.buyer, self.ebook)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], 300)
+
+        download = self.client.get(response.data['url'])
+        self.addCleanup(download.close)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(b''.join(download.streaming_content), b'%PDF-ebook')
+        self.assertIn('attachment', download['Content-Disposition'])
+        self.assertIn('no-store', download['Cache-Control'])
+
+    def test_range_and_conditional_download(self):
+        token = self.sign(self.ebook.id, self.buyer.id)
+        partial = self.download(token, HTTP_RANGE='bytes=-5')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(b''.join(partial.streaming_content), b'ebook')
+        self.assertEqual(self.download(token, HTTP_IF_NONE_MATCH=partial['ETag']).status_code, 304)
+
+    def test_link_requires_a_completed_purchase(self):
+        self.assertEqual(self.link(self.other, self.ebook).status_code, 403)
+        self.assertEqual(self.link(self.buyer, self.other_ebook).status_code, 403)
+        self.order.status = 'pending'
+        self.order.save()
+        self.assertEqual(self.link(self.buyer, self.ebook).status_code, 403)
+
+    def test_link_needs_a_digital_file(self):
+        physical = Product.objects.create(name='Pen', description='d', price=Decimal('1.00'), category='physical')
+        self.assertEqual(self.link(self.buyer, physical).status_code, 404)
+        self.ebook.digital_file = None
+        self.ebook.save()
+        self.assertEqual(self.link(self.buyer, self.ebook).status_code, 404)
+
+    def test_expired_link(self):
+        token = self.sign(self.ebook.id, self.buyer.id)
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 301):
+            response = self.download(token)
+        self.assertEqual(response.status_code, 410)
+
+    @override_settings(DOWNLOAD_LINK_MAX_AGE=600)
+    def test_link_age_follows_setting(self):
+        token = self.sign(self.ebook.id, self.buyer.id)
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 301):
+            self.assertEqual(self.download(token).status_code, 200)
+
+    def test_tampered_link(self):
+        token = self.sign(self.ebook.id, self.buyer.id)
+        self.assertEqual(self.download(token[:-1] + ('A' if token[-1] != 'A' else 'B')).status_code, 403)
+        forged = signing.TimestampSigner(salt='other').sign_object({'p': self.ebook.id, 'u': self.buyer.id})
+        self.assertEqual(self.download(forged).status_code, 403)
+
+    def test_token_for_another_user_or_product(self):
+        # ลายเซ็นถูกต้อง แต่ผู้ใช้/สินค้าในโทเค็นไม่มีการซื้อ
+        self.assertEqual(self.download(self.sign(self.ebook.id, self.other.id)).status_code, 403)
+        self.assertEqual(self.download(self.sign(self.other_ebook.id, self.buyer.id)).status_code, 403)
+        self.assertEqual(self.download(self.sign(self.ebook.id, 0)).status_code, 404)
+
+    def test_cancelled_after_link_was_issued(self):
+        url = self.link(self.buyer, self.ebook).data['url']
+        self.order.status = 'cancelled'
+        self.order.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-accel')
+    def test_x_accel_uses_private_prefix(self):
+        response = self.download(self.sign(self.ebook.id, self.buyer.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-downloads/{self.ebook.digital_file.name}')
+
+
+class ProductBrowseTests(TestCase):
+    def setUp(self):
+        # ราคาและคะแนนซ้ำกันหลายแถว เพื่อให้ cursor ต้องใช้ id ตัดสิน
+        rows = [('10.00', '4.50'), ('5.00', '3.00'), ('10.00', '4.50'), ('7.50', '5.00'), ('10.00', '3.00'), ('5.00', '4.50')]
+        self.products = []
+        for i, (price, rating) in enumerate(rows):
+            product = Product.objects.create(name=f'P{i}', description='d', price=Decimal(price), category='physical')
+            Product.objects.filter(pk=product.pk).update(average_rating=Decimal(rating))
+            product.refresh_from_db()
+            self.products.append(product)
+        Product.objects.create(name='Ebook', description='d', price=Decimal('1.00'), category='digital')
+        self.client = APIClient()
+
+    def browse(self, **params):
+        return self.client.get('/api/products/browse/', {'category': 'physical', **params})
+
+    def walk(self, sort, limit=2, **params):
+        ids, after = [], None
+        while True:
+            response = self.browse(sort=sort, limit=limit, **({'after': after} if after else {}), **params)
+            self.assertEqual(response.status_code, 200)
+            ids += [product['id'] for product in response.data['results']]
+            after = response.data['next']
+            if after is None:
+                return ids
+
+    def expected(self, key):
+        return [product.id for product in sorted(self.products, key=key)]
+
+    def test_price_pages_with_ties(self):
+        self.assertEqual(self.walk('price'), self.expected(lambda p: (p.price, p.id)))
+        self.assertEqual(self.walk('price', limit=1), self.expected(lambda p: (p.price, p.id)))
+
+    def test_descending_price(self):
+        self.assertEqual(self.walk('-price'), self.expected(lambda p: (-p.price, -p.id)))
+
+    def test_rating_pages_with_ties(self):
+        self.assertEqual(self.walk('rating', limit=1), self.expected(lambda p: (-p.average_rating, p.id)))
+
+    def test_price_range(self):
+        ids = self.walk('price', min_price='6', max_price='10.00')
+        self.assertEqual(ids, self.expected(lambda p: (p.price, p.id))[2:])
+        self.assertEqual(self.browse(min_price='abc').status_code, 400)
+
+    def test_category_is_required(self):
+        response = self.client.get('/api/products/browse/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "category is required"})
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.browse(sort='name').status_code, 400)
+        self.assertEqual(self.browse(limit=0).status_code, 400)
+        for cursor in ('garbage', 'W10', browse.encode_cursor('price', 'NaN', 1), browse.encode_cursor('price', '1', 'x')):
+            self.assertEqual(self.browse(after=cursor).status_code, 400, cursor)
+
+    def test_cursor_is_bound_to_its_sort(self):
+        after = self.browse(sort='price', limit=2).data['next']
+        response = self.browse(sort='-price', after=after)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Invalid cursor"})
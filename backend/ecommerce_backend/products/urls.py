@@ -6,9 +6,16 @@ urlpatterns = [
     path('<int:pk>/', ProductDetailAPIView.as_view(), name='product-detail'),
     path('admin/', AdminCRUDProduct.as_view(), name='admin-product-list-create'),
     path('admin/<int:pk>/', AdminCRUDProduct.as_view(), name='admin-product-detail'),
+    path('batch/', ProductBatchAPIView.as_view(), name='product-batch'),
+    path('browse/', ProductBrowseAPIView.as_view(), name='product-browse'),
     path('search/', ProductSearchAPIView.as_view(), name='search-products'),
+    path('suggest/', ProductSuggestAPIView.as_view(), name='product-suggest'),
     path('<int:product_id>/reviews/', ProductReviewsAPIView.as_view(), name='product-reviews'),
     path('<int:product_id>/can-review/', CanReviewProductAPIView.as_view(), name='can-review-product'),
+    path('<int:product_id>/also-bought/', AlsoBoughtAPIView.as_view(), name='product-also-bought'),
+    path('<int:product_id>/download-link/', DigitalDownloadLinkAPIView.as_view(), name='product-download-link'),
+    path('download/<str:token>/', DigitalDownloadAPIView.as_view(), name='product-download'),
+    path('reviews/<int:review_id>/helpful/', ReviewHelpfulAPIView.as_view(), name='review-helpful'),
     path('reviewable-products/', ReviewableProductsAPIView.as_view(), name='reviewable-products'),
 
 ]
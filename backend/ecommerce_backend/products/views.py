@@ -1,22 +1,52 @@
+import os
+
 from django.shortcuts import render
 
 # Create your views here.
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Product, Review
-from .serializers import ProductSerializer, ReviewSerializer, ReviewCreateSerializer
+from .models import Product, Review, ProductRecommendation
+from .serializers import ProductSerializer, ProductFieldsSerializer, ReviewSerializer, ReviewCreateSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
 from django.db.models import Avg
+from django.http import HttpResponse
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.urls import reverse
+from ecommerce_backend.media import serve_file
+from orders import archive
 from orders.models import Order, OrderItem
+from . import browse, helpful, ranking, snapshot, suggest
+
+
+def snapshot_response(request, section):
+    """ตอบจาก catalog snapshot เมื่อ client ขอ JSON แบบปกติ คืน None ถ้าใช้ snapshot ไม่ได้"""
+    if request.accepted_media_type != 'application/json':
+        return None
+    payload = snapshot.get_section(section)
+    if payload is None:
+        return None
+    return HttpResponse(payload, content_type='application/json')
+
 
 class ProductListAPIView(APIView):
     """เรียกดูสินค้าทั้งหมด"""
     def get(self, request):
-        products = Product.objects.all().order_by('id')
+        sort = request.query_params.get('sort')
+        if sort and sort not in ranking.SORT_ORDERINGS:
+            return Response({"error": "Invalid sort value"}, status=status.HTTP_400_BAD_REQUEST)
+        if not sort:
+            response = snapshot_response(request, 'all')
+            if response is not None:
+                return response
+        ordering = ranking.SORT_ORDERINGS[sort] if sort else ('id',)
+        products = Product.objects.all().order_by(*ordering)
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -31,6 +61,54 @@ class ProductDetailAPIView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class ProductBatchAPIView(APIView):
+    """ดึงสินค้าหลายรายการในคิวรีเดียว (?ids=1,2,3&fields=id,name,price)"""
+    permission_classes = [AllowAny]
+    max_ids = 500
+
+    def get(self, request):
+        return self.lookup(
+            request.query_params.get('ids', '').split(','),
+            [name for name in request.query_params.get('fields', '').split(',') if name],
+        )
+
+    def post(self, request):
+        """สำหรับรายการ id ที่ยาวเกินกว่าจะใส่ใน URL: {"ids": [...], "fields": [...]}"""
+        return self.lookup(request.data.get('ids') or [], request.data.get('fields') or [])
+
+    def lookup(self, raw_ids, fields):
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids if str(value).strip()))
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"error": "ids is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_ids:
+            return Response(
+                {"error": f"At most {self.max_ids} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # digital_file เป็น write-only จึงเลือกไม่ได้
+        unknown = set(fields) - (set(ProductSerializer.Meta.fields) - {'digital_file'})
+        if unknown:
+            return Response(
+                {"error": f"Unknown fields: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = Product.objects.all()
+        if fields:
+            fields = ['id', *[name for name in fields if name != 'id']]
+            queryset = queryset.only(*fields)
+        products = queryset.in_bulk(ids)
+        found = [products[pk] for pk in ids if pk in products]
+        serializer = ProductFieldsSerializer(found, many=True, fields=fields or None)
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in products],
+        })
+
+
 class AdminCRUDProduct(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     parser_classes = (MultiPartParser, FormParser)
@@ -75,6 +153,15 @@ class ProductSearchAPIView(APIView):
         category = request.query_params.get('category', '')
         min_price = request.query_params.get('min_price')
         max_price = request.query_params.get('max_price')
+        sort = request.query_params.get('sort')
+        if sort and sort not in ranking.SORT_ORDERINGS:
+            return Response({"error": "Invalid sort value"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # หน้าหมวดหมู่ที่ไม่มีเงื่อนไขอื่น ตอบจาก snapshot ได้เลย
+        if category and not (query or min_price or max_price or sort):
+            response = snapshot_response(request, snapshot.category_section(category))
+            if response is not None:
+                return response
         
         # เริ่มจาก QuerySet ทั้งหมด
         queryset = Product.objects.all()
@@ -93,8 +180,8 @@ class ProductSearchAPIView(APIView):
         # กรองตามราคาต่ำสุด
         if min_price:
             try:
-                queryset = queryset.filter(price__gte=float(min_price))
-            except (ValueError, TypeError):
+                queryset = queryset.filter(price__gte=browse.parse_price(min_price))
+            except ValueError:
                 return Response(
                     {"error": "Invalid min_price value"},
                     status=status.HTTP_400_BAD_REQUEST
@@ -103,18 +190,95 @@ class ProductSearchAPIView(APIView):
         # กรองตามราคาสูงสุด
         if max_price:
             try:
-                queryset = queryset.filter(price__lte=float(max_price))
-            except (ValueError, TypeError):
+                queryset = queryset.filter(price__lte=browse.parse_price(max_price))
+            except ValueError:
                 return Response(
                     {"error": "Invalid max_price value"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
+        # เรียงตามคะแนนที่คำนวณไว้แล้ว (popular / trending)
+        if sort:
+            queryset = queryset.order_by(*ranking.SORT_ORDERINGS[sort])
+
         # Serialize ข้อมูล
         serializer = ProductSerializer(queryset, many=True)
         return Response(serializer.data)
     
 
+class ProductBrowseAPIView(APIView):
+    """
+    เรียกดูสินค้าตามหมวดหมู่และช่วงราคา แบบ keyset pagination
+
+    ``?category=&min_price=&max_price=&sort=price|-price|rating&after=<cursor>&limit=``;
+    the response carries ``next`` (cursor for the following page, or null).
+    ``category`` is required so every page is a range scan of its index.
+    """
+    permission_classes = [AllowAny]
+    default_limit = 24
+    max_limit = 100
+
+    def get(self, request):
+        sort = request.query_params.get('sort', 'price')
+        if sort not in browse.BROWSE_ORDERINGS:
+            return Response({"error": "Invalid sort value"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "Invalid limit value"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "Invalid limit value"}, status=status.HTTP_400_BAD_REQUEST)
+
+        category = request.query_params.get('category')
+        if not category:
+            return Response({"error": "category is required"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = Product.objects.filter(category=category)
+        for param, lookup in (('min_price', 'price__gte'), ('max_price', 'price__lte')):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: browse.parse_price(value)})
+            except ValueError:
+                return Response({"error": f"Invalid {param} value"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            products, next_cursor = browse.browse_page(
+                queryset, sort, after=request.query_params.get('after'), limit=limit
+            )
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ProductSerializer(products, many=True)
+        return Response({'results': serializer.data, 'next': next_cursor})
+
+
+class ProductSuggestAPIView(APIView):
+    """
+    คำแนะนำชื่อสินค้าระหว่างพิมพ์ในช่องค้นหา ``?q=&limit=``
+
+    Answered from the in-memory prefix index in ``products.suggest``;
+    returns ``{"results": [{"id", "name"}, ...]}`` ordered by popularity.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    default_limit = 8
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), suggest.get_max_limit())
+        except ValueError:
+            return Response({"error": "Invalid limit value"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "Invalid limit value"}, status=status.HTTP_400_BAD_REQUEST)
+
+        index = suggest.get_index()
+        if index is None:
+            # index ของ worker นี้ยัง build ครั้งแรกไม่เสร็จ
+            return Response({'results': []})
+        matches = index.search(request.query_params.get('q', ''), limit)
+        return Response({'results': [{'id': product_id, 'name': name} for product_id, name in matches]})
+
+
 class ProductReviewsAPIView(APIView):
     """API สำหรับดูและสร้างรีวิวของสินค้า"""
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -122,7 +286,18 @@ class ProductReviewsAPIView(APIView):
     def get(self, request, product_id):
         """ดึงรายการรีวิวทั้งหมดของสินค้า"""
         product = get_object_or_404(Product, id=product_id)
-        reviews = Review.objects.filter(product=product)
+        all_reviews = Review.objects.filter(product=product, status=Review.PUBLISHED)
+
+        # ?sort=helpful เรียงตามจำนวนโหวตที่ fold แล้ว (มี index รองรับ)
+        sort = request.query_params.get('sort')
+        if sort == 'helpful':
+            reviews = all_reviews.order_by('-helpful_count', '-created_at')
+        elif sort == 'newest':
+            reviews = all_reviews.order_by('-created_at')
+        elif sort:
+            return Response({"error": "Invalid sort value"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            reviews = all_reviews
         
         # ถ้ามีพารามิเตอร์ limit ใส่เข้ามา
         limit = request.query_params.get('limit')
@@ -131,65 +306,60 @@ class ProductReviewsAPIView(APIView):
         
         serializer = ReviewSerializer(reviews, many=True)
         
-        # ข้อมูลสรุป
-        avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+        # ข้อมูลสรุป (คิดจากรีวิวทั้งหมด ไม่ใช่เฉพาะที่ตัดด้วย limit)
+        avg_rating = all_reviews.aggregate(Avg('rating'))['rating__avg'] or 0
         rating_distribution = {}
         for i in range(1, 6):
-            rating_distribution[i] = reviews.filter(rating=i).count()
+            rating_distribution[i] = all_reviews.filter(rating=i).count()
         
         return Response({
             'reviews': serializer.data,
-            'count': reviews.count(),
+            'count': all_reviews.count(),
             'average_rating': round(avg_rating, 2),
             'rating_distribution': rating_distribution
         })
     
     def post(self, request, product_id):
-        """สร้างรีวิวใหม่ (ตรวจสอบว่าผู้ใช้ซื้อสินค้าแล้ว)"""
+        """
+        รับรีวิวใหม่เข้าคิว (ตรวจสอบว่าผู้ใช้ซื้อสินค้าแล้ว)
+
+        The review is stored and answered with 201 as before, with
+        ``"status": "pending"`` in the body; it is published (and counted
+        in the product rating) by ``manage.py publish_reviews``.
+        """
         user = request.user
-        product = get_object_or_404(Product, id=product_id)
+        serializer = ReviewCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not Product.objects.filter(id=product_id).exists():
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         
-        # ตรวจสอบว่าผู้ใช้ซื้อสินค้านี้หรือไม่
-        has_purchased = OrderItem.objects.filter(
+        # order ล่าสุดที่ซื้อสินค้านี้ (สินค้าต้องถูกส่งแล้ว) ใช้ตรวจสอบการซื้อไปในคิวรีเดียว
+        order_id = OrderItem.objects.filter(
             order__user=user,
-            order__status='completed',  # สินค้าต้องถูกส่งแล้ว
-            product=product
-        ).exists()
+            order__status='completed',
+            product_id=product_id
+        ).order_by('-order__created_at').values_list('order_id', flat=True).first()
         
-        if not has_purchased:
+        if order_id is None and not archive.has_completed_purchase(user, product_id):
             return Response(
                 {"error": "คุณสามารถรีวิวได้เฉพาะสินค้าที่คุณซื้อแล้วเท่านั้น"},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # ตรวจสอบว่าเคยรีวิวหรือยัง
-        if Review.objects.filter(user=user, product=product).exists():
+        # unique (user, product) กันรีวิวซ้ำ ไม่ต้องคิวรีตรวจก่อน
+        try:
+            with transaction.atomic():
+                review = serializer.save(user=user, product_id=product_id, order_id=order_id, status=Review.PENDING)
+        except IntegrityError:
             return Response(
                 {"error": "คุณได้รีวิวสินค้านี้ไปแล้ว"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # หา order ล่าสุดที่ซื้อสินค้านี้
-        order_item = OrderItem.objects.filter(
-            order__user=user,
-            order__status='completed',
-            product=product
-        ).order_by('-order__created_at').first()
-        
-        # สร้างรีวิว
-        serializer = ReviewCreateSerializer(data=request.data)
-        if serializer.is_valid():
-            review = serializer.save(
-                user=user, 
-                product=product,
-                order=order_item.order if order_item else None
-            )
-            
-            # ส่งข้อมูลรีวิวกลับไป
-            return_serializer = ReviewSerializer(review)
-            return Response(return_serializer.data, status=status.HTTP_201_CREATED)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # ส่งข้อมูลรีวิวกลับไป (status: pending)
+        return_serializer = ReviewSerializer(review)
+        return Response(return_serializer.data, status=status.HTTP_201_CREATED)
 
 class CanReviewProductAPIView(APIView):
     """ตรวจสอบว่าผู้ใช้สามารถรีวิวสินค้านี้ได้หรือไม่"""
@@ -200,11 +370,7 @@ class CanReviewProductAPIView(APIView):
         product = get_object_or_404(Product, id=product_id)
         
         # ตรวจสอบว่าซื้อสินค้านี้หรือยัง
-        has_purchased = OrderItem.objects.filter(
-            order__user=user,
-            order__status='completed',
-            product=product
-        ).exists()
+        has_purchased = archive.has_completed_purchase(user, product.id)
         
         # ตรวจสอบว่าเคยรีวิวหรือยัง
         has_reviewed = Review.objects.filter(
@@ -228,10 +394,7 @@ class ReviewableProductsAPIView(APIView):
         user = request.user
         
         # สินค้าที่ซื้อและจัดส่งแล้ว
-        purchased_products_ids = OrderItem.objects.filter(
-            order__user=user,
-            order__status='completed'
-        ).values_list('product_id', flat=True).distinct()
+        purchased_products_ids = archive.purchased_product_ids(user)
         
         # สินค้าที่เคยรีวิวแล้ว
         reviewed_products_ids = Review.objects.filter(
@@ -257,4 +420,117 @@ class ReviewableProductsAPIView(APIView):
         return Response({
             'count': len(products_data),
             'products': products_data
-        })
\ No newline at end of file
+        })
+
+
+class AlsoBoughtAPIView(APIView):
+    """สินค้าที่ลูกค้ามักซื้อคู่กับสินค้านี้ (คำนวณล่วงหน้า)"""
+    permission_classes = [AllowAny]
+
+    def get(self, request, product_id):
+        limit = request.query_params.get('limit')
+        related = (
+            ProductRecommendation.objects.filter(product_id=product_id)
+            .values_list('related', flat=True).first()
+        ) or []
+        if limit and limit.isdigit():
+            related = related[:int(limit)]
+
+        scores = dict(related)
+        products = Product.objects.in_bulk(list(scores))
+        serializer = ProductSerializer([products[pid] for pid in scores if pid in products], many=True)
+        return Response({
+            'product': product_id,
+            'results': [dict(item, score=scores[item['id']]) for item in serializer.data],
+        })
+
+
+class ReviewHelpfulAPIView(APIView):
+    """โหวตว่ารีวิวมีประโยชน์ / ยกเลิกโหวต"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, review_id):
+        review = get_object_or_404(Review, id=review_id, status=Review.PUBLISHED)
+        if review.user_id == request.user.id:
+            return Response(
+                {"error": "ไม่สามารถโหวตรีวิวของตัวเองได้"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        created = helpful.add_vote(review, request.user)
+        return Response({
+            'review': review.id,
+            'voted': True,
+            'helpful_count': helpful.current_count(review),
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request, review_id):
+        review = get_object_or_404(Review, id=review_id)
+        if not helpful.remove_vote(review, request.user):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'review': review.id,
+            'voted': False,
+            'helpful_count': helpful.current_count(review),
+        })
+
+
+DOWNLOAD_SALT = 'products.download'
+
+
+class DigitalDownloadLinkAPIView(APIView):
+    """ขอลิงก์ดาวน์โหลดไฟล์ของสินค้าดิจิทัลที่ซื้อแล้ว (ลิงก์หมดอายุตาม DOWNLOAD_LINK_MAX_AGE)"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, product_id):
+        product = get_object_or_404(Product, id=product_id, category='digital')
+        if not product.digital_file:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        if not archive.has_completed_purchase(request.user, product.id):
+            return Response(
+                {"error": "ดาวน์โหลดได้เฉพาะสินค้าที่คุณซื้อแล้วเท่านั้น"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        token = signing.TimestampSigner(salt=DOWNLOAD_SALT).sign_object({'p': product.id, 'u': request.user.id})
+        return Response({
+            'url': request.build_absolute_uri(reverse('product-download', args=[token])),
+            'expires_in': getattr(settings, 'DOWNLOAD_LINK_MAX_AGE', 300),
+        })
+
+
+class DigitalDownloadAPIView(APIView):
+    """
+    ดาวน์โหลดไฟล์ด้วยลิงก์ที่ลงชื่อแล้ว
+
+    The signed token is the credential, so the link works from a plain
+    ``<a href>``; the purchase is checked again in case the order was
+    cancelled after the link was issued.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def perform_content_negotiation(self, request, force=False):
+        # ตอบเป็นไฟล์เสมอ ไม่ว่า Accept จะเป็นอะไร
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, token):
+        try:
+            claims = signing.TimestampSigner(salt=DOWNLOAD_SALT).unsign_object(
+                token, max_age=getattr(settings, 'DOWNLOAD_LINK_MAX_AGE', 300)
+            )
+        except signing.SignatureExpired:
+            return Response({"error": "Download link has expired"}, status=status.HTTP_410_GONE)
+        except signing.BadSignature:
+            return Response({"error": "Invalid download link"}, status=status.HTTP_403_FORBIDDEN)
+
+        product = get_object_or_404(Product.objects.only('id', 'digital_file'), id=claims['p'])
+        user = get_user_model().objects.filter(pk=claims['u']).first()
+        if not product.digital_file or user is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        if not archive.has_completed_purchase(user, product.id):
+            return Response({"error": "Invalid download link"}, status=status.HTTP_403_FORBIDDEN)
+        return serve_file(
+            request, product.digital_file.storage.location, product.digital_file.name,
+            accel_prefix=getattr(settings, 'MEDIA_ACCEL_PRIVATE_PREFIX', '/protected-downloads/'),
+            filename=os.path.basename(product.digital_file.name),
+            public=False,
+        )
@@ -1,6 +1,18 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
 
 # Register your models here.
+from ecommerce_backend.admin import EstimatedCountPaginator
 from .models import CustomUser
 
-admin.site.register(CustomUser)
\ No newline at end of file
+
+@admin.register(CustomUser)
+class CustomUserAdmin(UserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    fieldsets = UserAdmin.fieldsets + (
+        ('Contact', {'fields': ('phone_number',)}),
+    )
+    # ค้นหาแบบตรงตัวใช้ unique index ของ username (และใช้กับ autocomplete)
+    search_fields = ['=username']
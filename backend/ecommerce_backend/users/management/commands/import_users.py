@@ -0,0 +1,59 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import provisioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from a CSV (with header) or NDJSON file. Rows carry either password_hash "
+        "(any PASSWORD_HASHERS format, stored as is) or password (hashed across a process pool)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--input-format', choices=provisioning.INPUT_FORMATS, help="Default: from the file extension")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per bulk_create (default: USER_IMPORT_BATCH_SIZE)")
+        parser.add_argument('--workers', type=int, default=None, help="Hashing processes (default: USER_IMPORT_WORKERS or CPU count)")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and hash but do not insert")
+        parser.add_argument('--show-duplicates', action='store_true', help="List every duplicate username")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['input_format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+
+        started = time.perf_counter()
+
+        def progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {report['created']} created, {len(report['duplicates'])} duplicates, "
+                f"{len(report['errors'])} errors ({report['created'] / elapsed:.0f} users/s)"
+            )
+
+        with open(path, encoding='utf-8-sig', newline='') as f, provisioning.create_pool(options['workers']) as pool:
+            try:
+                report = provisioning.import_users(
+                    provisioning.read_records(f, input_format), pool=pool,
+                    batch_size=options['batch_size'], dry_run=options['dry_run'], on_batch=progress,
+                )
+            except (ValueError, csv.Error) as exc:
+                # แถว NDJSON ที่ไม่ใช่ JSON หรือ CSV ที่เสีย
+                raise CommandError(f"Could not read {path}: {exc}")
+
+        elapsed = time.perf_counter() - started
+        for error in report['errors']:
+            self.stderr.write(f"  row {error['row']}: {error['error']}")
+        if options['show_duplicates']:
+            for username in report['duplicates']:
+                self.stdout.write(f"  duplicate: {username}")
+        verb = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['created']} users in {elapsed:.1f}s; "
+            f"{len(report['duplicates'])} duplicates skipped, {len(report['errors'])} invalid rows"
+        ))
@@ -0,0 +1,206 @@
+"""
+Bulk user import (``manage.py import_users``, ``/api/auth/admin/import/``).
+
+Each record is a dict with ``username`` and optionally ``email``,
+``first_name``, ``last_name``, ``phone_number`` and either
+``password_hash`` or ``password``:
+
+* ``password_hash`` must already be in one of the formats of
+  ``PASSWORD_HASHERS`` (checked with ``identify_hasher``). It is stored
+  as is, and Django re-hashes it with the preferred hasher on the user's
+  next login. An unusable hash (``!...``) is also accepted.
+* ``password`` is plain text. It is hashed with ``make_password`` in a
+  process pool, because the hashers are deliberately slow and CPU-bound,
+  so throughput scales with the number of workers. Only the command
+  accepts it; the endpoint runs inside a web worker and takes
+  ``password_hash`` rows only.
+
+Password validators are not applied, because these are existing
+customers' passwords. Users whose username already exists, or appears
+earlier in the same import, are reported as duplicates and skipped.
+Rows are inserted with ``bulk_create`` in batches.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = ('username', 'email', 'first_name', 'last_name', 'phone_number')
+INPUT_FORMATS = ('csv', 'ndjson')
+
+
+def get_workers():
+    return getattr(settings, 'USER_IMPORT_WORKERS', None) or os.cpu_count() or 1
+
+
+def get_batch_size():
+    return getattr(settings, 'USER_IMPORT_BATCH_SIZE', 1000)
+
+
+def _init_worker():
+    # process แบบ spawn เริ่มจากศูนย์ ต้องตั้งค่า Django ก่อนเรียก make_password
+    import django
+    django.setup()
+
+
+def create_pool(workers=None):
+    return ProcessPoolExecutor(max_workers=workers or get_workers(), mp_context=get_context('spawn'), initializer=_init_worker)
+
+
+def hash_passwords(passwords, pool=None):
+    """hash รหัสผ่านใน pool คืนค่า (hashes, pool) โดย pool เป็น None ถ้า pool เสียและ hash ใน process นี้แทน"""
+    if pool is not None:
+        try:
+            return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (get_workers() * 4)))), pool
+        except BrokenProcessPool:
+            logger.warning("Password-hashing pool broke; hashing in-process for the rest of this import")
+            pool.shutdown(wait=False, cancel_futures=True)
+    return [make_password(password) for password in passwords], None
+
+
+def read_records(stream, input_format):
+    """อ่าน record จากไฟล์ข้อความ CSV (มีหัวตาราง) หรือ NDJSON"""
+    if input_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def open_upload(upload, input_format=None):
+    """คืนค่า (stream, format) จากไฟล์ที่อัปโหลด โดยเดารูปแบบจากนามสกุลถ้าไม่ระบุ"""
+    if input_format is None:
+        input_format = 'csv' if upload.name.lower().endswith('.csv') else 'ndjson'
+    return io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), input_format
+
+
+def _build_user(User, record, allow_passwords=True):
+    """สร้าง instance (ยังไม่บันทึก) และ password ที่ต้อง hash หรือ ValidationError"""
+    if not isinstance(record, dict):
+        raise ValidationError("row must be an object")
+    # แถวจาก JSON อาจมีค่าที่ไม่ใช่ข้อความ
+    for field in (*IMPORT_FIELDS, 'password', 'password_hash'):
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise ValidationError(f"{field} must be a string")
+    values = {field: (record.get(field) or '').strip() for field in IMPORT_FIELDS}
+    if not values['username']:
+        raise ValidationError("username is required")
+    user = User(**values)
+    if not user.phone_number:
+        user.phone_number = None
+
+    password_hash = record.get('password_hash')
+    password = record.get('password')
+    if password_hash:
+        if not password_hash.startswith(UNUSABLE_PASSWORD_PREFIX):
+            try:
+                identify_hasher(password_hash)
+            except ValueError:
+                raise ValidationError("password_hash is not in a supported format")
+        user.password = password_hash
+        password = None
+    elif not password:
+        raise ValidationError("password or password_hash is required")
+    elif not allow_passwords:
+        raise ValidationError("plain-text password is not accepted here; send password_hash or use manage.py import_users")
+
+    user.full_clean(exclude=['password'], validate_unique=False, validate_constraints=False)
+    return user, password
+
+
+def insert_each(User, users, report):
+    """บันทึกทีละแถว แถวที่ชนกับ username ที่มีอยู่แล้วถูกนับเป็น duplicate คืนค่าจำนวนที่สร้างได้"""
+    created = 0
+    for user in users:
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except IntegrityError:
+            user.pk = None
+            report['duplicates'].append(user.username)
+        else:
+            created += 1
+    return created
+
+
+def import_users(records, pool=None, batch_size=None, dry_run=False, on_batch=None, allow_passwords=True):
+    """
+    นำเข้าผู้ใช้จาก iterable ของ dict คืนค่า report
+
+    The report is ``{'created', 'duplicates', 'errors'}`` where
+    ``duplicates`` lists usernames and ``errors`` holds
+    ``{'row', 'error'}`` with 1-based row numbers. ``pool`` is an
+    executor for hashing plain-text passwords (``create_pool``);
+    ``on_batch(report)`` is called after each batch. With
+    ``allow_passwords=False`` rows with a plain-text ``password`` are
+    reported as errors instead of hashed.
+    """
+    User = get_user_model()
+    batch_size = batch_size or get_batch_size()
+    report = {'created': 0, 'duplicates': [], 'errors': []}
+    seen = set()
+    batch = []
+    hashing = {'pool': pool}
+
+    def flush():
+        usernames = [user.username for user, _ in batch]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        pending = []
+        for user, password in batch:
+            if user.username in existing:
+                report['duplicates'].append(user.username)
+            else:
+                pending.append((user, password))
+
+        to_hash = [(user, password) for user, password in pending if password is not None]
+        if to_hash:
+            hashed, hashing['pool'] = hash_passwords([password for _, password in to_hash], hashing['pool'])
+            for (user, _), encoded in zip(to_hash, hashed):
+                user.password = encoded
+
+        if not dry_run and pending:
+            users = [user for user, _ in pending]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create(users, batch_size=batch_size)
+            except IntegrityError:
+                # มีผู้ใช้ชื่อซ้ำถูกสร้างหลังตรวจ (สมัครสมาชิกหรือ import อื่นพร้อมกัน) ใส่ทีละแถวแทน
+                report['created'] += insert_each(User, users, report)
+            else:
+                report['created'] += len(users)
+        else:
+            report['created'] += len(pending)
+        batch.clear()
+        if on_batch is not None:
+            on_batch(report)
+
+    for row, record in enumerate(records, start=1):
+        try:
+            user, password = _build_user(User, record, allow_passwords)
+        except ValidationError as exc:
+            report['errors'].append({'row': row, 'error': '; '.join(exc.messages)})
+            continue
+        if user.username in seen:
+            report['duplicates'].append(user.username)
+            continue
+        seen.add(user.username)
+        batch.append((user, password))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
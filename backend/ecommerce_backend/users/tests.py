@@ -1,3 +1,135 @@
-from django.test import TestCase
+import csv
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import provisioning
+
+User = get_user_model()
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('taken', 'taken@example.com', 'pw')
+
+    def test_creates_users_with_hashed_passwords(self):
+        report = provisioning.import_users([
+            {'username': 'alice', 'email': 'alice@example.com', 'password': 'secret-a'},
+            {'username': 'bob', 'password_hash': make_password('secret-b')},
+        ])
+        self.assertEqual(report, {'created': 2, 'duplicates': [], 'errors': []})
+        self.assertTrue(User.objects.get(username='alice').check_password('secret-a'))
+        self.assertTrue(User.objects.get(username='bob').check_password('secret-b'))
+
+    def test_reports_existing_and_repeated_usernames(self):
+        report = provisioning.import_users([
+            {'username': 'taken', 'password': 'pw'},
+            {'username': 'carol', 'password': 'pw'},
+            {'username': 'carol', 'password': 'pw'},
+        ], batch_size=2)
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(sorted(report['duplicates']), ['carol', 'taken'])
+
+    def test_invalid_rows_are_reported(self):
+        report = provisioning.import_users([
+            {'password': 'pw'},
+            {'username': 'dave'},
+            {'username': 'erin', 'password_hash': 'not-a-hash'},
+            {'username': 'frank', 'password_hash': 123},
+            {'username': 'grace', 'password': 5},
+            {'username': 'heidi', 'email': 'nope', 'password': 'pw'},
+            ['ivan'],
+        ])
+        self.assertEqual(report['created'], 0)
+        self.assertEqual([error['row'] for error in report['errors']], [1, 2, 3, 4, 5, 6, 7])
+        self.assertFalse(User.objects.filter(username__in=['dave', 'erin', 'frank', 'grace', 'heidi']).exists())
+
+    def test_dry_run_creates_nothing(self):
+        report = provisioning.import_users([{'username': 'judy', 'password': 'pw'}], dry_run=True)
+        self.assertEqual(report['created'], 1)
+        self.assertFalse(User.objects.filter(username='judy').exists())
+
+    def test_broken_pool_falls_back_to_in_process_hashing(self):
+        pool = mock.Mock()
+        pool.map.side_effect = BrokenProcessPool()
+        report = provisioning.import_users([{'username': 'kim', 'password': 'pw'}], pool=pool)
+        self.assertEqual(report['created'], 1)
+        self.assertTrue(User.objects.get(username='kim').check_password('pw'))
+        pool.shutdown.assert_called_once()
+
+
+
+class ImportUsersCommandTests(TestCase):
+    def test_unreadable_csv_is_a_command_error(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('username,password_hash\n"' + 'x' * (csv.field_size_limit() + 1) + '"\n')
+            f.flush()
+            with self.assertRaisesMessage(CommandError, 'Could not read'):
+                call_command('import_users', f.name, '--workers', '1')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UserImportViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', is_staff=True)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(User.objects.create_user('user', 'user@example.com', 'pw'))
+        response = self.client.post('/api/auth/admin/import/', [], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_imports_json_rows(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/auth/admin/import/', [
+            {'username': 'liam', 'password_hash': make_password('pw')},
+            {'username': 'admin', 'password_hash': make_password('pw')},
+            {'username': 'mia', 'password_hash': 123},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['duplicates'], ['admin'])
+        self.assertEqual(response.data['errors'], [{'row': 3, 'error': 'password_hash must be a string'}])
+        self.assertTrue(User.objects.get(username='liam').check_password('pw'))
+
+    def test_plain_text_passwords_are_not_hashed_in_the_request(self):
+        self.client.force_authenticate(self.admin)
+        with mock.patch.object(provisioning, 'hash_passwords') as hash_passwords:
+            response = self.client.post('/api/auth/admin/import/', [{'username': 'liam', 'password': 'pw'}], format='json')
+        hash_passwords.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 0)
+        self.assertIn('manage.py import_users', response.data['errors'][0]['error'])
+        self.assertFalse(User.objects.filter(username='liam').exists())
+
+    def test_unreadable_csv_is_rejected(self):
+        self.client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('users.csv', b'username,password_hash\n"' + b'x' * (csv.field_size_limit() + 1) + b'"\n')
+        response = self.client.post('/api/auth/admin/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Could not read file', response.data['error'])
+
+    def test_rejects_non_list_body(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/auth/admin/import/', {'username': 'noah'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RegisterUserTests(TestCase):
+    def test_registered_user_can_log_in(self):
+        client = APIClient()
+        response = client.post('/api/auth/register/', {'username': 'olivia', 'password': 'Secret123!xyz'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = client.post('/api/auth/token/', {'username': 'olivia', 'password': 'Secret123!xyz'}, format='json')
+        self.assertEqual(response.status_code, 200)
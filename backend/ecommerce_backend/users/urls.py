@@ -3,7 +3,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from .views import RegisterUser, GetUserProfile, LogoutUser, IsAdmin
+from .views import RegisterUser, GetUserProfile, LogoutUser, IsAdmin, UserImportView
 
 urlpatterns = [
     path('register/', RegisterUser.as_view(), name='register'),
@@ -12,4 +12,5 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('logout/', LogoutUser.as_view(), name='logout'),
     path('is-admin/', IsAdmin.as_view(), name='is_admin'),
+    path('admin/import/', UserImportView.as_view(), name='user_import'),
 ]
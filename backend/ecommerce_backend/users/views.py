@@ -1,14 +1,19 @@
+import csv
+
 from django.shortcuts import render
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.parsers import JSONParser, MultiPartParser
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import UserSerializer
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth import logout
+from django.conf import settings
+from . import provisioning
 
 User = get_user_model()
 class RegisterUser(APIView):
@@ -20,9 +25,8 @@ class RegisterUser(APIView):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
             try:
+                # create_user ใน serializer hash รหัสผ่านแล้ว
                 user = serializer.save()
-                user.set_password(request.data['password'])
-                user.save()
                 refresh = RefreshToken.for_user(user)
                 return Response({
                     'refresh': str(refresh),
@@ -52,7 +56,9 @@ class LogoutUser(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        logout(request)
+        # API-only workers ไม่มี session ให้ล้าง (JWT อย่างเดียว)
+        if hasattr(request, 'session'):
+            logout(request)
         return Response({
             'message': 'User logged out successfully'
         })
@@ -65,3 +71,44 @@ class IsAdmin(APIView):
         return Response({
             'is_staff': request.user.is_staff
         }, status=status.HTTP_200_OK)
+
+
+class UserImportView(APIView):
+    """
+    นำเข้าผู้ใช้จำนวนมาก (admin)
+
+    Accepts a JSON list of user records or a multipart ``file`` (CSV with
+    header or NDJSON, ``?input_format=`` overrides the extension), at most
+    ``USER_IMPORT_MAX_ROWS`` rows; see ``users.provisioning`` for the
+    record fields. Rows must carry ``password_hash``: hashing plain-text
+    passwords is too slow for a request, so those rows and larger
+    migrations go through ``manage.py import_users``.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request):
+        max_rows = getattr(settings, 'USER_IMPORT_MAX_ROWS', 10000)
+        upload = request.FILES.get('file')
+        if upload is not None:
+            input_format = request.query_params.get('input_format')
+            if input_format is not None and input_format not in provisioning.INPUT_FORMATS:
+                return Response({"error": "input_format must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+            stream, input_format = provisioning.open_upload(upload, input_format)
+            try:
+                records = list(provisioning.read_records(stream, input_format))
+            except (ValueError, csv.Error) as e:
+                return Response({"error": f"Could not read file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, list):
+            records = request.data
+        else:
+            return Response({"error": "Send a JSON list of users or a file"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(records) > max_rows:
+            return Response(
+                {"error": f"At most {max_rows} users per request; use manage.py import_users for larger files"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = provisioning.import_users(records, allow_passwords=False)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)